@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Índice KD-tree em espaço logarítmico para busca aproximada (ANN) de tokens similares
+"""
+
+import heapq
+import time
+import numpy as np
+from typing import Dict, List, Any, Optional
+from vectorized_similarity import TokenMatrix
+
+# Seções cujos campos formam o espaço de busca do índice
+INDEXED_SECTIONS = ['market_overview', 'wallet_insights']
+
+
+def log_features(values: np.ndarray, present: np.ndarray) -> np.ndarray:
+    """Transforma valores em log1p(|x|).
+
+    A similaridade min/max de um campo é função monótona de |log a - log b|, então tokens
+    próximos (distância L1) neste espaço tendem a ter alta similaridade. Valores ausentes
+    ficam na origem, junto dos zeros.
+    """
+    return np.where(present, np.log1p(np.abs(values)), 0.0)
+
+
+class LogSpaceKDTree:
+    """KD-tree (NumPy puro) com distância L1 sobre features em escala logarítmica"""
+
+    def __init__(self, points: np.ndarray, leaf_size: int = 64):
+        self.points = points
+        self.leaf_size = max(leaf_size, 1)
+        self.order = np.arange(points.shape[0])
+
+        # Nós em arrays paralelos: caixa delimitadora, faixa em self.order e filhos (-1 = folha)
+        self.node_low = []
+        self.node_high = []
+        self.node_start = []
+        self.node_end = []
+        self.node_left = []
+        self.node_right = []
+        if points.shape[0] > 0:
+            self._build()
+
+    def __len__(self) -> int:
+        return self.points.shape[0]
+
+    def _new_node(self, start: int, end: int) -> int:
+        """Cria um nó com a caixa delimitadora dos pontos em order[start:end]"""
+        node_points = self.points[self.order[start:end]]
+        self.node_low.append(node_points.min(axis=0))
+        self.node_high.append(node_points.max(axis=0))
+        self.node_start.append(start)
+        self.node_end.append(end)
+        self.node_left.append(-1)
+        self.node_right.append(-1)
+        return len(self.node_start) - 1
+
+    def _build(self):
+        """Constrói a árvore dividindo pela mediana da dimensão de maior amplitude"""
+        stack = [self._new_node(0, self.points.shape[0])]
+        while stack:
+            node = stack.pop()
+            start, end = self.node_start[node], self.node_end[node]
+            if end - start <= self.leaf_size:
+                continue
+
+            spread = self.node_high[node] - self.node_low[node]
+            dim = int(np.argmax(spread))
+            if spread[dim] <= 0:
+                continue
+
+            # Partição pela mediana na dimensão escolhida
+            segment = self.order[start:end]
+            middle = (end - start) // 2
+            partition = np.argpartition(self.points[segment, dim], middle)
+            self.order[start:end] = segment[partition]
+
+            self.node_left[node] = self._new_node(start, start + middle)
+            self.node_right[node] = self._new_node(start + middle, end)
+            stack.append(self.node_left[node])
+            stack.append(self.node_right[node])
+
+    def _box_distance(self, node: int, point: np.ndarray) -> float:
+        """Menor distância L1 possível entre o ponto e a caixa do nó"""
+        below = np.maximum(self.node_low[node] - point, 0.0)
+        above = np.maximum(point - self.node_high[node], 0.0)
+        return float(below.sum() + above.sum())
+
+    def query(self, point: np.ndarray, n_candidates: int, max_leaves: Optional[int] = None) -> np.ndarray:
+        """Retorna as linhas dos n_candidates pontos mais próximos (ordenadas por linha).
+
+        Com max_leaves a busca para após visitar essa quantidade de folhas (já tendo
+        n_candidates pontos): o resultado passa a ser aproximado, mas o custo fica limitado
+        mesmo em dimensões altas, onde a poda pela caixa quase não descarta nós.
+        """
+        if len(self) == 0 or n_candidates <= 0:
+            return np.zeros(0, dtype=np.int64)
+
+        best_rows = np.zeros(0, dtype=np.int64)
+        best_distances = np.zeros(0, dtype=np.float64)
+        worst_distance = np.inf
+        visited_leaves = 0
+
+        # Busca best-first: visita primeiro os nós com menor distância até a caixa
+        queue = [(self._box_distance(0, point), 0)]
+        while queue:
+            box_distance, node = heapq.heappop(queue)
+            if len(best_rows) >= n_candidates:
+                if box_distance > worst_distance:
+                    break
+                if max_leaves is not None and visited_leaves >= max_leaves:
+                    break
+
+            if self.node_left[node] == -1:
+                visited_leaves += 1
+                rows = self.order[self.node_start[node]:self.node_end[node]]
+                distances = np.abs(self.points[rows] - point).sum(axis=1)
+                best_rows = np.concatenate([best_rows, rows])
+                best_distances = np.concatenate([best_distances, distances])
+                if len(best_rows) > n_candidates:
+                    keep = np.argpartition(best_distances, n_candidates - 1)[:n_candidates]
+                    best_rows, best_distances = best_rows[keep], best_distances[keep]
+                if len(best_rows) >= n_candidates:
+                    worst_distance = float(best_distances.max())
+                continue
+
+            for child in (self.node_left[node], self.node_right[node]):
+                child_distance = self._box_distance(child, point)
+                if len(best_rows) < n_candidates or child_distance <= worst_distance:
+                    heapq.heappush(queue, (child_distance, child))
+
+        return np.sort(best_rows)
+
+
+class ANNIndex:
+    """Estágio de recuperação aproximada: KD-tree sobre um TokenMatrix, reconstruída quando o
+    TokenStore de origem muda de versão"""
+
+    def __init__(self, section_fields: Dict[str, List[str]], leaf_size: int = 64,
+                 max_leaves: Optional[int] = None):
+        self.fields = [field for section in INDEXED_SECTIONS for field in section_fields[section]]
+        self.leaf_size = leaf_size
+        self.max_leaves = max_leaves
+        self.tree = None
+        self.version = None
+
+    def _columns(self, matrix: TokenMatrix) -> List[int]:
+        return [matrix.field_index[field] for field in self.fields]
+
+    def ensure_built(self, matrix: TokenMatrix) -> bool:
+        """(Re)constrói a árvore se a matriz mudou; retorna True se houve reconstrução"""
+        if self.tree is not None and matrix.version is not None and matrix.version == self.version \
+                and len(self.tree) == len(matrix):
+            return False
+
+        columns = self._columns(matrix)
+        points = log_features(matrix.values[:, columns], matrix.present[:, columns])
+        self.tree = LogSpaceKDTree(points, self.leaf_size)
+        self.version = matrix.version
+        return True
+
+    def target_point(self, target_token: Dict[str, Any]) -> np.ndarray:
+        """Converte o token alvo para um ponto no espaço do índice"""
+        values = np.zeros(len(self.fields), dtype=np.float64)
+        present = np.zeros(len(self.fields), dtype=bool)
+        for col, field in enumerate(self.fields):
+            value = TokenMatrix.to_float(target_token.get(field))
+            if value is not None:
+                values[col] = value
+                present[col] = True
+        return log_features(values, present)
+
+    def candidates(self, target_token: Dict[str, Any], matrix: TokenMatrix, n_candidates: int) -> np.ndarray:
+        """Linhas candidatas da matriz para o token alvo"""
+        self.ensure_built(matrix)
+        return self.tree.query(self.target_point(target_token), n_candidates, self.max_leaves)
+
+
+def recall_report(calculator, matrix: TokenMatrix, targets: List[Dict[str, Any]], k: int = 3,
+                  n_candidates: int = 512, max_leaves: Optional[int] = None) -> Dict[str, float]:
+    """Compara a busca ANN com a força bruta (recall@k, acerto do melhor e tempos)"""
+    index = ANNIndex(calculator.section_fields, calculator.ann_index.leaf_size, max_leaves)
+    build_start = time.perf_counter()
+    index.ensure_built(matrix)
+    build_time = time.perf_counter() - build_start
+
+    found = 0
+    expected = 0
+    best_hits = 0
+    brute_time = 0.0
+    ann_time = 0.0
+
+    for target in targets:
+        start = time.perf_counter()
+        brute = calculator.vectorized.find_top_k(target, matrix, k)
+        brute_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows = index.candidates(target, matrix, n_candidates)
+        approximate = calculator.vectorized.find_top_k(target, matrix.subset(rows), k)
+        ann_time += time.perf_counter() - start
+
+        brute_ids = [token.get('id', id(token)) for token, _, _ in brute]
+        ann_ids = [token.get('id', id(token)) for token, _, _ in approximate]
+        expected += len(brute_ids)
+        found += len(set(brute_ids) & set(ann_ids))
+        if brute_ids and ann_ids and brute_ids[0] == ann_ids[0]:
+            best_hits += 1
+        elif not brute_ids and not ann_ids:
+            best_hits += 1
+
+    queries = max(len(targets), 1)
+    return {
+        'tokens': len(matrix),
+        'queries': len(targets),
+        'candidates': n_candidates,
+        'max_leaves': max_leaves,
+        'recall_at_k': found / expected if expected else 1.0,
+        'best_match_recall': best_hits / queries,
+        'build_time': build_time,
+        'brute_time_avg': brute_time / queries,
+        'ann_time_avg': ann_time / queries
+    }
+
+
+if __name__ == '__main__':
+    import random
+    from config import Config
+    from database import TokenDatabase
+    from similarity_calculator import SimilarityCalculator
+
+    database = TokenDatabase()
+    calculator = SimilarityCalculator.from_database(database)
+    matrix = database.get_token_matrix()
+
+    # Consultas: tokens do banco com valores perturbados (simulam novos lançamentos parecidos)
+    rng = random.Random(0)
+    targets = []
+    for row in range(min(len(matrix), 200)):
+        token = dict(matrix.tokens[row])
+        for field in calculator.vectorized.fields:
+            if isinstance(token.get(field), (int, float)):
+                token[field] = token[field] * rng.uniform(0.7, 1.3)
+        targets.append(token)
+
+    report = recall_report(calculator, matrix, targets, n_candidates=Config.ANN_CANDIDATES,
+                           max_leaves=Config.ANN_MAX_LEAVES)
+    print("📊 Relatório de recall do índice ANN")
+    print("=" * 50)
+    for key, value in report.items():
+        print(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Backfill de comparações: reprocessa um arquivo de mensagens salvas contra o banco em lote
+
+Os leitores de arquivos de mensagens (iter_items, message_text) também são usados pelo ingest.py.
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Any, Iterator, Optional
+from database import TokenDatabase
+from message_parser import MessageParser
+from similarity_calculator import SimilarityCalculator
+
+# Separador de mensagens nos arquivos TXT
+MESSAGE_SEPARATOR = '---'
+READ_CHUNK_SIZE = 1024 * 1024  # Caracteres lidos por vez do JSON exportado
+TEXT_FIELDS = ('text', 'message', 'raw_message')  # Campos com o texto da mensagem, em ordem de preferência
+
+
+def message_text(item: Any, field: Optional[str] = None) -> Optional[str]:
+    """Texto de um item de exportação: string, objeto com text/message/raw_message (ou o campo
+    informado) ou mensagem do Telegram (text como lista de trechos str/{"type", "text"})"""
+    if isinstance(item, str):
+        return item
+    if not isinstance(item, dict):
+        return None
+    for key in ((field,) if field else TEXT_FIELDS):
+        value = item.get(key)
+        if isinstance(value, list):
+            value = ''.join(part if isinstance(part, str) else part.get('text', '') for part in value)
+        if isinstance(value, str) and value.strip():
+            return value
+    return None
+
+
+def iter_jsonl(path: str) -> Iterator[Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class _JsonStream:
+    """Leitor incremental de JSON: decodifica valores com raw_decode lendo o arquivo em blocos"""
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Descarta o trecho já consumido para o buffer não crescer com o arquivo
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Próximo caractere que não é espaço ('' no fim do arquivo)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"JSON inválido: esperado '{char}' na posição {self.pos}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decodifica o próximo valor, lendo mais blocos enquanto ele estiver incompleto"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # Um número no fim do buffer pode continuar no próximo bloco
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def array_items(self) -> Iterator[Any]:
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect(']')
+            return
+
+
+def iter_json_messages(path: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Any]:
+    """Itens de uma lista JSON ou da lista "messages" de um objeto, sem carregar o arquivo inteiro"""
+    with open(path, 'r', encoding='utf-8') as f:
+        stream = _JsonStream(f, chunk_size)
+        if stream.peek() == '[':
+            yield from stream.array_items()
+            return
+
+        stream.expect('{')
+        while stream.peek() not in ('}', ''):
+            key = stream.value()
+            stream.expect(':')
+            if key == 'messages' and stream.peek() == '[':
+                yield from stream.array_items()
+            else:
+                stream.value()  # Metadados do chat (name, type, id...)
+            if stream.peek() == ',':
+                stream.pos += 1
+
+
+def iter_text_messages(path: str) -> Iterator[str]:
+    """Mensagens de um arquivo .txt separadas por linhas com ---"""
+    with open(path, 'r', encoding='utf-8') as f:
+        current = []
+        for line in f:
+            line = line.rstrip('\r\n')
+            if line.strip() == MESSAGE_SEPARATOR:
+                yield '\n'.join(current)
+                current = []
+            else:
+                current.append(line)
+        yield '\n'.join(current)
+
+
+def iter_items(path: str) -> Iterator[Any]:
+    """Itens de um arquivo .json (lista ou {"messages": [...]}), .jsonl (um por linha) ou .txt
+    (separados por ---), lidos sob demanda"""
+    if path.endswith('.jsonl'):
+        return iter_jsonl(path)
+    if path.endswith('.json'):
+        return iter_json_messages(path)
+    return iter_text_messages(path)
+
+
+def load_messages(path: str, field: Optional[str] = None) -> List[str]:
+    """Lê as mensagens de um arquivo .json, .jsonl ou .txt (ver iter_items)"""
+    messages = (message_text(item, field) for item in iter_items(path))
+    return [message.strip() for message in messages if message and message.strip()]
+
+
+def run_backfill(messages: List[str], database: TokenDatabase, calculator: SimilarityCalculator,
+                 threshold: Optional[float] = None, top_k: int = 1) -> Dict[str, Any]:
+    """Compara todas as mensagens com o banco em uma única chamada em lote (somente leitura)"""
+    if threshold is None:
+        threshold = database.get_min_similarity_threshold()
+
+    parser = MessageParser()
+    start = time.perf_counter()
+    targets = [parser.parse_token_message(message) for message in messages if parser.is_token_message(message)]
+    parse_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = calculator.find_top_k_batch(targets, database.get_token_matrix(), top_k)
+    score_time = time.perf_counter() - start
+
+    entries = []
+    for target, top_matches in zip(targets, results):
+        contract_address = target.get('contract_address')
+        best_similarity = top_matches[0][1] if top_matches else 0.0
+        entries.append({
+            'token_name': target.get('token_name') or 'Token desconhecido',
+            'contract_address': contract_address,
+            'similarity': best_similarity,
+            'above_threshold': bool(top_matches) and best_similarity >= threshold,
+            'already_displayed': bool(contract_address) and database.is_contract_already_displayed(contract_address),
+            'matches': [
+                {'id': token.get('id'), 'token_name': token.get('token_name'), 'similarity': similarity}
+                for token, similarity, _ in top_matches
+            ]
+        })
+
+    return {
+        'messages': len(messages),
+        'parsed': len(targets),
+        'skipped': len(messages) - len(targets),
+        'database_tokens': len(database.token_store),
+        'threshold': threshold,
+        'above_threshold': sum(1 for entry in entries if entry['above_threshold']),
+        'parse_time': parse_time,
+        'score_time': score_time,
+        'entries': entries
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Gera o relatório TXT do backfill"""
+    content = []
+    content.append("=" * 80)
+    content.append("🔁 BACKFILL DE COMPARAÇÕES - RELATÓRIO")
+    content.append("=" * 80)
+    content.append(f"📅 Data: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+    content.append(f"💬 Mensagens: {report['messages']} ({report['parsed']} tokens, {report['skipped']} ignoradas)")
+    content.append(f"🗄️ Tokens no banco: {report['database_tokens']}")
+    content.append(f"🎯 Threshold: {report['threshold']:.1f}%")
+    content.append(f"✅ Acima do threshold: {report['above_threshold']}")
+    content.append(f"⏱️ Parse: {report['parse_time']:.2f}s | Comparação: {report['score_time']:.2f}s")
+    content.append("=" * 80)
+    content.append("")
+
+    for i, entry in enumerate(report['entries'], 1):
+        status = "✅" if entry['above_threshold'] else "➖"
+        if entry['already_displayed']:
+            status += " (já exibido)"
+        content.append(f"{status} #{i}: {entry['token_name']} - {entry['similarity']:.1f}%")
+        if entry['contract_address']:
+            content.append(f"   CA: {entry['contract_address']}")
+        for match in entry['matches']:
+            content.append(f"   └ {match['token_name']} (ID {match['id']}): {match['similarity']:.1f}%")
+        content.append("")
+
+    return "\n".join(content)
+
+
+def main():
+    """Lê o arquivo de mensagens, compara em lote e grava o relatório"""
+    arg_parser = argparse.ArgumentParser(description="Reprocessa mensagens salvas contra o banco de tokens")
+    arg_parser.add_argument('file', help="Arquivo .txt (mensagens separadas por ---), .json ou .jsonl")
+    arg_parser.add_argument('--threshold', type=float, default=None, help="Threshold (padrão: o configurado no bot)")
+    arg_parser.add_argument('--top', type=int, default=3, help="Tokens similares listados por mensagem")
+    arg_parser.add_argument('--output', default=None, help="Arquivo do relatório")
+    args = arg_parser.parse_args()
+
+    print("🔁 Backfill de comparações")
+    print("=" * 50)
+
+    messages = load_messages(args.file)
+    database = TokenDatabase()
+    report = run_backfill(messages, database, SimilarityCalculator.from_database(database), args.threshold, args.top)
+
+    output = args.output or f"backfill_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(format_report(report))
+
+    print(f"💬 Mensagens: {report['messages']} ({report['parsed']} tokens)")
+    print(f"✅ Acima do threshold: {report['above_threshold']}")
+    print(f"⏱️ Comparação em lote: {report['score_time']:.2f}s")
+    print(f"📄 Relatório: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Backfill dos vetores de features (colunas features/features_mask) para tokens já salvos
+"""
+
+import sys
+from database import TokenDatabase
+
+
+def main():
+    """Grava o vetor empacotado em todas as linhas que ainda não o possuem"""
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    print("🧮 Backfill dos vetores de features")
+    print("=" * 50)
+
+    database = TokenDatabase()
+    total = database.get_tokens_count()
+    updated = database.backfill_features(batch_size)
+    database.reload_token_store()
+
+    print(f"📊 Tokens no banco: {total}")
+    print(f"✅ Vetores gravados: {updated}")
+    print(f"ℹ️ Já atualizados: {total - updated}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,3 @@
+"""
+Benchmarks de parsing, similaridade, renderização e armazenamento (ver bench.py e compare.py)
+"""
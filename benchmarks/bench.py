@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de parsing, similaridade, renderização e armazenamento em escala realista.
+
+Uso: python -m benchmarks.bench [--sizes 1000,10000,100000,1000000] [--output benchmark_results.json]
+Compare com uma execução anterior: python -m benchmarks.compare baseline.json benchmark_results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Any, Callable
+from config import Config
+from message_parser import MessageParser
+from parse_cache import ParseCache
+from similarity_calculator import SimilarityCalculator
+from token_store import FEATURE_FIELDS, INTEGER_FIELDS, encode_features
+from vectorized_similarity import TokenMatrix
+from benchmarks.generator import generate_messages
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_OUTPUT = 'benchmark_results.json'
+
+
+class SyntheticRows:
+    """Tokens de uma matriz sintética materializados sob demanda (evita 1M de dicts)"""
+
+    def __init__(self, fields: List[str], values: np.ndarray, present: np.ndarray):
+        self.fields = fields
+        self.values = values
+        self.present = present
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    def __getitem__(self, row: int) -> Dict[str, Any]:
+        token = {'id': row + 1, 'token_name': f'Synthetic {row + 1}', 'contract_address': f'SYNTH{row + 1:039d}'}
+        for col, field in enumerate(self.fields):
+            if self.present[row, col]:
+                value = float(self.values[row, col])
+                token[field] = int(value) if field in INTEGER_FIELDS else value
+            else:
+                token[field] = None
+        return token
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+
+def measure(function: Callable[[], Any], ops: int, repeat: int) -> Dict[str, float]:
+    """Executa function repeat vezes; tempos em segundos por operação (ops por execução)"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) / ops)
+    return {'ops': ops, 'repeat': repeat, 'min': min(timings), 'median': statistics.median(timings)}
+
+
+def build_matrix(pool: List[Dict[str, Any]], size: int, seed: int = 0) -> TokenMatrix:
+    """Matriz com size tokens: o pool parseado repetido com ruído log-normal (~30%) nos valores"""
+    encoded = [encode_features(token) for token in pool]
+    pool_values = np.array([values for values, _ in encoded])
+    pool_present = np.array([present for _, present in encoded])
+
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(pool), size)
+    values = pool_values[rows] * np.exp(rng.normal(0.0, 0.3, (size, len(FEATURE_FIELDS))))
+    integer_columns = [col for col, field in enumerate(FEATURE_FIELDS) if field in INTEGER_FIELDS]
+    values[:, integer_columns] = np.rint(values[:, integer_columns])
+    present = pool_present[rows]
+    return TokenMatrix(FEATURE_FIELDS, values, present, SyntheticRows(FEATURE_FIELDS, values, present))
+
+
+def bench_parsing(messages: List[str], repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for mode in ('regex', 'line', 'combined'):
+        parser = MessageParser(mode)
+
+        def parse_all():
+            for message in messages:
+                parser.parse_token_message(message)
+
+        results[f'parse.parse_token_message.{mode}'] = measure(parse_all, len(messages), repeat)
+    results['parse.parse_token_message'] = results[f'parse.parse_token_message.{Config.PARSER_MODE}']
+
+    # Mensagens repetidas (encaminhadas / nos dois grupos): acerto no ParseCache
+    cached_parser = MessageParser(cache=ParseCache(max(len(messages), 1), Config.PARSE_CACHE_BYTES * 4))
+    for message in messages:
+        cached_parser.parse_token_message(message)
+
+    def parse_cached():
+        for message in messages:
+            cached_parser.parse_token_message(message)
+
+    results['parse.parse_token_message.cached'] = measure(parse_cached, len(messages), repeat)
+    return results
+
+
+def bench_similarity(calculator: SimilarityCalculator, pool: List[Dict[str, Any]], targets: List[Dict[str, Any]],
+                     sizes: List[int], scalar_max: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    threshold = Config.MIN_SIMILARITY_THRESHOLD
+    k = max(Config.NOTIFICATION_TOP_MATCHES, 1)
+
+    for size in sizes:
+        matrix = build_matrix(pool, size)
+        print(f"  📐 {size} tokens")
+
+        if size <= scalar_max:
+            tokens = list(matrix.tokens)
+
+            def scalar():
+                for target in targets:
+                    calculator.find_most_similar_token(target, tokens)
+
+            results[f'similarity.find_most_similar_token.{size}'] = measure(scalar, len(targets), repeat)
+
+        def best_match():
+            for target in targets:
+                calculator.find_best_match(target, matrix)
+
+        def top_k_pruned():
+            for target in targets:
+                calculator.find_top_k_similar(target, matrix, k, threshold)
+
+        results[f'similarity.find_best_match.{size}'] = measure(best_match, len(targets), repeat)
+        results[f'similarity.find_top_k_pruned.{size}'] = measure(top_k_pruned, len(targets), repeat)
+        del matrix
+    return results
+
+
+def bench_rendering(calculator: SimilarityCalculator, pool: List[Dict[str, Any]], pairs: int,
+                    repeat: int) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(1)
+    cases = []
+    for _ in range(pairs):
+        target, similar = rng.sample(pool, 2)
+        similarity, sections = calculator.calculate_overall_similarity(target, similar)
+        cases.append((target, similar, similarity, sections))
+
+    def enhanced():
+        for target, similar, similarity, sections in cases:
+            calculator.create_enhanced_message(target['token_name'], similar, similarity, sections,
+                                               target['raw_message'], target['contract_address'])
+
+    def side_by_side():
+        for target, similar, _, sections in cases:
+            calculator.create_side_by_side_comparison(target, similar, sections)
+
+    return {
+        'render.create_enhanced_message': measure(enhanced, pairs, repeat),
+        'render.create_side_by_side_comparison': measure(side_by_side, pairs, repeat),
+    }
+
+
+def bench_storage(pool: List[Dict[str, Any]], db_size: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    """Caminhos de escrita/leitura do TokenDatabase em um banco temporário"""
+    from database import TokenDatabase
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    original_file = Config.DATABASE_FILE
+    Config.DATABASE_FILE = path
+    try:
+        database = TokenDatabase()
+    finally:
+        Config.DATABASE_FILE = original_file
+
+    results = {}
+    try:
+        tokens = [pool[index % len(pool)] for index in range(db_size)]
+        start = time.perf_counter()
+        for index, token in enumerate(tokens):
+            database.save_token_info(dict(token, contract_address=f"{token['contract_address']}{index}"), index, -100)
+        elapsed = (time.perf_counter() - start) / db_size
+        results['storage.save_token_info'] = {'ops': db_size, 'repeat': 1, 'min': elapsed, 'median': elapsed}
+
+        contracts = [f"{tokens[index]['contract_address']}{index}" for index in range(0, db_size, max(db_size // 100, 1))]
+
+        def lookups():
+            for contract_address in contracts:
+                database.get_token_by_contract_address(contract_address)
+
+        results['storage.get_all_tokens'] = measure(database.get_all_tokens, 1, repeat)
+        results['storage.load_token_features'] = measure(database.load_token_features, 1, repeat)
+        results['storage.reload_token_store'] = measure(database.reload_token_store, 1, repeat)
+        results['storage.get_token_by_contract_address'] = measure(lookups, len(contracts), repeat)
+    finally:
+        os.remove(path)
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def run(sizes: List[int], messages: int = 2000, targets: int = 5, scalar_max: int = 10000, pairs: int = 200,
+        db_size: int = 2000, repeat: int = 3, seed: int = 0) -> Dict[str, Any]:
+    """Executa todos os benchmarks e retorna {'meta': ..., 'results': {nome: tempos}}"""
+    parser = MessageParser()
+    texts = generate_messages(messages, seed)
+    pool = [parser.parse_token_message(text) for text in texts]
+    for index, token in enumerate(pool):
+        token['id'] = index + 1
+    target_tokens = [parser.parse_token_message(text) for text in generate_messages(targets, seed + 1)]
+
+    calculator = SimilarityCalculator()
+    results = {}
+    print("📝 Parsing")
+    results.update(bench_parsing(texts, repeat))
+    print("🔍 Similaridade")
+    results.update(bench_similarity(calculator, pool, target_tokens, sizes, scalar_max, repeat))
+    print("🖼️ Renderização")
+    results.update(bench_rendering(calculator, pool, pairs, repeat))
+    print("💾 Armazenamento")
+    results.update(bench_storage(pool, db_size, repeat))
+
+    meta = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'engine': calculator.engine,
+        'params': {'sizes': sizes, 'messages': messages, 'targets': targets, 'scalar_max': scalar_max,
+                   'pairs': pairs, 'db_size': db_size, 'repeat': repeat, 'seed': seed},
+    }
+    return {'meta': meta, 'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks do bot de similaridade')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='Tamanhos do banco na busca de similaridade (separados por vírgula)')
+    parser.add_argument('--messages', type=int, default=2000, help='Mensagens sintéticas (parsing e pool de tokens)')
+    parser.add_argument('--targets', type=int, default=5, help='Tokens alvo por medição de similaridade')
+    parser.add_argument('--scalar-max', type=int, default=10000, help='Maior banco medido com o cálculo escalar')
+    parser.add_argument('--pairs', type=int, default=200, help='Pares renderizados')
+    parser.add_argument('--db-size', type=int, default=2000, help='Tokens gravados no benchmark de armazenamento')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetições de cada medição')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Arquivo JSON com os resultados')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    report = run(sizes, args.messages, args.targets, args.scalar_max, args.pairs, args.db_size, args.repeat, args.seed)
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+
+    print("\n📊 Resultados (mediana por operação)")
+    print("=" * 50)
+    for name, timing in report['results'].items():
+        print(f"{name:<50} {timing['median'] * 1000:>10.3f} ms")
+    print(f"\n💾 Salvo em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
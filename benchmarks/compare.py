@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Compara dois resultados de benchmarks/bench.py e aponta regressões.
+
+Uso: python -m benchmarks.compare baseline.json atual.json [--threshold 0.15]
+Retorna código de saída 1 se alguma medição ficou mais lenta que o limite.
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, List, Any
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.15) -> List[Dict[str, Any]]:
+    """Linhas {name, baseline, current, ratio, status} comparando a mediana por operação.
+
+    status: 'regression' (mais lento que 1 + threshold), 'improvement' (mais rápido na mesma
+    proporção), 'ok', 'new' (só no atual) ou 'missing' (só no baseline).
+    """
+    baseline_results = baseline.get('results', {})
+    current_results = current.get('results', {})
+    rows = []
+    for name in list(baseline_results) + [name for name in current_results if name not in baseline_results]:
+        before = baseline_results.get(name, {}).get('median')
+        after = current_results.get(name, {}).get('median')
+        if before is None or after is None:
+            status = 'new' if before is None else 'missing'
+            rows.append({'name': name, 'baseline': before, 'current': after, 'ratio': None, 'status': status})
+            continue
+        ratio = after / before if before > 0 else float('inf')
+        if ratio > 1 + threshold:
+            status = 'regression'
+        elif ratio < 1 / (1 + threshold):
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append({'name': name, 'baseline': before, 'current': after, 'ratio': ratio, 'status': status})
+    return rows
+
+
+def format_rows(rows: List[Dict[str, Any]]) -> List[str]:
+    icons = {'regression': '🔴', 'improvement': '🟢', 'ok': '⚪', 'new': '🆕', 'missing': '❔'}
+
+    def ms(value):
+        return f"{value * 1000:>10.3f}" if value is not None else f"{'-':>10}"
+
+    lines = [f"   {'benchmark':<50} {'base ms':>10} {'atual ms':>10} {'razão':>7}"]
+    for row in rows:
+        ratio = f"{row['ratio']:>6.2f}x" if row['ratio'] is not None else f"{'-':>7}"
+        lines.append(f"{icons[row['status']]} {row['name']:<50} {ms(row['baseline'])} {ms(row['current'])} {ratio}")
+    return lines
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Compara resultados de benchmark com um baseline')
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='Aumento relativo da mediana considerado regressão (0.15 = 15%%)')
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as baseline_file, open(args.current) as current_file:
+        baseline, current = json.load(baseline_file), json.load(current_file)
+
+    rows = compare(baseline, current, args.threshold)
+    print("\n".join(format_rows(rows)))
+    regressions = [row['name'] for row in rows if row['status'] == 'regression']
+    if regressions:
+        print(f"\n🔴 {len(regressions)} regressão(ões) acima de {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print("\n✅ Nenhuma regressão")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Harness de equivalência: compara cada caminho acelerado da busca com o cálculo escalar de
+referência (calculate_overall_similarity) sobre as linhas reais do token_database.db e
+tokens sintéticos, com um relatório de diferenças por divergência.
+
+Uso: python -m benchmarks.equivalence [--db token_database.db] [--synthetic 400] [--engines vectorized,pruned]
+Retorna código de saída 1 se algum motor exato ou com tolerância divergir.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+from typing import Dict, List, Any, Callable, Optional, Tuple
+from config import Config
+from lsh_index import LSHIndex
+from message_parser import MessageParser
+from similarity_calculator import SimilarityCalculator
+from token_store import TokenStore, FEATURE_FIELDS, COMPACT_SIMILARITY_ERROR
+from vectorized_similarity import TokenMatrix, PRUNING_EPSILON
+from benchmarks.generator import generate_token_message
+
+# Diferença aceita na similaridade geral dos motores exatos (as seções devem ser idênticas)
+EXACT_EPSILON = PRUNING_EPSILON
+
+Match = Tuple[Dict[str, Any], float, Dict[str, float]]
+
+
+class Dataset:
+    """Tokens do banco comparados pelos motores, com as matrizes criadas sob demanda"""
+
+    def __init__(self, name: str, tokens: List[Dict[str, Any]]):
+        self.name = name
+        self.tokens = tokens
+        self._matrices = {}
+        self._lsh_index = None
+
+    def _store_matrix(self, compact: bool) -> TokenMatrix:
+        store = TokenStore(compact=compact)
+        for token in self.tokens:
+            store.add(token['id'], token)
+        return store.matrix()
+
+    def matrix(self, kind: str) -> TokenMatrix:
+        """'plain' (matriz avulsa), 'store' (TokenStore) ou 'compact' (TokenStore compacto)"""
+        if kind not in self._matrices:
+            if kind == 'plain':
+                self._matrices[kind] = TokenMatrix.from_tokens(self.tokens, FEATURE_FIELDS)
+            else:
+                self._matrices[kind] = self._store_matrix(kind == 'compact')
+        return self._matrices[kind]
+
+    def lsh_index(self) -> LSHIndex:
+        """Índice LSH (em memória) sobre a matriz do store"""
+        if self._lsh_index is None:
+            self._lsh_index = LSHIndex(Config.LSH_TABLES, Config.LSH_BITS)
+            self._lsh_index.rebuild(self.matrix('store'))
+        return self._lsh_index
+
+
+def _single(match: Tuple[Optional[Dict[str, Any]], float, Dict[str, float]]) -> List[Match]:
+    return [match] if match[0] is not None else []
+
+
+def _scalar(calculator: SimilarityCalculator) -> SimilarityCalculator:
+    """Cópia rasa da calculadora forçada no caminho escalar (poda branch-and-bound sem NumPy)"""
+    scalar = SimilarityCalculator.__new__(SimilarityCalculator)
+    scalar.__dict__.update(calculator.__dict__)
+    scalar.engine = 'scalar'
+    return scalar
+
+
+def _vectorized(calculator, target, dataset, k, threshold):
+    return _single(calculator.find_most_similar_token_vectorized(target, dataset.matrix('plain')))
+
+
+def _best_match(calculator, target, dataset, k, threshold):
+    return _single(calculator.find_best_match(target, dataset.matrix('store')))
+
+
+def _top_k(calculator, target, dataset, k, threshold):
+    return calculator.vectorized.find_top_k(target, dataset.matrix('store'), k)
+
+
+def _pruned(calculator, target, dataset, k, threshold):
+    return calculator.vectorized.find_top_k_pruned(target, dataset.matrix('store'), k, threshold)[0]
+
+
+def _scalar_pruned(calculator, target, dataset, k, threshold):
+    return _scalar(calculator).find_top_k_similar(target, dataset.tokens, k, threshold)
+
+
+def _cached(calculator, target, dataset, k, threshold):
+    # A segunda chamada é servida pelo cache de pares (PairScoreCache)
+    calculator.find_top_k_similar(target, dataset.matrix('store'), k, threshold)
+    return calculator.find_top_k_similar(target, dataset.matrix('store'), k, threshold)
+
+
+def _batch(calculator, target, dataset, k, threshold):
+    return calculator.find_top_k_batch([target], dataset.matrix('plain'), k, threshold)[0]
+
+
+def _streaming(calculator, target, dataset, k, threshold):
+    batches = (dataset.tokens[start:start + 64] for start in range(0, len(dataset.tokens), 64))
+    return calculator.find_top_k_streaming(target, batches, k, threshold)
+
+
+def _compact(calculator, target, dataset, k, threshold):
+    return calculator.vectorized.find_top_k(target, dataset.matrix('compact'), k)
+
+
+def _ann(calculator, target, dataset, k, threshold):
+    matrix = dataset.matrix('store')
+    rows = calculator.ann_index.candidates(target, matrix, Config.ANN_CANDIDATES)
+    return calculator.vectorized.find_top_k(target, matrix.subset(rows), k)
+
+
+def _lsh(calculator, target, dataset, k, threshold):
+    matrix = dataset.matrix('store')
+    index = dataset.lsh_index()
+    return calculator.vectorized.find_top_k(target, matrix.subset(index.candidates(target, matrix)), k)
+
+
+# Motor -> (função(calculator, alvo, dataset, k, threshold), tolerância, usa threshold)
+# Tolerância 0 = exato; None = aproximado (scores conferidos, ranking só reportado)
+ENGINES: Dict[str, Tuple[Callable[..., List[Match]], Optional[float], bool]] = {
+    'vectorized': (_vectorized, 0.0, False),
+    'best_match': (_best_match, 0.0, False),
+    'top_k': (_top_k, 0.0, False),
+    'pruned': (_pruned, 0.0, True),
+    'scalar_pruned': (_scalar_pruned, 0.0, True),
+    'cached': (_cached, 0.0, True),
+    'batch': (_batch, 0.0, True),
+    'streaming': (_streaming, 0.0, True),
+    'compact': (_compact, COMPACT_SIMILARITY_ERROR, False),
+    'ann': (_ann, None, False),
+    'lsh': (_lsh, None, False),
+}
+
+
+def reference_scores(calculator: SimilarityCalculator, target: Dict[str, Any],
+                     tokens: List[Dict[str, Any]]) -> List[Tuple[float, Dict[str, float]]]:
+    """Score de referência de cada token do banco (na ordem do banco)"""
+    return [calculator.calculate_overall_similarity(target, token) for token in tokens]
+
+
+def reference_top_k(tokens: List[Dict[str, Any]], scores: List[Tuple[float, Dict[str, float]]], k: int,
+                    threshold: Optional[float] = None) -> List[Match]:
+    """Top-k de referência: maiores scores > 0 (>= threshold), empates pela primeira ocorrência"""
+    order = sorted(range(len(tokens)), key=lambda row: (-scores[row][0], row))
+    matches = []
+    for row in order[:k]:
+        similarity, sections = scores[row]
+        if similarity <= 0 or (threshold is not None and similarity < threshold):
+            break
+        matches.append((tokens[row], similarity, sections))
+    return matches
+
+
+def _describe(token: Optional[Dict[str, Any]], similarity: Optional[float] = None) -> str:
+    if token is None:
+        return 'nenhum'
+    text = f"#{token.get('id')} {token.get('token_name')}"
+    return text + (f" ({similarity:.9f})" if similarity is not None else '')
+
+
+def compare_matches(expected: List[Match], result: List[Match], scores_by_id: Dict[Any, Tuple[float, Dict[str, float]]],
+                    tolerance: Optional[float]) -> List[Dict[str, Any]]:
+    """Diferenças entre o resultado de um motor e a referência.
+
+    Cada token devolvido deve ter a mesma similaridade geral (até EXACT_EPSILON ou a
+    tolerância) e as mesmas seções da referência; o ranking deve ser o mesmo, exceto
+    trocas entre tokens cujas similaridades de referência diferem menos que a tolerância.
+    """
+    differences = []
+    overall_limit = EXACT_EPSILON if not tolerance else tolerance + EXACT_EPSILON
+
+    for rank, (token, similarity, sections) in enumerate(result):
+        expected_similarity, expected_sections = scores_by_id[token.get('id')]
+        if abs(similarity - expected_similarity) > overall_limit:
+            differences.append({'kind': 'overall', 'rank': rank, 'token': _describe(token),
+                                'expected': expected_similarity, 'got': similarity})
+        for section, expected_section in expected_sections.items():
+            got_section = sections.get(section)
+            same = got_section == expected_section if not tolerance else \
+                got_section is not None and abs(got_section - expected_section) <= overall_limit
+            if not same:
+                differences.append({'kind': 'section', 'rank': rank, 'token': _describe(token), 'section': section,
+                                    'expected': expected_section, 'got': got_section})
+
+    swap_limit = 2 * tolerance + EXACT_EPSILON if tolerance else 0.0
+    for rank in range(max(len(expected), len(result))):
+        expected_match = expected[rank] if rank < len(expected) else (None, None, None)
+        got_match = result[rank] if rank < len(result) else (None, None, None)
+        expected_id = expected_match[0].get('id') if expected_match[0] else None
+        got_id = got_match[0].get('id') if got_match[0] else None
+        if expected_id == got_id:
+            continue
+        if expected_id is not None and got_id is not None and \
+                abs(scores_by_id[got_id][0] - expected_match[1]) <= swap_limit:
+            continue
+        differences.append({'kind': 'best_match' if rank == 0 else 'ranking', 'rank': rank,
+                            'expected': _describe(expected_match[0], expected_match[1]),
+                            'got': _describe(got_match[0], got_match[1])})
+    return differences
+
+
+def run_equivalence(calculator: SimilarityCalculator, dataset: Dataset, targets: List[Dict[str, Any]],
+                    engines: List[str], k: int = 3, threshold: Optional[float] = None) -> Dict[str, Any]:
+    """Roda os motores sobre todos os alvos; retorna {'mismatches': [...], 'checked': {motor: alvos}, 'approximate': {...}}"""
+    threshold = Config.MIN_SIMILARITY_THRESHOLD if threshold is None else threshold
+    report = {'mismatches': [], 'checked': {engine: 0 for engine in engines},
+              'approximate': {engine: {'targets': 0, 'best_match_hits': 0} for engine in engines
+                              if ENGINES[engine][1] is None}}
+
+    for target_number, target in enumerate(targets):
+        scores = reference_scores(calculator, target, dataset.tokens)
+        scores_by_id = {token.get('id'): score for token, score in zip(dataset.tokens, scores)}
+        full_reference = reference_top_k(dataset.tokens, scores, k)
+        pruned_reference = reference_top_k(dataset.tokens, scores, k, threshold)
+
+        for engine in engines:
+            function, tolerance, uses_threshold = ENGINES[engine]
+            result = function(calculator, target, dataset, k, threshold)
+            expected = pruned_reference if uses_threshold else full_reference
+            if engine in ('vectorized', 'best_match'):
+                expected = expected[:1]
+            differences = compare_matches(expected, result, scores_by_id, tolerance)
+            report['checked'][engine] += 1
+
+            if tolerance is None:
+                # Aproximado: o ranking pode diferir, mas os scores devolvidos devem ser exatos
+                stats = report['approximate'][engine]
+                stats['targets'] += 1
+                stats['best_match_hits'] += not any(diff['kind'] == 'best_match' for diff in differences)
+                differences = [diff for diff in differences if diff['kind'] in ('overall', 'section')]
+
+            for diff in differences:
+                diff.update({'engine': engine, 'dataset': dataset.name, 'target_number': target_number,
+                             'target': _describe(target)})
+                report['mismatches'].append(diff)
+    return report
+
+
+def format_report(report: Dict[str, Any], limit: int = 50) -> List[str]:
+    lines = []
+    for engine, count in report['checked'].items():
+        failures = sum(1 for diff in report['mismatches'] if diff['engine'] == engine)
+        icon = '✅' if not failures else '❌'
+        lines.append(f"{icon} {engine:<14} {count} alvos, {failures} divergência(s)")
+    for engine, stats in report['approximate'].items():
+        hits = stats['best_match_hits'] / stats['targets'] if stats['targets'] else 1.0
+        lines.append(f"   ↳ {engine}: melhor match igual à referência em {hits:.1%} dos alvos (aproximado)")
+
+    for diff in report['mismatches'][:limit]:
+        header = f"\n❌ [{diff['engine']}] {diff['dataset']} alvo {diff['target_number']} {diff['target']}"
+        if diff['kind'] in ('best_match', 'ranking'):
+            lines.append(f"{header}: {diff['kind']} (posição {diff['rank'] + 1})")
+            lines.append(f"   esperado: {diff['expected']}")
+            lines.append(f"   obtido:   {diff['got']}")
+        elif diff['kind'] == 'overall':
+            lines.append(f"{header}: similaridade geral de {diff['token']}")
+            lines.append(f"   esperado: {diff['expected']!r}  obtido: {diff['got']!r}  "
+                         f"(Δ {diff['got'] - diff['expected']:+.3e})")
+        else:
+            got = diff['got']
+            delta = f"(Δ {got - diff['expected']:+.3e})" if got is not None else ''
+            lines.append(f"{header}: seção {diff['section']} de {diff['token']}")
+            lines.append(f"   esperado: {diff['expected']!r}  obtido: {got!r}  {delta}")
+    if len(report['mismatches']) > limit:
+        lines.append(f"\n... mais {len(report['mismatches']) - limit} divergência(s)")
+    return lines
+
+
+def load_database_tokens(db_file: str) -> List[Dict[str, Any]]:
+    """Linhas do banco real, abertas somente leitura"""
+    if not os.path.exists(db_file):
+        return []
+    with sqlite3.connect(f'file:{db_file}?mode=ro', uri=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM tokens ORDER BY id')
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def synthetic_tokens(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Tokens parseados do gerador de benchmarks com os casos de borda do cálculo injetados:
+    campos ausentes (None x None vale 100), zeros (valem 0), negativos e duplicatas exatas"""
+    rng = random.Random(seed)
+    parser = MessageParser()
+    tokens = []
+    for index in range(count):
+        token = parser.parse_token_message(generate_token_message(rng)[0])
+        token['id'] = index + 1
+        for field in FEATURE_FIELDS:
+            roll = rng.random()
+            if roll < 0.08:
+                token[field] = None
+            elif roll < 0.14:
+                token[field] = 0
+            elif roll < 0.17 and token[field] is not None:
+                token[field] = -token[field]
+        tokens.append(token)
+    for index in range(0, count, 25):
+        tokens.append(dict(tokens[index], id=len(tokens) + 1))
+    return tokens
+
+
+def perturbed_targets(tokens: List[Dict[str, Any]], count: int, seed: int = 1) -> List[Dict[str, Any]]:
+    """Alvos: cópias exatas e versões com ruído de tokens do banco (acima e abaixo do threshold)"""
+    rng = random.Random(seed)
+    targets = []
+    for number in range(count):
+        target = dict(rng.choice(tokens), id=None)
+        noise = 0.0 if number % 5 == 0 else rng.choice([0.02, 0.1, 0.4])
+        for field in FEATURE_FIELDS:
+            value = target.get(field)
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and noise:
+                value = value * (1 + rng.uniform(-noise, noise))
+                target[field] = int(round(value)) if isinstance(target[field], int) else value
+        targets.append(target)
+    return targets
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Equivalência dos motores acelerados com o cálculo escalar')
+    parser.add_argument('--db', default=Config.DATABASE_FILE, help='Banco real (aberto somente leitura)')
+    parser.add_argument('--synthetic', type=int, default=400, help='Tokens sintéticos (0 = só o banco real)')
+    parser.add_argument('--targets', type=int, default=60, help='Alvos por conjunto de dados')
+    parser.add_argument('--engines', default=','.join(ENGINES), help='Motores comparados (separados por vírgula)')
+    parser.add_argument('--k', type=int, default=Config.NOTIFICATION_TOP_MATCHES)
+    parser.add_argument('--threshold', type=float, default=Config.MIN_SIMILARITY_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    engines = [engine for engine in args.engines.split(',') if engine]
+    unknown = [engine for engine in engines if engine not in ENGINES]
+    if unknown:
+        parser.error(f"motores desconhecidos: {', '.join(unknown)}")
+
+    calculator = SimilarityCalculator()
+    datasets = []
+    real_tokens = load_database_tokens(args.db)
+    if real_tokens:
+        datasets.append(Dataset('real', real_tokens))
+    if args.synthetic:
+        datasets.append(Dataset('synthetic', synthetic_tokens(args.synthetic)))
+
+    failed = False
+    for dataset in datasets:
+        print(f"\n🧪 {dataset.name}: {len(dataset.tokens)} tokens")
+        print("=" * 50)
+        report = run_equivalence(calculator, dataset, perturbed_targets(dataset.tokens, args.targets),
+                                 engines, args.k, args.threshold)
+        print("\n".join(format_report(report)))
+        failed = failed or bool(report['mismatches'])
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Gerador de mensagens de token sintéticas no formato lido pelo MessageParser
+"""
+
+import random
+import string
+from typing import Dict, List, Any, Tuple
+
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+NAME_WORDS = ['Grok', 'Elon', 'Doge', 'Pepe', 'Based', 'Moon', 'Cat', 'Frog', 'Trump', 'Companion',
+              'Wojak', 'Bonk', 'Solana', 'Degen', 'Chad', 'Giga', 'Baby', 'Shiba', 'Turbo', 'Ape']
+EXCHANGES = ['Kraken', 'AXIOM', 'SideShift', 'Bybit', 'BOM', 'Kucoin', 'Binance', 'Coinbase', 'OKX']
+HOLDER_TAGS = ['', '', '', ' 🟡', ' 🟣', ' 🐋', ' 🟢']
+
+
+def _base58(rng: random.Random, length: int) -> str:
+    return ''.join(rng.choice(BASE58_ALPHABET) for _ in range(length))
+
+
+def _short_wallet(rng: random.Random) -> str:
+    return f"{_base58(rng, 6)}...{_base58(rng, 4)}"
+
+
+def _money(value: float) -> str:
+    """Valor em dólar no formato da mensagem ($   71.78K)"""
+    for unit, scale in (('B', 1e9), ('M', 1e6), ('K', 1e3)):
+        if value >= scale:
+            return f"$ {value / scale:>8.2f}{unit}"
+    return f"$ {value:>9.2f}"
+
+
+def _log_uniform(rng: random.Random, low: float, high: float) -> float:
+    """Valores espalhados em várias ordens de grandeza (contagens, volumes, market cap)"""
+    return 10 ** rng.uniform(low, high)
+
+
+def generate_token_message(rng: random.Random) -> Tuple[str, Dict[str, Any]]:
+    """Gera uma mensagem de token completa e os valores esperados após o parse.
+
+    Os valores esperados incluem nome, contrato e os campos inteiros (o parser os lê sem
+    arredondamento); os demais campos passam pela formatação com 2 casas.
+    """
+    name = ' '.join(rng.sample(NAME_WORDS, rng.randint(1, 3)))
+    symbol = ''.join(word[0] for word in name.split()).upper() + ''.join(rng.choice(string.ascii_uppercase) for _ in range(2))
+    contract_address = _base58(rng, 40) + rng.choice(['pump', 'bonk'])
+
+    market_cap = _log_uniform(rng, 3.5, 7.5)
+    buy_volume = market_cap * rng.uniform(0.2, 3.0)
+    sell_volume = buy_volume * rng.uniform(0.5, 1.1)
+    traders = int(_log_uniform(rng, 1, 4))
+    buyers = max(int(traders * rng.uniform(0.6, 1.0)), 1)
+    sellers = int(traders * rng.uniform(0.2, 0.9))
+    buy_count = int(buyers * rng.uniform(1.0, 3.0))
+    sell_count = int(sellers * rng.uniform(1.0, 3.0))
+    price_change = rng.uniform(-90, 900)
+
+    holders = max(int(traders * rng.uniform(0.5, 1.2)), 10)
+    wallets = {
+        'Holders Totais': holders,
+        'Smart Wallets': rng.randint(0, 5),
+        'Fresh Wallets': int(holders * rng.uniform(0, 0.4)),
+        'Renowned Wallets': rng.randint(0, 10),
+        'Creator Wallets': rng.randint(0, 2),
+        'Sniper Wallets': rng.randint(0, 30),
+        'Rat Traders': rng.randint(0, 8),
+        'Whale Wallets': rng.randint(0, 4),
+        'Top Wallets': int(holders * rng.uniform(0, 0.2)),
+        'Following Wallets': rng.randint(0, 3),
+        'Bluechip Holders': rng.randint(0, 6),
+        'Bundler Wallets': int(holders * rng.uniform(0, 1.5)),
+    }
+    risk = {
+        'Bluechip Holders': rng.uniform(0, 5),
+        'Rat Trader Supply': rng.uniform(0, 10),
+        'Bundler Supply': rng.uniform(0, 80),
+        'Entrapment Supply': rng.uniform(0, 15),
+    }
+
+    degen_calls = rng.randint(0, 40)
+    technical_signals = rng.randint(0, 12)
+
+    holder_percentages = sorted((rng.uniform(0.5, 8) for _ in range(10)), reverse=True)
+    holder_sol = [_log_uniform(rng, -2, 3.3) for _ in range(10)]
+    source_count = rng.randint(1, 19)
+    source_hops = [rng.randint(1, 5) for _ in range(source_count)]
+
+    lines = [
+        f"{name} ({symbol})",
+        f"├ {contract_address}",
+        f"└ Age: {rng.randint(1, 28):02d}/07/2025 - {rng.randint(1, 59)}s",
+        "",
+        "👨‍💻 Creator:",
+        f"└ {_base58(rng, 44)}",
+        "",
+        "🏭 Factory Info:",
+        f"├ Plataform:     {'PUMP' if contract_address.endswith('pump') else 'BONK'}",
+        f"└ Bonding Curve:  {rng.uniform(0, 100):.2f}%".replace('.', ','),
+        "",
+        "📊 Market Overview (1h):",
+        f"├ Market Cap:     {_money(market_cap)}",
+        f"├ Buy Volume:     {_money(buy_volume)}",
+        f"├ Sell Volume:    {_money(sell_volume)}",
+        f"├ Price%:            {price_change:+.2f}%",
+        f"├ Traders:          {traders:>8}",
+        f"├ Buy Count:        {buy_count:>8}",
+        f"├ Sell Count:       {sell_count:>8}",
+        f"├ Buyers:           {buyers:>8}",
+        f"└ Sellers:          {sellers:>8}",
+        "",
+        "📊 Wallet Insights:",
+    ]
+    for position, (label, value) in enumerate(wallets.items()):
+        branch = '└' if position == len(wallets) - 1 else '├'
+        lines.append(f"{branch} {label + ':':<20}{value:>12}")
+    lines += ["", "📈 Risk Metrics:"]
+    for label, value in risk.items():
+        lines.append(f"├ % {label + ':':<22}{value:>6.2f}%")
+    lines.append(f"├ {'Degen Calls:':<24}{degen_calls:>6}")
+    lines.append(f"└ {'Sinais Técnicos:':<24}{technical_signals:>6}")
+    lines += ["", f"📊 Top 10 Holders: {sum(holder_percentages):.2f}%"]
+    for position, (percentage, sol) in enumerate(zip(holder_percentages, holder_sol), 1):
+        branch = '└' if position == 10 else '├'
+        lines.append(f"{branch} {position:>2}. {_short_wallet(rng)} - {percentage:>5.2f}% - {sol:>6.2f} SOL{rng.choice(HOLDER_TAGS)}")
+    lines += ["", f"🔍 Source Wallets: {rng.uniform(1, 60):.2f}%"]
+    for position, hops in enumerate(source_hops):
+        branch = '└' if position == source_count - 1 else '├'
+        source = rng.choice(EXCHANGES) if rng.random() < 0.3 else _short_wallet(rng)
+        lines.append(f"{branch} {source:<13} - {hops:>2} hops {rng.uniform(0.5, 6):>5.2f}%")
+    lines += [
+        "",
+        "🌐 Social Links:",
+        "├ Twitter",
+        f"│ └ Perfil - {rng.randint(0, 5000)} Followers",
+        "│   └ Status",
+        "└ AXI",
+    ]
+
+    expected = {
+        'token_name': name,
+        'contract_address': contract_address,
+        'traders': traders, 'buy_count': buy_count, 'sell_count': sell_count,
+        'buyers': buyers, 'sellers': sellers,
+        'holders_totais': holders,
+        'bundler_wallets': wallets['Bundler Wallets'],
+        'degen_calls': degen_calls, 'sinais_tecnicos': technical_signals,
+        'source_wallets_count': source_count,
+    }
+    return '\n'.join(lines), expected
+
+
+def generate_messages(count: int, seed: int = 0) -> List[str]:
+    """Lista de mensagens sintéticas reproduzível pela semente"""
+    rng = random.Random(seed)
+    return [generate_token_message(rng)[0] for _ in range(count)]
+
+
+if __name__ == '__main__':
+    print(generate_messages(1)[0])
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Atraso do event loop e latência do /stats com comparações pesadas enfileiradas.
+
+Simula uma rajada de mensagens de comparação enquanto o /stats é disparado
+periodicamente, com as mesmas consultas do comando (contagem e último token) em um
+banco temporário, e mede quanto tempo ele leva para responder em três cenários:
+tudo no event loop, comandos na mesma fila do worker e comandos na fila de consultas.
+
+Uso: python -m benchmarks.loop_lag [--tokens 200000] [--messages 20]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Dict, Any
+from config import Config
+from database import TokenDatabase
+from message_parser import MessageParser
+from similarity_calculator import SimilarityCalculator
+from work_executor import WorkExecutor, EventLoopLagMonitor
+from benchmarks.bench import build_matrix
+from benchmarks.generator import generate_messages
+
+SCENARIOS = (
+    ('no event loop', None),
+    ('fila única', 'run'),
+    ('fila de consultas', 'query'),
+)
+
+
+def _stats_queries(database: TokenDatabase):
+    """Consultas do /stats (contagem e último token)"""
+    return database.get_tokens_count(), database.get_tokens_list(1)
+
+
+async def _simulate(calculator, matrix, targets, database, lane, command_interval: float = 0.05) -> Dict[str, Any]:
+    executor = WorkExecutor(max_pending=Config.EXECUTOR_MAX_PENDING)
+    monitor = EventLoopLagMonitor(interval=0.01)
+    monitor.start()
+    command_latencies = []
+
+    def compare(target):
+        return calculator.find_top_k_similar(target, matrix, Config.NOTIFICATION_TOP_MATCHES)
+
+    async def handle_comparison(target):
+        if lane is None:
+            compare(target)
+        else:
+            await executor.run(compare, target)
+
+    async def stats_command():
+        if lane is None:
+            return _stats_queries(database)
+        return await getattr(executor, lane)(_stats_queries, database)
+
+    async def command_loop(done: asyncio.Event):
+        while not done.is_set():
+            sent = time.perf_counter()
+            await stats_command()
+            command_latencies.append(time.perf_counter() - sent)
+            await asyncio.sleep(command_interval)
+
+    done = asyncio.Event()
+    commands = asyncio.create_task(command_loop(done))
+    await asyncio.sleep(0)  # Primeiro /stats sai junto com a rajada
+    start = time.perf_counter()
+    await asyncio.gather(*(handle_comparison(target) for target in targets))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await commands
+    monitor.stop()
+    executor.shutdown()
+
+    ordered = sorted(command_latencies)
+    return {
+        'total_time': elapsed,
+        'lag_max': monitor.stats['max_lag'],
+        'lag_p99': monitor.percentile(0.99),
+        'commands': len(ordered),
+        'command_p99': ordered[min(int(0.99 * len(ordered)), len(ordered) - 1)] if ordered else 0.0,
+        'command_max': ordered[-1] if ordered else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Atraso do event loop e latência do /stats com e sem o executor')
+    parser.add_argument('--tokens', type=int, default=200000)
+    parser.add_argument('--messages', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    message_parser = MessageParser()
+    pool = [message_parser.parse_token_message(text) for text in generate_messages(1000)]
+    targets = [message_parser.parse_token_message(text) for text in generate_messages(args.messages, seed=1)]
+    matrix = build_matrix(pool, args.tokens)
+    calculator = SimilarityCalculator()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    original_file = Config.DATABASE_FILE
+    Config.DATABASE_FILE = path
+    try:
+        database = TokenDatabase()
+        database.save_tokens_batch([(token, i, None) for i, token in enumerate(pool)])
+
+        print(f"⏱️ {args.messages} comparações contra {args.tokens} tokens, /stats a cada 50ms")
+        print("=" * 50)
+        for label, lane in SCENARIOS:
+            result = asyncio.run(_simulate(calculator, matrix, targets, database, lane))
+            print(f"{label:<18} total {result['total_time']:.2f}s | atraso p99 {result['lag_p99'] * 1000:.1f}ms "
+                  f"máx {result['lag_max'] * 1000:.1f}ms | /stats p99 {result['command_p99'] * 1000:.1f}ms "
+                  f"máx {result['command_max'] * 1000:.1f}ms ({result['commands']} comandos)")
+    finally:
+        Config.DATABASE_FILE = original_file
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
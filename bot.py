@@ -7,7 +7,12 @@ from telegram.ext import Application, MessageHandler, CommandHandler, filters, C
 from config import Config
 from database import TokenDatabase
 from message_parser import MessageParser
+from parse_cache import ParseCache
+from duplicate_clusters import find_duplicate_clusters, format_clusters
 from similarity_calculator import SimilarityCalculator
+from comparison_report import ComparisonDecision, ReportRenderer
+from scoring_plan import ScoringPlan, DEFAULT_SECTION_WEIGHTS
+from work_executor import WorkExecutor, EventLoopLagMonitor
 
 # Configuração de logging
 logging.basicConfig(
@@ -19,8 +24,36 @@ logger = logging.getLogger(__name__)
 class SimilarityBot:
     def __init__(self):
         self.database = TokenDatabase()
-        self.parser = MessageParser()
-        self.similarity_calculator = SimilarityCalculator()
+        self.parser = MessageParser(cache=ParseCache(Config.PARSE_CACHE_SIZE, Config.PARSE_CACHE_BYTES))
+        self.similarity_calculator = SimilarityCalculator.from_database(self.database)
+        self.scoring_plan = self.similarity_calculator.scoring_plan
+        self.database.attach_score_cache(self.similarity_calculator.pair_cache)
+        self.database.attach_score_cache(self.similarity_calculator.section_cache)
+        # Relatórios de notificação memoizados por (alvo, token similar)
+        self.report_renderer = ReportRenderer(self.similarity_calculator, Config.REPORT_CACHE_SIZE)
+        self.database.attach_score_cache(self.report_renderer)
+        if self.similarity_calculator.lsh_index is not None:
+            self.database.attach_token_index(self.similarity_calculator.lsh_index)
+        
+        # Parse, similaridade e SQLite rodam no executor (fila limitada), fora do event loop
+        self.executor = WorkExecutor(max_pending=Config.EXECUTOR_MAX_PENDING)
+        self.lag_monitor = EventLoopLagMonitor(Config.LOOP_LAG_INTERVAL, Config.LOOP_LAG_WARNING)
+        # Pré-estágio: mensagens de contratos repetidos descartadas antes do parse completo
+        self.prefilter_stats = {'screened': 0, 'displayed': 0, 'duplicates': 0}
+    
+    def _load_scoring_plan(self):
+        """Aplica os pesos persistidos no banco (settings) ao calculador"""
+        self.scoring_plan = self.similarity_calculator.load_scoring_plan(self.database)
+    
+    async def _save_scoring_plan(self, scoring_plan):
+        """Persiste o plano na fila de consultas e agenda a troca no worker, sem esperar as comparações.
+        
+        As comparações já enfileiradas terminam com o plano anterior; self.scoring_plan passa a
+        valer na hora para os próximos /weights.
+        """
+        await self.executor.query(self.database.set_section_weights, scoring_plan.to_json())
+        self.scoring_plan = scoring_plan
+        self.executor.run_in_background(self.similarity_calculator.set_scoring_plan, scoring_plan)
     
     def _validate_html_message(self, message: str) -> str:
         """Valida e corrige HTML na mensagem antes de enviar"""
@@ -50,8 +83,16 @@ class SimilarityBot:
             return
         
         try:
-            # Parse da mensagem
-            token_data = self.parser.parse_token_message(message_text)
+            # Parse da mensagem, precedido por um pré-estágio barato: só o contrato, conferido nos
+            # conjuntos de dedupe em memória; repetições não passam pelo parse nem pelo cálculo de similaridade
+            repeated, token_data = await self.executor.run(self._parse_unless_repeated, message_text, str(chat_id))
+            if repeated is not None:
+                kind, contract_address, existing_token, token_name = repeated
+                if kind == 'duplicate':
+                    await self._reply_duplicate(update, token_name, contract_address, existing_token)
+                else:
+                    logger.info(f"⏭️ Contrato já exibido - mensagem ignorada antes do parse (CA: {contract_address})")
+                return
             
             # Captura entidades de link da mensagem (para hiperlinks invisíveis)
             message_entities = update.message.entities if update.message.entities else []
@@ -85,20 +126,50 @@ class SimilarityBot:
     
     def _is_token_message(self, message_text: str) -> bool:
         """Verifica se a mensagem contém informações de token"""
-        # Procura por padrões característicos das mensagens de token
-        indicators = [
-            '📊 Market Overview',
-            'Market Cap:',
-            '📊 Wallet Insights',
-            '📈 Risk Metrics',
-            '📊 Top 10 Holders',
-            
-            # Mantém compatibilidade com formato antigo
-            '👥 Wallet Statistics',
-            '📊 Top 20 Holders'
-        ]
-        
-        return any(indicator in message_text for indicator in indicators)
+        return self.parser.is_token_message(message_text)
+    
+    def _screen_repeated_message(self, message_text, chat):
+        """Confere o contrato da mensagem antes do parse (roda no executor).
+        
+        Retorna (tipo, contrato, token existente, nome) para contratos já exibidos no grupo de
+        comparação ('displayed') ou já salvos no grupo de banco ('duplicate'), senão None.
+        """
+        self.prefilter_stats['screened'] += 1
+        contract_address = self.parser.extract_contract_address(message_text)
+        if not contract_address:
+            return None
+        
+        if chat == Config.COMPARISON_GROUP_ID and self.database.has_displayed_contract(contract_address):
+            self.prefilter_stats['displayed'] += 1
+            return 'displayed', contract_address, None, None
+        
+        if chat == Config.DATABASE_GROUP_ID and self.database.has_contract(contract_address):
+            # O store diz que existe; a consulta traz (id, nome, timestamp) para o aviso
+            existing_token = self.database.is_contract_already_in_database(contract_address)
+            if existing_token:
+                self.prefilter_stats['duplicates'] += 1
+                return 'duplicate', contract_address, existing_token, self.parser.extract_token_name(message_text)
+        return None
+    
+    def _parse_unless_repeated(self, message_text, chat):
+        """Pré-estágio e parse em um único job do executor: (repetição, None) ou (None, token_data)"""
+        repeated = self._screen_repeated_message(message_text, chat)
+        if repeated is not None:
+            return repeated, None
+        return None, self.parser.parse_token_message(message_text)
+    
+    def _store_token(self, token_data, message_id, chat_id):
+        """Salva o token se o contrato ainda não estiver no banco (roda no executor).
+        
+        Retorna o token existente (id, nome, timestamp) quando é duplicata, senão None.
+        """
+        contract_address = token_data.get('contract_address')
+        if contract_address:
+            existing_token = self.database.is_contract_already_in_database(contract_address)
+            if existing_token:
+                return existing_token
+        self.database.save_token_info(token_data, message_id, chat_id)
+        return None
     
     async def _handle_database_message(self, token_data, message_id, chat_id, update, context):
         """Manipula mensagens do grupo de banco de dados"""
@@ -106,32 +177,13 @@ class SimilarityBot:
             token_name = token_data.get('token_name', 'Token desconhecido')
             contract_address = token_data.get('contract_address')
             
-            # Verifica se o contrato já existe no banco de dados
-            if contract_address:
-                existing_token = self.database.is_contract_already_in_database(contract_address)
-                
-                if existing_token:
-                    # Token já existe - envia aviso
-                    existing_id, existing_name, existing_timestamp = existing_token
-                    logger.info(f"Token duplicado detectado: {token_name} (CA: {contract_address})")
-                    
-                    warning_message = (
-                        f"⚠️ **TOKEN DUPLICADO DETECTADO**\n\n"
-                        f"📋 **Token atual:** {token_name}\n"
-                        f"🔍 **Endereço:** `{contract_address}`\n\n"
-                        f"💾 **Já existe no banco de dados:**\n"
-                        f"• **Nome:** {existing_name}\n"
-                        f"• **ID:** {existing_id}\n"
-                        f"• **Salvo em:** {existing_timestamp}\n\n"
-                        f"❌ **Token NÃO foi salvo** para evitar duplicatas.\n"
-                        f"🗑️ Use `/del {contract_address}` para remover o token existente se necessário."
-                    )
-                    
-                    await update.message.reply_text(warning_message, parse_mode='Markdown')
-                    return
+            # Verifica duplicata e salva em um único job (sem corrida entre mensagens do mesmo contrato)
+            existing_token = await self.executor.run(self._store_token, token_data, message_id, chat_id)
             
-            # Salva no banco de dados
-            self.database.save_token_info(token_data, message_id, chat_id)
+            if existing_token:
+                # Token já existe - envia aviso
+                await self._reply_duplicate(update, token_name, contract_address, existing_token)
+                return
             
             logger.info(f"Token salvo no banco de dados: {token_name}")
             
@@ -145,74 +197,128 @@ class SimilarityBot:
             logger.error(f"Erro ao salvar no banco de dados: {e}")
             await update.message.reply_text("❌ Erro ao salvar token no banco de dados.")
     
+    async def _reply_duplicate(self, update, token_name, contract_address, existing_token):
+        """Avisa no grupo de banco que o contrato já está salvo"""
+        existing_id, existing_name, existing_timestamp = existing_token
+        logger.info(f"Token duplicado detectado: {token_name} (CA: {contract_address})")
+        
+        warning_message = (
+            f"⚠️ **TOKEN DUPLICADO DETECTADO**\n\n"
+            f"📋 **Token atual:** {token_name}\n"
+            f"🔍 **Endereço:** `{contract_address}`\n\n"
+            f"💾 **Já existe no banco de dados:**\n"
+            f"• **Nome:** {existing_name}\n"
+            f"• **ID:** {existing_id}\n"
+            f"• **Salvo em:** {existing_timestamp}\n\n"
+            f"❌ **Token NÃO foi salvo** para evitar duplicatas.\n"
+            f"🗑️ Use `/del {contract_address}` para remover o token existente se necessário."
+        )
+        
+        await update.message.reply_text(warning_message, parse_mode='Markdown')
+    
     async def _handle_comparison_message(self, token_data, update, context):
         """Manipula mensagens do grupo de comparação"""
         try:
-            # Busca todos os tokens do banco de dados
-            database_tokens = self.database.get_all_tokens()
-            
-            if not database_tokens:
+            # Usa a matriz de features residente em memória (sem consultar o SQLite)
+            if not len(self.database.token_store):
                 await update.message.reply_text("📭 Banco de dados vazio. Adicione tokens no grupo de banco de dados primeiro.")
                 return
             
-            # Encontra o token mais similar
-            most_similar_token, similarity, section_similarities = self.similarity_calculator.find_most_similar_token(
-                token_data, database_tokens
-            )
-            
-            # Verifica se já foi exibido anteriormente (usando endereço de contrato)
-            contract_address = token_data.get('contract_address')
-            
-            if contract_address and self.database.is_contract_already_displayed(contract_address):
-                # Não exibe nada se já foi mostrado antes
-                return
-            
-            # Verifica se a similaridade atende ao threshold mínimo
-            min_threshold = self.database.get_min_similarity_threshold()
-            
-            if similarity < min_threshold:
-                # Não exibe nada se estiver abaixo do threshold
+            # Decisão e renderização rodam no executor: o event loop segue atendendo comandos
+            notification = await self.executor.run(self._prepare_notification, token_data)
+            if notification is None:
                 return
-            
-            # Marca contrato como exibido para evitar repetições futuras
-            token_name = token_data.get('token_name', 'Token desconhecido')
-            if contract_address:
-                self.database.mark_contract_as_displayed(contract_address, token_name, similarity)
-            
-            # Cria relatório completo com formatação mono-espaçada
-            enhanced_message = self.similarity_calculator.create_enhanced_message(
-                token_name, most_similar_token, similarity, section_similarities, 
-                token_data.get('raw_message', ''), contract_address
-            )
-            
-            # Adiciona comparação lado a lado dentro do mesmo bloco de código
-            if most_similar_token:
-                side_by_side_comparison = self.similarity_calculator.create_side_by_side_comparison(
-                    token_data, most_similar_token, section_similarities
-                )
-                
-                # Remove apenas o fechamento ``` do final e adiciona a comparação
-                if enhanced_message.endswith("```"):
-                    enhanced_message = enhanced_message[:-3]  # Remove apenas os últimos 3 caracteres
-                enhanced_message += side_by_side_comparison
-                
-                # Adiciona social links no rodapé se estiverem disponíveis
-                social_links_section = self.similarity_calculator.get_social_links_section(
-                    token_data.get('raw_message', ''), 
-                    token_data.get('message_entities', [])
-                )
-                if social_links_section:
-                    enhanced_message += "\n" + social_links_section + "\n"
-                
-                enhanced_message += "```"
+            decision, enhanced_message = notification
             
             # Envia notificação APENAS para o grupo de notificação
-            await self._send_notification_to_group(context, enhanced_message, token_name, similarity)
+            await self._send_notification_to_group(context, enhanced_message, decision.token_name, decision.similarity)
             
         except Exception as e:
             logger.error(f"Erro ao comparar tokens: {e}")
             # Não envia mensagem de erro no grupo de comparação, apenas no log
     
+    def _prepare_notification(self, token_data):
+        """Decide, marca o contrato como exibido e renderiza o relatório (None = não notificar)"""
+        # Estágio de decisão (barato): score, dedupe e threshold
+        decision = self._decide_comparison(token_data)
+        if decision is None:
+            return None
+        
+        # Store compacto: os números exibidos vêm das linhas do banco, não dos valores quantizados
+        if self.database.token_store.compact:
+            decision = self._with_exact_tokens(decision)
+        
+        # Marca contrato como exibido para evitar repetições futuras
+        if decision.contract_address:
+            self.database.mark_contract_as_displayed(decision.contract_address, decision.token_name, decision.similarity)
+        
+        # Estágio de renderização: só executado quando a notificação é certa
+        enhanced_message = self.report_renderer.render(decision)
+        logger.info(f"🖨️ Relatório renderizado em {self.report_renderer.stats['last_render_time'] * 1000:.1f}ms "
+                    f"({self.report_renderer.stats['hits']} reaproveitados)")
+        return decision, enhanced_message
+    
+    def _with_exact_tokens(self, decision):
+        """Troca os tokens materializados do store pelas linhas exatas do banco (mesmos scores)"""
+        exact_tokens = self.database.get_tokens_by_ids(token.get('id') for token, _, _ in decision.top_matches)
+        top_matches = [(exact_tokens.get(token.get('id'), token), similarity, section_sims)
+                       for token, similarity, section_sims in decision.top_matches]
+        return ComparisonDecision(decision.token_data, top_matches)
+    
+    def _decide_comparison(self, token_data):
+        """Encontra os tokens similares e decide se há notificação (None = não notificar)"""
+        # Threshold de exibição (usado também para podar candidatos que não podem alcançá-lo)
+        min_threshold = self.database.get_min_similarity_threshold()
+        pruning_threshold = min_threshold if Config.SIMILARITY_PRUNING else None
+        
+        if Config.SIMILARITY_STREAMING:
+            # Lê o banco em lotes pelo cursor: memória limitada a um lote por mensagem
+            top_matches = self.similarity_calculator.find_top_k_streaming(
+                token_data, self.database.iter_token_features(), Config.NOTIFICATION_TOP_MATCHES, pruning_threshold
+            )
+        else:
+            top_matches = self._find_resident_matches(token_data, min_threshold, pruning_threshold)
+        decision = ComparisonDecision(token_data, top_matches)
+        
+        if pruning_threshold is not None:
+            search_stats = self.similarity_calculator.search_stats
+            logger.info(f"✂️ Poda: {search_stats['last_pruned']}/{search_stats['last_candidates']} candidatos descartados (threshold {min_threshold:.1f}%)")
+        
+        # Verifica se já foi exibido anteriormente (usando endereço de contrato)
+        if decision.contract_address and self.database.is_contract_already_displayed(decision.contract_address):
+            # Não exibe nada se já foi mostrado antes
+            return None
+        
+        # Verifica se a similaridade atende ao threshold mínimo
+        if decision.similarity < min_threshold:
+            # Não exibe nada se estiver abaixo do threshold
+            return None
+        
+        return decision
+    
+    def _find_resident_matches(self, token_data, min_threshold, pruning_threshold):
+        """Busca os tokens mais similares na matriz residente (o primeiro é o melhor)"""
+        database_tokens = self.database.get_token_matrix()
+        
+        # Pré-filtro SQL: busca só os tokens dentro das faixas de razão das colunas indexadas
+        range_prefilter = self.similarity_calculator.range_prefilter
+        if pruning_threshold is not None and range_prefilter.enabled:
+            where_sql, params = range_prefilter.predicates(token_data, min_threshold, self.similarity_calculator.vectorized)
+            total_tokens = len(database_tokens)
+            database_tokens = self.database.get_candidate_matrix(where_sql, params)
+            range_prefilter.record(total_tokens, len(database_tokens))
+            logger.info(f"🔎 Pré-filtro SQL ({range_prefilter.mode}): {len(database_tokens)}/{total_tokens} candidatos")
+            if not len(database_tokens):
+                return []
+        
+        # Encontra os tokens mais similares em uma única passada
+        if Config.NOTIFICATION_TOP_MATCHES > 1:
+            return self.similarity_calculator.find_top_k_similar(
+                token_data, database_tokens, Config.NOTIFICATION_TOP_MATCHES, pruning_threshold
+            )
+        best_match = self.similarity_calculator.find_best_match(token_data, database_tokens, pruning_threshold)
+        return [best_match] if best_match[0] is not None else []
+    
     async def _handle_notification_message(self, token_data, update, context):
         """Manipula mensagens do grupo de notificação"""
         # O grupo de notificação é apenas para receber notificações
@@ -251,6 +357,7 @@ class SimilarityBot:
                 'Risk Metrics:',
                 'Source Wallets:',
                 'Similaridades por seção:',
+                'Similares:',
                 'Social Links:'
             ]
             
@@ -395,14 +502,15 @@ class SimilarityBot:
             
         try:
             # Busca todos os tokens do banco
-            database_tokens = self.database.get_all_tokens()
+            database_tokens = await self.executor.query(self.database.get_all_tokens)
             
             if not database_tokens:
                 await update.message.reply_text("📭 Banco de dados vazio. Nenhum token encontrado.")
                 return
             
-            # Gera conteúdo do arquivo
-            txt_content = self._generate_database_txt(database_tokens)
+            # Gera conteúdo do arquivo (formatação longa: fica no worker, fora da fila de consultas)
+            txt_content = await self.executor.run(self._generate_database_txt, database_tokens)
+            txt_content += "\n" + await self.executor.run(self._generate_clusters_txt)
             
             # Cria arquivo em memória
             file_buffer = io.BytesIO()
@@ -426,6 +534,26 @@ class SimilarityBot:
             logger.error(f"Erro ao gerar arquivo de database: {e}")
             await update.message.reply_text("❌ Erro ao gerar arquivo do banco de dados.")
     
+    def _generate_clusters_txt(self):
+        """Gera a seção de clusters de tokens quase idênticos (similaridade token x token)"""
+        matrix = self.database.get_token_matrix()
+        threshold = Config.DUPLICATE_CLUSTER_THRESHOLD
+        
+        if len(matrix) > Config.DUPLICATE_CLUSTER_MAX_TOKENS:
+            return "\n".join([
+                "🧬 CLUSTERS DE TOKENS QUASE IDÊNTICOS",
+                "-" * 60,
+                f"⚠️ Banco com {len(matrix)} tokens: rode python duplicate_clusters.py para calcular os clusters",
+                ""
+            ])
+        
+        def log_progress(done, total):
+            if done == total or done % 10 == 0:
+                logger.info(f"🧬 Clusters: {done}/{total} blocos processados")
+        
+        clusters = find_duplicate_clusters(self.similarity_calculator, matrix, threshold, progress=log_progress)
+        return "\n".join(format_clusters(clusters, threshold))
+    
     def _generate_database_txt(self, tokens):
         """Gera conteúdo TXT com dados dos tokens"""
         content = []
@@ -495,7 +623,7 @@ class SimilarityBot:
         
         try:
             # Verifica quantos tokens existem
-            token_count = self.database.get_tokens_count()
+            token_count = await self.executor.query(self.database.get_tokens_count)
             
             if token_count == 0:
                 await update.message.reply_text("📭 Banco de dados já está vazio.")
@@ -521,7 +649,7 @@ class SimilarityBot:
             # Confirmação recebida - executa limpeza
             user_id = update.effective_user.id if update.effective_user else "desconhecido"
             logger.info(f"Limpeza do banco de dados solicitada por usuário {user_id}")
-            deleted_count = self.database.clear_all_tokens()
+            deleted_count = await self.executor.run(self.database.clear_all_tokens)
             
             success_text = (
                 f"✅ **BANCO DE DADOS LIMPO COM SUCESSO!**\n\n"
@@ -543,7 +671,8 @@ class SimilarityBot:
             return
         
         try:
-            token_count = self.database.get_tokens_count()
+            # Consultas na fila própria: o /stats não espera as comparações enfileiradas
+            token_count = await self.executor.query(self.database.get_tokens_count)
             
             if token_count == 0:
                 stats_text = (
@@ -554,15 +683,42 @@ class SimilarityBot:
                 )
             else:
                 # Busca último token adicionado
-                tokens = self.database.get_all_tokens()
-                latest_token = max(tokens, key=lambda x: x.get('id', 0))
+                _, latest_name, latest_timestamp = (await self.executor.query(self.database.get_tokens_list, 1))[0]
+                search_stats = self.similarity_calculator.search_stats
+                cache_stats = self.similarity_calculator.pair_cache.stats
+                section_stats = self.similarity_calculator.section_cache.stats
+                prefilter_stats = self.similarity_calculator.range_prefilter.stats
+                lag = self.lag_monitor.summary()
+                executor_stats = self.executor.stats
+                parser_stats = self.parser.stats
+                parse_cache_stats = self.parser.cache.stats
+                screened = self.prefilter_stats
                 
                 stats_text = (
                     f"📊 **ESTATÍSTICAS DO BANCO**\n\n"
                     f"✅ Status: **Ativo**\n"
                     f"🔢 Total de tokens: **{token_count}**\n"
-                    f"🆕 Último adicionado: **{latest_token.get('token_name', 'N/A')}**\n"
-                    f"📅 Data do último: **{latest_token.get('timestamp', 'N/A')}**\n\n"
+                    f"🆕 Último adicionado: **{latest_name or 'N/A'}**\n"
+                    f"📅 Data do último: **{latest_timestamp or 'N/A'}**\n"
+                    f"✂️ Candidatos podados: **{search_stats['pruned']}** de **{search_stats['candidates']}** "
+                    f"({search_stats['searches']} buscas)\n"
+                    f"🧠 Cache de pares: **{cache_stats['hits']}** hits / **{cache_stats['misses']}** misses "
+                    f"({len(self.similarity_calculator.pair_cache)} pares em memória)\n"
+                    f"♻️ Reavaliações incrementais: **{section_stats['incremental']}** "
+                    f"({section_stats['reused_sections']} seções reaproveitadas)\n"
+                    f"🔎 Pré-filtro SQL ({self.similarity_calculator.range_prefilter.mode}): "
+                    f"**{prefilter_stats['filtered']}** tokens filtrados em {prefilter_stats['queries']} buscas\n"
+                    f"⏱️ Atraso do event loop: **{lag['last'] * 1000:.1f}ms** agora, p99 **{lag['p99'] * 1000:.1f}ms**, "
+                    f"máx **{lag['max'] * 1000:.1f}ms**\n"
+                    f"⚙️ Executor: **{executor_stats['completed']}** jobs, fila máx **{executor_stats['peak_pending']}**"
+                    f"/{self.executor.max_pending}, job mais longo **{executor_stats['max_run_time'] * 1000:.0f}ms**, "
+                    f"**{self.executor.query_stats['queries']}** consultas na fila própria\n"
+                    f"🧩 Parser ({self.parser.mode}): **{parser_stats['fallback_hits']}** campos via fallback em "
+                    f"{parser_stats['fallback_messages']} de {parser_stats['parsed']} mensagens\n"
+                    f"📨 Cache de parse: **{parse_cache_stats['hits']}** hits / **{parse_cache_stats['misses']}** misses "
+                    f"({len(self.parser.cache)} mensagens, {self.parser.cache.size_bytes // 1024} KB)\n"
+                    f"⏭️ Repetições descartadas antes do parse: **{screened['displayed'] + screened['duplicates']}** "
+                    f"de {screened['screened']} ({screened['displayed']} já exibidas, {screened['duplicates']} duplicadas)\n\n"
                     f"📝 Use `/database` para baixar relatório completo.\n"
                     f"🗑️ Use `/clear confirmar` para limpar todos os dados."
                 )
@@ -587,6 +743,7 @@ class SimilarityBot:
             f"🗑️ `/delete` - Exclusão seletiva de tokens (por ID, nome, etc.)\n"
             f"🗑️ `/del <endereço>` - Deleta token por endereço de contrato\n"
             f"🎯 `/threshold <valor>` - Define threshold mínimo de similaridade\n"
+            f"⚖️ `/weights` - Consulta/altera os pesos das seções ponderadas\n"
             f"🔄 `/reset confirmar` - Limpa lista de contratos já exibidos\n"
             f"📋 `/cas` - Lista todos os contratos salvos\n"
             f"💾 `/backup` - Cria backup do banco de dados\n"
@@ -705,7 +862,7 @@ NOTIFICATION_GROUP_ID={chat_id}
         
         try:
             token_id = int(context.args[1])
-            token_name = self.database.delete_token_by_id(token_id)
+            token_name = await self.executor.run(self.database.delete_token_by_id, token_id)
             
             if token_name:
                 await update.message.reply_text(
@@ -730,7 +887,7 @@ NOTIFICATION_GROUP_ID={chat_id}
             return
         
         token_name = " ".join(context.args[1:])
-        deleted_count = self.database.delete_token_by_name(token_name)
+        deleted_count = await self.executor.run(self.database.delete_token_by_name, token_name)
         
         if deleted_count > 0:
             await update.message.reply_text(
@@ -750,7 +907,7 @@ NOTIFICATION_GROUP_ID={chat_id}
         if not update.message:
             return
             
-        token_name = self.database.delete_last_token()
+        token_name = await self.executor.run(self.database.delete_last_token)
         
         if token_name:
             await update.message.reply_text(
@@ -779,7 +936,7 @@ NOTIFICATION_GROUP_ID={chat_id}
                 await update.message.reply_text("❌ ID inicial deve ser menor que o final.", parse_mode='Markdown')
                 return
             
-            deleted_count, token_names = self.database.delete_tokens_by_range(start_id, end_id)
+            deleted_count, token_names = await self.executor.run(self.database.delete_tokens_by_range, start_id, end_id)
             
             if deleted_count > 0:
                 tokens_text = ", ".join(token_names[:5])
@@ -805,7 +962,7 @@ NOTIFICATION_GROUP_ID={chat_id}
         if not update.message:
             return
             
-        tokens = self.database.get_tokens_list(20)
+        tokens = await self.executor.query(self.database.get_tokens_list, 20)
         
         if not tokens:
             await update.message.reply_text(
@@ -832,7 +989,7 @@ NOTIFICATION_GROUP_ID={chat_id}
         
         # Se não foram fornecidos argumentos, mostra informações
         if not context.args:
-            count = self.database.get_displayed_contracts_count()
+            count = await self.executor.query(self.database.get_displayed_contracts_count)
             await update.message.reply_text(
                 f"🔄 **CONTRATOS JÁ EXIBIDOS**\n\n"
                 f"📊 **Total atual:** {count} contratos\n\n"
@@ -844,7 +1001,7 @@ NOTIFICATION_GROUP_ID={chat_id}
         
         # Verifica se foi confirmado
         if context.args[0].lower() == 'confirmar':
-            count = self.database.clear_displayed_contracts()
+            count = await self.executor.run(self.database.clear_displayed_contracts)
             await update.message.reply_text(
                 f"✅ **Reset realizado com sucesso!**\n\n"
                 f"🗑️ **Contratos removidos:** {count}\n\n"
@@ -865,7 +1022,7 @@ NOTIFICATION_GROUP_ID={chat_id}
         
         # Se não foram fornecidos argumentos, mostra o valor atual
         if not context.args:
-            current_threshold = self.database.get_min_similarity_threshold()
+            current_threshold = await self.executor.query(self.database.get_min_similarity_threshold)
             await update.message.reply_text(
                 f"🎯 **THRESHOLD DE SIMILARIDADE**\n\n"
                 f"📊 **Valor atual:** {current_threshold:.1f}%\n\n"
@@ -890,8 +1047,8 @@ NOTIFICATION_GROUP_ID={chat_id}
                 return
             
             # Salva o novo threshold
-            old_threshold = self.database.get_min_similarity_threshold()
-            self.database.set_min_similarity_threshold(new_threshold)
+            old_threshold = await self.executor.query(self.database.get_min_similarity_threshold)
+            await self.executor.query(self.database.set_min_similarity_threshold, new_threshold)
             
             await update.message.reply_text(
                 f"✅ **Threshold atualizado com sucesso!**\n\n"
@@ -909,6 +1066,66 @@ NOTIFICATION_GROUP_ID={chat_id}
                 parse_mode='Markdown'
             )
 
+    async def weights_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando para consultar/alterar os pesos das seções ponderadas"""
+        if not update.message:
+            return
+        
+        scoring_plan = self.scoring_plan
+        
+        # Sem argumentos: mostra os pesos atuais
+        if not context.args:
+            lines = ["⚖️ **PESOS DAS SEÇÕES**\n"]
+            for section_name, weights in scoring_plan.section_weights.items():
+                lines.append(f"📊 `{section_name}` (total: {sum(weights.values()):g})")
+                for field, weight in weights.items():
+                    lines.append(f"   • `{field}`: {weight:g}")
+                lines.append("")
+            lines.append("💡 **Para alterar:** `/weights <seção> <campo> <peso>`")
+            lines.append("**Exemplo:** `/weights top_holders top1_holder_percentage 25`")
+            lines.append("🔄 **Restaurar padrões:** `/weights reset`")
+            await update.message.reply_text("\n".join(lines), parse_mode='Markdown')
+            return
+        
+        if context.args[0].lower() == 'reset':
+            new_plan = ScoringPlan(scoring_plan.section_fields, DEFAULT_SECTION_WEIGHTS)
+            await self._save_scoring_plan(new_plan)
+            await update.message.reply_text("✅ **Pesos restaurados para os valores padrão.**", parse_mode='Markdown')
+            return
+        
+        if len(context.args) != 3:
+            await update.message.reply_text(
+                "❌ **Formato inválido!**\n\n"
+                "**Uso:** `/weights <seção> <campo> <peso>`",
+                parse_mode='Markdown'
+            )
+            return
+        
+        section_name, field, weight_text = context.args
+        try:
+            weight = float(weight_text)
+            if weight < 0 or weight > 100:
+                raise ValueError("O peso deve estar entre 0 e 100")
+            new_plan = scoring_plan.with_weight(section_name, field, weight)
+        except ValueError as e:
+            await update.message.reply_text(f"❌ Valor inválido: {e}")
+            return
+        
+        # Persiste e recompila o plano apenas quando há alteração
+        old_weight = scoring_plan.section_weights[section_name][field]
+        await self._save_scoring_plan(new_plan)
+        
+        total = new_plan.weight_totals()[section_name]
+        message = (
+            f"✅ **Peso atualizado!**\n\n"
+            f"📊 `{section_name}.{field}`: {old_weight:g} → {weight:g}\n"
+            f"⚖️ Total da seção: {total:g}"
+        )
+        if total != 100:
+            message += "\n\n⚠️ A soma dos pesos da seção difere de 100: a seção não chegará a 100% (ou passará de 100%)."
+        await update.message.reply_text(message, parse_mode='Markdown')
+        logger.info(f"Peso alterado: {section_name}.{field} {old_weight} -> {weight}")
+    
     async def del_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Comando para deletar token por endereço de contrato"""
         if not update.message:
@@ -935,7 +1152,7 @@ NOTIFICATION_GROUP_ID={chat_id}
             return
         
         # Verifica se o token existe antes de deletar
-        token_info = self.database.get_token_by_contract_address(contract_address)
+        token_info = await self.executor.query(self.database.get_token_by_contract_address, contract_address)
         
         if not token_info:
             await update.message.reply_text(
@@ -947,7 +1164,7 @@ NOTIFICATION_GROUP_ID={chat_id}
             return
         
         # Deleta o token
-        deleted_count, token_names = self.database.delete_token_by_contract_address(contract_address)
+        deleted_count, token_names = await self.executor.run(self.database.delete_token_by_contract_address, contract_address)
         
         if deleted_count > 0:
             token_names_text = ", ".join(token_names)
@@ -971,7 +1188,7 @@ NOTIFICATION_GROUP_ID={chat_id}
         
         try:
             # Busca todos os contratos salvos
-            contracts = self.database.get_all_contracts()
+            contracts = await self.executor.query(self.database.get_all_contracts)
             
             if not contracts:
                 await update.message.reply_text(
@@ -1045,7 +1262,7 @@ NOTIFICATION_GROUP_ID={chat_id}
         
         try:
             # Obtém informações do banco atual
-            db_info = self.database.get_database_info()
+            db_info = await self.executor.query(self.database.get_database_info)
             
             if not db_info.get('exists', False):
                 await update.message.reply_text(
@@ -1056,7 +1273,7 @@ NOTIFICATION_GROUP_ID={chat_id}
                 return
             
             # Cria o backup
-            success, message = self.database.create_backup()
+            success, message = await self.executor.run(self.database.create_backup)
             
             if success:
                 # Extrai o nome do arquivo da mensagem
@@ -1152,14 +1369,17 @@ NOTIFICATION_GROUP_ID={chat_id}
             
             try:
                 # Mostra informações do banco atual antes da restauração
-                current_db_info = self.database.get_database_info()
+                current_db_info = await self.executor.run(self.database.get_database_info)
                 
                 # Executa a restauração
-                success, message = self.database.restore_from_backup(backup_path, create_current_backup=True)
+                success, message = await self.executor.run(self.database.restore_from_backup, backup_path, create_current_backup=True)
                 
                 if success:
+                    # Pesos das seções vêm do banco restaurado
+                    await self.executor.run(self._load_scoring_plan)
+                    
                     # Obtém informações do banco restaurado
-                    new_db_info = self.database.get_database_info()
+                    new_db_info = await self.executor.run(self.database.get_database_info)
                     
                     await update.message.reply_text(
                         f"✅ **BANCO RESTAURADO COM SUCESSO!**\n\n"
@@ -1297,12 +1517,26 @@ def main():
         logger.error("IDs dos grupos não configurados!")
         return
     
-    # Cria a aplicação do bot
-    application = Application.builder().token(Config.BOT_TOKEN).build()
-    
     # Cria instância do bot
     bot = SimilarityBot()
     
+    async def post_init(application):
+        bot.lag_monitor.start()
+    
+    async def post_shutdown(application):
+        bot.lag_monitor.stop()
+        bot.executor.shutdown()
+    
+    # Cria a aplicação do bot (updates concorrentes: comandos não esperam a comparação em andamento)
+    application = (
+        Application.builder()
+        .token(Config.BOT_TOKEN)
+        .concurrent_updates(Config.CONCURRENT_UPDATES)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    
     # Adiciona handlers
     application.add_handler(CommandHandler("database", bot.database_command))
     application.add_handler(CommandHandler("clear", bot.clear_command))
@@ -1317,6 +1551,7 @@ def main():
     application.add_handler(CommandHandler("backup", bot.backup_command)) # Adicionado handler para /backup
     application.add_handler(CommandHandler("restore", bot.restore_command)) # Adicionado handler para /restore
     application.add_handler(CommandHandler("ailinks", bot.ailinks_command)) # Adicionado handler para /ailinks
+    application.add_handler(CommandHandler("weights", bot.weights_command)) # Adicionado handler para /weights
     application.add_handler(MessageHandler(
         filters.TEXT & ~filters.COMMAND, 
         bot.handle_message
@@ -0,0 +1,126 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Tuple, Optional, Iterable
+
+
+class ComparisonDecision:
+    """Resultado do estágio de decisão (score, dedupe e threshold): nada é formatado aqui"""
+
+    def __init__(self, token_data: Dict[str, Any],
+                 top_matches: List[Tuple[Dict[str, Any], float, Dict[str, float]]]):
+        self.token_data = token_data
+        self.token_name = token_data.get('token_name', 'Token desconhecido')
+        self.contract_address = token_data.get('contract_address')
+        self.top_matches = top_matches
+        if top_matches:
+            self.most_similar_token, self.similarity, self.section_similarities = top_matches[0]
+        else:
+            self.most_similar_token, self.similarity, self.section_similarities = None, 0.0, {}
+
+
+class ReportRenderer:
+    """Estágio de renderização: monta o relatório da notificação (enhanced + lado a lado + social links).
+
+    Só é chamado quando a notificação é certa. O texto é memoizado por (alvo, token similar);
+    a entrada é refeita se os scores mudarem e invalidada pelo TokenDatabase (como os caches
+    de scores) quando o token do banco é removido ou o banco é limpo/restaurado.
+    """
+
+    def __init__(self, calculator, max_entries: int = 256):
+        self.calculator = calculator
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (alvo, id do similar) -> (assinatura dos scores, texto)
+        self.stats = {'renders': 0, 'hits': 0, 'render_time': 0.0, 'last_render_time': 0.0}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def _target_key(token_data: Dict[str, Any]) -> bytes:
+        """Identifica a mensagem alvo (nome, contrato, texto e entidades de links)"""
+        entities = [
+            (getattr(entity, 'type', None), getattr(entity, 'offset', None),
+             getattr(entity, 'length', None), getattr(entity, 'url', None))
+            for entity in token_data.get('message_entities') or []
+        ]
+        content = repr((token_data.get('token_name'), token_data.get('contract_address'),
+                        token_data.get('raw_message', ''), entities))
+        return hashlib.blake2b(content.encode(), digest_size=16).digest()
+
+    def _signature(self, decision: ComparisonDecision) -> tuple:
+        """Tudo além do par (alvo, similar) que altera o texto renderizado"""
+        top_matches = tuple(
+            (token.get('id'), similarity, tuple(sorted(sections.items())))
+            for token, similarity, sections in decision.top_matches
+        )
+        return (decision.similarity, tuple(sorted(decision.section_similarities.items())),
+                top_matches, self.calculator.ai_links_enabled)
+
+    def render(self, decision: ComparisonDecision) -> str:
+        """Texto final da notificação (memoizado)"""
+        match_id = (decision.most_similar_token or {}).get('id')
+        key = (self._target_key(decision.token_data), match_id)
+        signature = self._signature(decision)
+
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == signature:
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[1]
+
+        start = time.perf_counter()
+        message = self._render(decision)
+        elapsed = time.perf_counter() - start
+        self.stats['renders'] += 1
+        self.stats['render_time'] += elapsed
+        self.stats['last_render_time'] = elapsed
+
+        if self.max_entries > 0:
+            self.entries[key] = (signature, message)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return message
+
+    def _render(self, decision: ComparisonDecision) -> str:
+        calculator = self.calculator
+        token_data = decision.token_data
+
+        # Cria relatório completo com formatação mono-espaçada
+        enhanced_message = calculator.create_enhanced_message(
+            decision.token_name, decision.most_similar_token, decision.similarity, decision.section_similarities,
+            token_data.get('raw_message', ''), decision.contract_address, decision.top_matches
+        )
+
+        # Adiciona comparação lado a lado dentro do mesmo bloco de código
+        if decision.most_similar_token:
+            side_by_side_comparison = calculator.create_side_by_side_comparison(
+                token_data, decision.most_similar_token, decision.section_similarities
+            )
+
+            # Remove apenas o fechamento ``` do final e adiciona a comparação
+            if enhanced_message.endswith("```"):
+                enhanced_message = enhanced_message[:-3]  # Remove apenas os últimos 3 caracteres
+            enhanced_message += side_by_side_comparison
+
+            # Adiciona social links no rodapé se estiverem disponíveis
+            social_links_section = calculator.get_social_links_section(
+                token_data.get('raw_message', ''),
+                token_data.get('message_entities', [])
+            )
+            if social_links_section:
+                enhanced_message += "\n" + social_links_section + "\n"
+
+            enhanced_message += "```"
+
+        return enhanced_message
+
+    def invalidate_ids(self, token_ids: Iterable[int]):
+        """Remove os relatórios cujo token similar foi removido do banco"""
+        token_ids = set(token_ids)
+        for key in [key for key in self.entries if key[1] in token_ids]:
+            del self.entries[key]
+
+    def clear(self):
+        self.entries.clear()
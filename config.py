@@ -14,6 +14,38 @@ class Config:
     
     # Configurações de similaridade
     MIN_SIMILARITY_THRESHOLD = 70  # Porcentagem mínima para considerar similar
+    PARSER_MODE = 'line'  # Parser de mensagens: 'line' (uma passada pelas linhas), 'combined' (um finditer com todos os campos) ou 'regex' (uma busca por campo)
+    PARSE_CACHE_SIZE = 1024  # Mensagens parseadas mantidas no cache por hash do texto (0 = desabilitado)
+    PARSE_CACHE_BYTES = 16 * 1024 * 1024  # Limite de memória (bytes estimados, ~11 KB por mensagem) do cache de parse
+    SIMILARITY_ENGINE = 'vectorized'  # Motor de cálculo: 'vectorized' (NumPy) ou 'scalar'
+    SIMILARITY_PRUNING = True  # Descarta candidatos que não podem alcançar o threshold de exibição
+    NOTIFICATION_TOP_MATCHES = 3  # Quantidade de tokens similares listados na notificação (1 = apenas o melhor)
+    REPORT_CACHE_SIZE = 256  # Relatórios de notificação memoizados por (alvo, token similar) (0 = desabilitado)
+    PAIR_CACHE_SIZE = 200000  # Pares (alvo, token do banco) mantidos no cache de scores (0 = desabilitado)
+    SQL_PREFILTER_MODE = 'off'  # Pré-filtro SQL por faixas (market_cap, holders, traders): 'off', 'fast' ou 'guaranteed'
+    SECTION_CACHE_CONTRACTS = 64  # Contratos com scores por seção guardados para reavaliação incremental
+    COMPACT_FEATURE_STORE = False  # Store residente em float16/uint16 log (~4x menos memória, erro <= 0.07 ponto)
+    SIMILARITY_STREAMING = False  # Compara lendo o SQLite em lotes (fetchmany) em vez da matriz residente
+    STREAMING_BATCH_SIZE = 1000  # Linhas por lote na comparação em streaming
+    SIMILARITY_WORKERS = 1  # Processos da busca particionada (1 = busca no próprio processo)
+    SHARDED_MIN_TOKENS = 100000  # Tamanho mínimo do banco para usar a busca particionada
+    EXECUTOR_MAX_PENDING = 32  # Jobs de CPU/SQLite em execução ou na fila do executor (acima disso aguardam vaga)
+    CONCURRENT_UPDATES = 8  # Updates do Telegram tratados em paralelo (comandos não esperam comparações)
+    LOOP_LAG_INTERVAL = 0.5  # Intervalo (s) da medição de atraso do event loop
+    LOOP_LAG_WARNING = 0.2  # Atraso (s) do event loop que gera aviso no log
+    DUPLICATE_CLUSTER_THRESHOLD = 95  # Similaridade mínima para agrupar tokens quase idênticos
+    DUPLICATE_CLUSTER_TILE = 1024  # Tamanho do bloco (tokens x tokens) do cálculo de clusters
+    DUPLICATE_CLUSTER_MAX_TOKENS = 3000  # Acima disso o /database não calcula clusters (O(n²) na fila das comparações, ~4s em 3000; use duplicate_clusters.py)
+    LSH_ENABLED = False  # Busca aproximada: buckets LSH (projeções aleatórias em escala log) selecionam candidatos
+    LSH_MIN_TOKENS = 20000  # Tamanho mínimo do banco para usar o índice LSH
+    LSH_TABLES = 8  # Tabelas de hash (mais tabelas = mais recall, mais candidatos)
+    LSH_BITS = 12  # Bits por tabela (mais bits = buckets menores, menos latência)
+    LSH_INDEX_FILE = 'lsh_index.npz'  # Índice salvo em disco (evita reconstruir na inicialização)
+    ANN_ENABLED = False  # Busca aproximada: índice KD-tree em escala log seleciona candidatos antes do cálculo exato
+    ANN_MIN_TOKENS = 20000  # Tamanho mínimo do banco para usar o índice ANN
+    ANN_CANDIDATES = 512  # Candidatos recuperados pelo índice e pontuados de forma exata
+    ANN_LEAF_SIZE = 64  # Pontos por folha da KD-tree
+    ANN_MAX_LEAVES = 32  # Folhas visitadas por consulta (limita o custo; None = vizinhos exatos no espaço log)
     
     # Configurações do banco de dados
     DATABASE_FILE = 'token_database.db' 
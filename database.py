@@ -2,12 +2,24 @@ import sqlite3
 import json
 from datetime import datetime
 from config import Config
+from scoring_plan import WEIGHTS_SETTING_KEY
+from token_store import TokenStore, FEATURE_FIELDS, META_FIELDS, encode_features, pack_features, unpack_features
+from range_prefilter import PREFILTER_FIELDS
+import numpy as np
 import os
 
 class TokenDatabase:
     def __init__(self):
         self.db_file = Config.DATABASE_FILE
         self.init_database()
+        
+        # Store colunar residente com as features dos tokens (evita SELECT * a cada comparação)
+        self.token_store = TokenStore(compact=Config.COMPACT_FEATURE_STORE)
+        self.score_caches = []  # Caches de scores do SimilarityCalculator (ver attach_score_cache)
+        self.token_indexes = []  # Índices de candidatos mantidos a cada save/delete (ver attach_token_index)
+        self.reload_token_store()
+        self.displayed_contracts = set()  # Espelho em memória de displayed_contracts (ver has_displayed_contract)
+        self._load_displayed_contracts()
     
     def init_database(self):
         """Inicializa o banco de dados com as tabelas necessárias"""
@@ -129,7 +141,14 @@ class TokenDatabase:
                 'bundler_supply_percentage REAL',
                 'entrapment_supply_percentage REAL',
                 'degen_calls INTEGER',
-                'sinais_tecnicos INTEGER'
+                'sinais_tecnicos INTEGER',
+                'top_holders_sol_total REAL',
+                'top5_holders_sol_total REAL',
+                'top1_holder_sol_amount REAL',
+                'holders_sol_distribution_score REAL',
+                'holders_sol_concentration_ratio REAL',
+                'features BLOB',
+                'features_mask BLOB'
             ]
             
             for column_def in new_columns:
@@ -139,78 +158,133 @@ class TokenDatabase:
                     # Coluna já existe, continua
                     pass
             
+            # Índices das colunas usadas no pré-filtro por faixas (ver get_candidate_matrix)
+            for field in PREFILTER_FIELDS:
+                cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_tokens_{field} ON tokens ({field})')
+            
             conn.commit()
     
+    # INSERT de uma linha de tokens (ver _token_row)
+    TOKEN_INSERT_SQL = '''
+            INSERT INTO tokens (
+                token_name, contract_address, market_cap, price_change, traders,
+                buy_volume, sell_volume, buy_count, sell_count,
+                buyers, sellers, holders_totais, smart_wallets, fresh_wallets,
+                renowned_wallets, creator_wallets, sniper_wallets, rat_traders,
+                whale_wallets, top_wallets, following_wallets, bluechip_holders,
+                bundler_wallets, bluechip_holders_percentage, rat_trader_supply_percentage,
+                bundler_supply_percentage, entrapment_supply_percentage, degen_calls,
+                sinais_tecnicos, top_holders_percentage, top1_holder_percentage,
+                top5_holders_percentage, top10_holders_percentage, holders_concentration_ratio,
+                holders_distribution_score, source_wallets_percentage, source_wallets_count,
+                source_wallets_avg_hops,
+                top_holders_sol_total, top5_holders_sol_total, top1_holder_sol_amount,
+                holders_sol_distribution_score, holders_sol_concentration_ratio,
+                raw_message, message_id, group_id, features, features_mask
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            '''
+    
+    def _token_row(self, token_data, message_id, group_id):
+        """Parâmetros do TOKEN_INSERT_SQL e o vetor de features (values, present) do token"""
+        # Vetor de features (valores brutos, float64), persistido junto das colunas (ver load_packed_features)
+        values, present = encode_features(token_data)
+        features, features_mask = pack_features(values, present)
+        row = (
+            token_data.get('token_name'),
+            token_data.get('contract_address'),
+            token_data.get('market_cap'),
+            token_data.get('price_change'),
+            token_data.get('traders'),
+            token_data.get('buy_volume'),
+            token_data.get('sell_volume'),
+            token_data.get('buy_count'),
+            token_data.get('sell_count'),
+            token_data.get('buyers'),
+            token_data.get('sellers'),
+            token_data.get('holders_totais'),
+            token_data.get('smart_wallets'),
+            token_data.get('fresh_wallets'),
+            token_data.get('renowned_wallets'),
+            token_data.get('creator_wallets'),
+            token_data.get('sniper_wallets'),
+            token_data.get('rat_traders'),
+            token_data.get('whale_wallets'),
+            token_data.get('top_wallets'),
+            token_data.get('following_wallets'),
+            token_data.get('bluechip_holders'),
+            token_data.get('bundler_wallets'),
+            token_data.get('bluechip_holders_percentage'),
+            token_data.get('rat_trader_supply_percentage'),
+            token_data.get('bundler_supply_percentage'),
+            token_data.get('entrapment_supply_percentage'),
+            token_data.get('degen_calls'),
+            token_data.get('sinais_tecnicos'),
+            token_data.get('top_holders_percentage'),
+            token_data.get('top1_holder_percentage'),
+            token_data.get('top5_holders_percentage'),
+            token_data.get('top10_holders_percentage'),
+            token_data.get('holders_concentration_ratio'),
+            token_data.get('holders_distribution_score'),
+            token_data.get('source_wallets_percentage'),
+            token_data.get('source_wallets_count'),
+            token_data.get('source_wallets_avg_hops'),
+            token_data.get('top_holders_sol_total'),
+            token_data.get('top5_holders_sol_total'),
+            token_data.get('top1_holder_sol_amount'),
+            token_data.get('holders_sol_distribution_score'),
+            token_data.get('holders_sol_concentration_ratio'),
+            token_data.get('raw_message'),
+            message_id,
+            group_id,
+            features,
+            features_mask
+        )
+        return row, values, present
+    
     def save_token_info(self, token_data, message_id, group_id):
         """Salva informações do token no banco de dados"""
+        row, values, present = self._token_row(token_data, message_id, group_id)
+        
         with sqlite3.connect(self.db_file) as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO tokens (
-                    token_name, contract_address, market_cap, price_change, traders,
-                    buy_volume, sell_volume, buy_count, sell_count,
-                    buyers, sellers, holders_totais, smart_wallets, fresh_wallets,
-                    renowned_wallets, creator_wallets, sniper_wallets, rat_traders,
-                    whale_wallets, top_wallets, following_wallets, bluechip_holders,
-                    bundler_wallets, bluechip_holders_percentage, rat_trader_supply_percentage,
-                    bundler_supply_percentage, entrapment_supply_percentage, degen_calls,
-                    sinais_tecnicos, top_holders_percentage, top1_holder_percentage,
-                    top5_holders_percentage, top10_holders_percentage, holders_concentration_ratio,
-                    holders_distribution_score, source_wallets_percentage, source_wallets_count,
-                    source_wallets_avg_hops,
-                    top_holders_sol_total, top5_holders_sol_total, top1_holder_sol_amount,
-                    holders_sol_distribution_score, holders_sol_concentration_ratio,
-                    raw_message, message_id, group_id
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                token_data.get('token_name'),
-                token_data.get('contract_address'),
-                token_data.get('market_cap'),
-                token_data.get('price_change'),
-                token_data.get('traders'),
-                token_data.get('buy_volume'),
-                token_data.get('sell_volume'),
-                token_data.get('buy_count'),
-                token_data.get('sell_count'),
-                token_data.get('buyers'),
-                token_data.get('sellers'),
-                token_data.get('holders_totais'),
-                token_data.get('smart_wallets'),
-                token_data.get('fresh_wallets'),
-                token_data.get('renowned_wallets'),
-                token_data.get('creator_wallets'),
-                token_data.get('sniper_wallets'),
-                token_data.get('rat_traders'),
-                token_data.get('whale_wallets'),
-                token_data.get('top_wallets'),
-                token_data.get('following_wallets'),
-                token_data.get('bluechip_holders'),
-                token_data.get('bundler_wallets'),
-                token_data.get('bluechip_holders_percentage'),
-                token_data.get('rat_trader_supply_percentage'),
-                token_data.get('bundler_supply_percentage'),
-                token_data.get('entrapment_supply_percentage'),
-                token_data.get('degen_calls'),
-                token_data.get('sinais_tecnicos'),
-                token_data.get('top_holders_percentage'),
-                token_data.get('top1_holder_percentage'),
-                token_data.get('top5_holders_percentage'),
-                token_data.get('top10_holders_percentage'),
-                token_data.get('holders_concentration_ratio'),
-                token_data.get('holders_distribution_score'),
-                token_data.get('source_wallets_percentage'),
-                token_data.get('source_wallets_count'),
-                token_data.get('source_wallets_avg_hops'),
-                token_data.get('top_holders_sol_total'),
-                token_data.get('top5_holders_sol_total'),
-                token_data.get('top1_holder_sol_amount'),
-                token_data.get('holders_sol_distribution_score'),
-                token_data.get('holders_sol_concentration_ratio'),
-                token_data.get('raw_message'),
-                message_id,
-                group_id
-            ))
+            cursor.execute(self.TOKEN_INSERT_SQL, row)
+            token_id = cursor.lastrowid
             conn.commit()
+        
+        # Mantém o store em memória e os índices sincronizados com o banco
+        self.token_store.add_vector(token_id, token_data, values, present)
+        for index in self.token_indexes:
+            index.add(token_id, values, present)
+        return token_id
+    
+    def save_tokens_batch(self, tokens):
+        """Salva vários tokens [(token_data, message_id, group_id)] com executemany em uma transação.
+        
+        Retorna os ids gravados, na ordem recebida (o lock de escrita é tomado antes de ler o
+        maior id, então os ids acima dele são exatamente os desta transação).
+        """
+        rows = []
+        vectors = []
+        for token_data, message_id, group_id in tokens:
+            row, values, present = self._token_row(token_data, message_id, group_id)
+            rows.append(row)
+            vectors.append((token_data, values, present))
+        if not rows:
+            return []
+        
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            last_id = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM tokens').fetchone()[0]
+            cursor.executemany(self.TOKEN_INSERT_SQL, rows)
+            token_ids = [row[0] for row in cursor.execute('SELECT id FROM tokens WHERE id > ? ORDER BY id', (last_id,))]
+            conn.commit()
+        
+        for token_id, (token_data, values, present) in zip(token_ids, vectors):
+            self.token_store.add_vector(token_id, token_data, values, present)
+            for index in self.token_indexes:
+                index.add(token_id, values, present)
+        return token_ids
     
     def get_all_tokens(self):
         """Recupera todos os tokens do banco de dados"""
@@ -227,6 +301,166 @@ class TokenDatabase:
             
             return tokens
     
+    def load_token_features(self):
+        """Recupera apenas as colunas usadas no cálculo de similaridade (sem raw_message)"""
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {', '.join(META_FIELDS + FEATURE_FIELDS)}
+                FROM tokens
+                ORDER BY id
+            ''')
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    def get_tokens_by_ids(self, token_ids):
+        """Retorna {id: token} com as colunas do cálculo lidas do banco (valores exatos, sem a quantização do store)"""
+        token_ids = [int(token_id) for token_id in token_ids if token_id is not None]
+        if not token_ids:
+            return {}
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {', '.join(META_FIELDS + FEATURE_FIELDS)}
+                FROM tokens
+                WHERE id IN ({', '.join('?' * len(token_ids))})
+            ''', token_ids)
+            columns = [description[0] for description in cursor.description]
+            return {row[0]: dict(zip(columns, row)) for row in cursor.fetchall()}
+    
+    def iter_token_features(self, batch_size=None):
+        """Gera lotes de tokens (listas de dicts) só com as colunas do cálculo, via fetchmany.
+        
+        Mantém no máximo batch_size linhas em memória por vez (ver find_top_k_streaming).
+        """
+        batch_size = batch_size or Config.STREAMING_BATCH_SIZE
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {', '.join(META_FIELDS + FEATURE_FIELDS)}
+                FROM tokens
+                ORDER BY id
+            ''')
+            columns = [description[0] for description in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [dict(zip(columns, row)) for row in rows]
+    
+    def load_packed_features(self):
+        """Recupera [(metadados, valores, presença)] pelos vetores persistidos (SELECT estreito).
+        
+        Linhas ainda sem vetor válido (anteriores ao backfill) são lidas pelas colunas.
+        """
+        records = []
+        missing_ids = []
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {', '.join(META_FIELDS)}, features, features_mask
+                FROM tokens
+                ORDER BY id
+            ''')
+            for row in cursor.fetchall():
+                token_meta = dict(zip(META_FIELDS, row[:len(META_FIELDS)]))
+                vector = unpack_features(row[-2], row[-1])
+                if vector is None:
+                    missing_ids.append(token_meta['id'])
+                    records.append([token_meta, None, None])
+                else:
+                    records.append([token_meta, vector[0], vector[1]])
+            
+            if missing_ids:
+                # Banco ainda não migrado por completo (rode backfill_features.py)
+                missing = set(missing_ids)
+                cursor.execute(f'SELECT id, {", ".join(FEATURE_FIELDS)} FROM tokens')
+                columns = [description[0] for description in cursor.description]
+                legacy = {row[0]: encode_features(dict(zip(columns, row)))
+                          for row in cursor.fetchall() if row[0] in missing}
+                for record in records:
+                    if record[1] is None:
+                        record[1], record[2] = legacy[record[0]['id']]
+        
+        return [tuple(record) for record in records]
+    
+    def backfill_features(self, batch_size=500):
+        """Calcula e grava o vetor de features das linhas que ainda não o possuem.
+        
+        Retorna a quantidade de linhas atualizadas.
+        """
+        updated = 0
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, features, features_mask, {', '.join(FEATURE_FIELDS)}
+                FROM tokens
+                ORDER BY id
+            ''')
+            columns = [description[0] for description in cursor.description]
+            
+            pending = []
+            for row in cursor.fetchall():
+                token = dict(zip(columns, row))
+                if unpack_features(token['features'], token['features_mask']) is not None:
+                    continue
+                features, features_mask = pack_features(*encode_features(token))
+                pending.append((features, features_mask, token['id']))
+            
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                conn.executemany('UPDATE tokens SET features = ?, features_mask = ? WHERE id = ?', batch)
+                conn.commit()
+                updated += len(batch)
+        
+        return updated
+    
+    def reload_token_store(self):
+        """Reconstrói o store em memória a partir do banco"""
+        self.token_store.load_vectors(self.load_packed_features())
+        # Após restore os ids podem voltar com outro conteúdo
+        for cache in self.score_caches:
+            cache.clear()
+        for index in self.token_indexes:
+            index.rebuild(self.token_store.matrix())
+        return len(self.token_store)
+    
+    def attach_score_cache(self, cache):
+        """Registra um cache de scores (invalidate_ids/clear) a ser invalidado em delete/clear/restore"""
+        self.score_caches.append(cache)
+    
+    def attach_token_index(self, index):
+        """Registra um índice de candidatos (add/remove_ids/clear/rebuild) e o sincroniza com o store"""
+        index.load_or_build(self.token_store.matrix())
+        self.token_indexes.append(index)
+    
+    def _remove_from_store(self, token_ids):
+        """Remove tokens do store em memória e invalida os scores em cache"""
+        token_ids = list(token_ids)
+        self.token_store.remove_ids(token_ids)
+        for cache in self.score_caches:
+            cache.invalidate_ids(token_ids)
+        for index in self.token_indexes:
+            index.remove_ids(token_ids)
+    
+    def get_token_matrix(self):
+        """Retorna a matriz de features residente para o cálculo de similaridade"""
+        return self.token_store.matrix()
+    
+    def get_candidate_matrix(self, where_sql, params=()):
+        """Matriz residente restrita aos ids que atendem ao WHERE (pré-filtro por faixas indexadas).
+        
+        Sem cláusula retorna a matriz completa. As linhas mantêm a ordem do store.
+        """
+        matrix = self.token_store.matrix()
+        if not where_sql:
+            return matrix
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'SELECT id FROM tokens WHERE {where_sql}', list(params))
+            candidate_ids = np.fromiter((row[0] for row in cursor.fetchall()), dtype=np.int64)
+        return matrix.subset(np.flatnonzero(np.isin(matrix.ids, candidate_ids)))
+    
     def clear_all_tokens(self):
         """Remove todos os tokens do banco de dados"""
         with sqlite3.connect(self.db_file) as conn:
@@ -234,7 +468,13 @@ class TokenDatabase:
             cursor.execute('DELETE FROM tokens')
             deleted_count = cursor.rowcount
             conn.commit()
-            return deleted_count
+        
+        self.token_store.clear()
+        for cache in self.score_caches:
+            cache.clear()
+        for index in self.token_indexes:
+            index.clear()
+        return deleted_count
     
     def get_tokens_count(self):
         """Retorna a quantidade total de tokens no banco"""
@@ -254,6 +494,7 @@ class TokenDatabase:
             if token:
                 cursor.execute('DELETE FROM tokens WHERE id = ?', (token_id,))
                 conn.commit()
+                self._remove_from_store([token_id])
                 return token[0]  # Retorna o nome do token deletado
             return None
 
@@ -261,10 +502,14 @@ class TokenDatabase:
         """Remove um token específico pelo nome"""
         with sqlite3.connect(self.db_file) as conn:
             cursor = conn.cursor()
+            cursor.execute('SELECT id FROM tokens WHERE token_name = ?', (token_name,))
+            token_ids = [row[0] for row in cursor.fetchall()]
             cursor.execute('DELETE FROM tokens WHERE token_name = ?', (token_name,))
             deleted_count = cursor.rowcount
             conn.commit()
-            return deleted_count
+        
+        self._remove_from_store(token_ids)
+        return deleted_count
 
     def delete_last_token(self):
         """Remove o último token adicionado"""
@@ -279,6 +524,7 @@ class TokenDatabase:
             if token:
                 cursor.execute('DELETE FROM tokens WHERE id = ?', (token[0],))
                 conn.commit()
+                self._remove_from_store([token[0]])
                 return token[1]  # Retorna o nome do token deletado
             return None
 
@@ -287,7 +533,7 @@ class TokenDatabase:
         with sqlite3.connect(self.db_file) as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT token_name FROM tokens 
+                SELECT id, token_name FROM tokens 
                 WHERE id BETWEEN ? AND ?
             ''', (start_id, end_id))
             tokens = cursor.fetchall()
@@ -296,7 +542,8 @@ class TokenDatabase:
                 cursor.execute('DELETE FROM tokens WHERE id BETWEEN ? AND ?', (start_id, end_id))
                 deleted_count = cursor.rowcount
                 conn.commit()
-                return deleted_count, [token[0] for token in tokens]
+                self._remove_from_store([token[0] for token in tokens])
+                return deleted_count, [token[1] for token in tokens]
             return 0, []
 
     def get_tokens_list(self, limit=20):
@@ -337,6 +584,7 @@ class TokenDatabase:
             if tokens:
                 cursor.execute('DELETE FROM tokens WHERE contract_address = ?', (contract_address,))
                 conn.commit()
+                self._remove_from_store([token[0] for token in tokens])
                 return len(tokens), [token[1] for token in tokens]  # Retorna quantidade e nomes dos tokens deletados
             return 0, []
 
@@ -400,6 +648,28 @@ class TokenDatabase:
         """Define o threshold mínimo de similaridade"""
         return self.set_setting('min_similarity_threshold', threshold) 
 
+    def get_section_weights(self):
+        """Retorna os pesos das seções ponderadas persistidos (JSON) ou None"""
+        return self.get_setting(WEIGHTS_SETTING_KEY)
+    
+    def set_section_weights(self, weights_json):
+        """Persiste os pesos das seções ponderadas (JSON)"""
+        return self.set_setting(WEIGHTS_SETTING_KEY, weights_json)
+    
+    def has_contract(self, contract_address):
+        """Versão em memória de is_contract_already_in_database (consulta o store residente)"""
+        return bool(contract_address) and self.token_store.has_contract(contract_address)
+    
+    def has_displayed_contract(self, contract_address):
+        """Versão em memória de is_contract_already_displayed"""
+        return bool(contract_address) and contract_address in self.displayed_contracts
+    
+    def _load_displayed_contracts(self):
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT contract_address FROM displayed_contracts WHERE contract_address IS NOT NULL')
+            self.displayed_contracts = {row[0] for row in cursor.fetchall()}
+    
     def is_contract_already_displayed(self, contract_address):
         """Verifica se um contrato já foi exibido"""
         if not contract_address:
@@ -427,7 +697,8 @@ class TokenDatabase:
                 VALUES (?, ?, ?)
             ''', (contract_address, token_name, similarity_percentage))
             conn.commit()
-            return True
+        self.displayed_contracts.add(contract_address)
+        return True
 
     def clear_displayed_contracts(self):
         """Limpa todos os contratos já exibidos"""
@@ -436,7 +707,8 @@ class TokenDatabase:
             cursor.execute('DELETE FROM displayed_contracts')
             deleted_count = cursor.rowcount
             conn.commit()
-            return deleted_count
+        self.displayed_contracts.clear()
+        return deleted_count
 
     def get_displayed_contracts_count(self):
         """Retorna a quantidade de contratos já exibidos"""
@@ -551,6 +823,11 @@ class TokenDatabase:
             # Substitui o banco atual pelo backup
             shutil.copy2(backup_path, self.db_file)
             
+            # Aplica migrações no banco restaurado e recarrega o store em memória
+            self.init_database()
+            self.reload_token_store()
+            self._load_displayed_contracts()
+            
             # Verifica se a restauração foi bem-sucedida
             with sqlite3.connect(self.db_file) as conn:
                 cursor = conn.cursor()
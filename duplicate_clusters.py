@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Job offline de similaridade token x token: agrupa tokens quase idênticos (mesmo template
+de lançamento republicado com outros nomes)
+"""
+
+import time
+import numpy as np
+from typing import Dict, List, Any, Callable, Optional
+from config import Config
+from vectorized_similarity import TokenMatrix
+
+
+class UnionFind:
+    """Conjuntos disjuntos para unir pares acima do threshold"""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: int, b: int):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            # A menor linha vira a raiz (clusters ordenados pelo token mais antigo)
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def find_duplicate_clusters(calculator, matrix: TokenMatrix, threshold: Optional[float] = None,
+                            tile_size: Optional[int] = None,
+                            progress: Optional[Callable[[int, int], None]] = None) -> List[Dict[str, Any]]:
+    """Agrupa os tokens com similaridade >= threshold (componentes conexas dos pares).
+
+    progress(blocos_processados, total_de_blocos) é chamado após cada bloco.
+    Retorna clusters com 2+ tokens, do maior para o menor:
+    [{'tokens': [...], 'min_similarity': x, 'max_similarity': y}]
+    """
+    threshold = Config.DUPLICATE_CLUSTER_THRESHOLD if threshold is None else threshold
+    tile_size = tile_size or Config.DUPLICATE_CLUSTER_TILE
+    n_tokens = len(matrix)
+    if n_tokens < 2:
+        return []
+
+    n_tiles = (n_tokens + tile_size - 1) // tile_size
+    total_tiles = n_tiles * (n_tiles + 1) // 2
+    union_find = UnionFind(n_tokens)
+    edges = []
+
+    for done, (row_start, col_start, overall) in enumerate(calculator.vectorized.pairwise_tiles(matrix, tile_size), 1):
+        local_rows, local_cols = np.nonzero(overall >= threshold)
+        pair_similarities = overall[local_rows, local_cols]
+        rows, cols = local_rows + row_start, local_cols + col_start
+        upper = cols > rows  # ignora a diagonal e pares repetidos
+        for row, col, similarity in zip(rows[upper], cols[upper], pair_similarities[upper]):
+            union_find.union(int(row), int(col))
+            edges.append((int(row), int(col), float(similarity)))
+        if progress:
+            progress(done, total_tiles)
+
+    members = {}
+    for row in range(n_tokens):
+        members.setdefault(union_find.find(row), []).append(row)
+
+    similarities = {}
+    for row, col, similarity in edges:
+        similarities.setdefault(union_find.find(row), []).append(similarity)
+
+    clusters = []
+    for root, rows in members.items():
+        if len(rows) < 2:
+            continue
+        clusters.append({
+            'tokens': [matrix.tokens[row] for row in rows],
+            'min_similarity': min(similarities[root]),
+            'max_similarity': max(similarities[root])
+        })
+
+    clusters.sort(key=lambda cluster: len(cluster['tokens']), reverse=True)
+    return clusters
+
+
+def format_clusters(clusters: List[Dict[str, Any]], threshold: float) -> List[str]:
+    """Linhas da seção de clusters (usada no arquivo do /database e no job offline)"""
+    content = []
+    content.append("🧬 CLUSTERS DE TOKENS QUASE IDÊNTICOS")
+    content.append("-" * 60)
+    content.append(f"🎯 Similaridade mínima: {threshold:.1f}%")
+    content.append(f"📦 Clusters encontrados: {len(clusters)}")
+    content.append("")
+
+    for i, cluster in enumerate(clusters, 1):
+        content.append(f"🔗 CLUSTER #{i}: {len(cluster['tokens'])} tokens "
+                       f"({cluster['min_similarity']:.1f}% - {cluster['max_similarity']:.1f}%)")
+        for token in cluster['tokens']:
+            content.append(f"   └ {token.get('token_name', 'Token Desconhecido')} (ID {token.get('id', 'N/A')})")
+        content.append("")
+
+    return content
+
+
+if __name__ == '__main__':
+    import sys
+    from database import TokenDatabase
+    from similarity_calculator import SimilarityCalculator
+
+    threshold = float(sys.argv[1]) if len(sys.argv) > 1 else Config.DUPLICATE_CLUSTER_THRESHOLD
+    database = TokenDatabase()
+    matrix = database.get_token_matrix()
+    calculator = SimilarityCalculator.from_database(database)
+
+    print("🧬 Similaridade token x token")
+    print("=" * 50)
+    print(f"📊 Tokens: {len(matrix)}")
+
+    start = time.perf_counter()
+
+    def print_progress(done, total):
+        print(f"\r⏳ Blocos: {done}/{total} ({done / total * 100:.0f}%)", end='', flush=True)
+
+    clusters = find_duplicate_clusters(calculator, matrix, threshold, progress=print_progress)
+    print(f"\n⏱️ Tempo: {time.perf_counter() - start:.2f}s")
+    print("\n".join(format_clusters(clusters, threshold)))
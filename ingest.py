@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Ingestão em lote de exportações de chat direto no banco de tokens (sem reenviar pelo Telegram)
+
+Lê o result.json do Telegram Desktop ({"messages": [...]}, ou uma lista), arquivos JSONL
+(um registro por linha) e TXT (separados por ---) registro a registro, com os leitores do
+backfill.py; faz o parse em um pool de processos, descarta contratos repetidos (já no banco
+ou vistos antes no arquivo) e grava com executemany em transações de --batch-size tokens.
+
+Uso: python ingest.py export.json [mais.jsonl ...] [--workers 4] [--batch-size 5000]
+
+Rode com o bot parado: o store residente do bot só enxerga os novos tokens ao reiniciar.
+"""
+
+import argparse
+import os
+import time
+from multiprocessing import Pool
+from typing import Dict, List, Any, Iterator, Iterable, Optional, Tuple
+from backfill import TEXT_FIELDS, message_text, iter_items
+from config import Config
+from database import TokenDatabase
+from message_parser import MessageParser
+
+# Parser de cada processo worker (criado uma única vez pelo initializer)
+_worker_parser = None
+
+
+def record_message_id(record: Any) -> Optional[int]:
+    if isinstance(record, dict):
+        for key in ('id', 'message_id'):
+            if isinstance(record.get(key), int):
+                return record[key]
+    return None
+
+
+def _init_worker(mode: Optional[str]):
+    global _worker_parser
+    _worker_parser = MessageParser(mode)
+
+
+def _parse_message(item: Tuple[str, Optional[int]]) -> Tuple[Optional[Dict[str, Any]], Optional[int]]:
+    """(token_data, message_id) ou (None, message_id) se não for mensagem de token"""
+    message_text, message_id = item
+    if not _worker_parser.is_token_message(message_text):
+        return None, message_id
+    return _worker_parser.parse_token_message(message_text), message_id
+
+
+def parse_messages(items: Iterable[Tuple[str, Optional[int]]], workers: int,
+                   mode: Optional[str] = None, chunksize: int = 64) -> Iterator[Tuple[Optional[Dict[str, Any]], Optional[int]]]:
+    """Parse na ordem de entrada (a primeira ocorrência de um contrato é a que fica).
+
+    Usa Pool.imap, que consome a entrada sob demanda (o map do ProcessPoolExecutor enfileira
+    o arquivo inteiro antes de devolver o primeiro resultado).
+    """
+    if workers <= 1:
+        _init_worker(mode)
+        yield from map(_parse_message, items)
+        return
+    with Pool(workers, initializer=_init_worker, initargs=(mode,)) as pool:
+        yield from pool.imap(_parse_message, items, chunksize)
+
+
+def ingest(paths: List[str], database: TokenDatabase, workers: int = 1, batch_size: int = 5000,
+           field: Optional[str] = None, group_id: Optional[int] = None, mode: Optional[str] = None,
+           progress_interval: float = 2.0, log=print) -> Dict[str, Any]:
+    """Grava os tokens das exportações no banco e retorna as contagens da ingestão"""
+    stats = {'records': 0, 'messages': 0, 'tokens': 0, 'inserted': 0, 'duplicates': 0,
+             'skipped': 0, 'batches': 0, 'elapsed': 0.0}
+    seen_contracts = {contract for _, contract in database.get_all_contracts()}
+    start = time.perf_counter()
+    last_report = start
+
+    def messages():
+        for path in paths:
+            for record in iter_items(path):
+                stats['records'] += 1
+                text = message_text(record, field)
+                if text:
+                    stats['messages'] += 1
+                    yield text, record_message_id(record)
+
+    def report():
+        elapsed = time.perf_counter() - start
+        rate = stats['messages'] / elapsed if elapsed > 0 else 0.0
+        log(f"📥 {stats['records']} registros | {stats['tokens']} tokens | {stats['inserted']} gravados | "
+            f"{stats['duplicates']} duplicados | {rate:.0f} msg/s")
+
+    batch = []
+    for token_data, message_id in parse_messages(messages(), workers, mode):
+        if token_data is None:
+            stats['skipped'] += 1
+            continue
+        stats['tokens'] += 1
+        contract_address = token_data.get('contract_address')
+        if contract_address:
+            if contract_address in seen_contracts:
+                stats['duplicates'] += 1
+                continue
+            seen_contracts.add(contract_address)
+        batch.append((token_data, message_id, group_id))
+
+        if len(batch) >= batch_size:
+            stats['inserted'] += len(database.save_tokens_batch(batch))
+            stats['batches'] += 1
+            batch = []
+        if progress_interval and time.perf_counter() - last_report >= progress_interval:
+            last_report = time.perf_counter()
+            report()
+
+    if batch:
+        stats['inserted'] += len(database.save_tokens_batch(batch))
+        stats['batches'] += 1
+    stats['elapsed'] = time.perf_counter() - start
+    if progress_interval:
+        report()
+    return stats
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Ingestão em lote de exportações de chat no banco de tokens")
+    arg_parser.add_argument('files', nargs='+', help="result.json do Telegram (ou lista JSON), arquivos .jsonl e/ou .txt")
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processos de parse (1 = no próprio processo)")
+    arg_parser.add_argument('--batch-size', type=int, default=5000, help="Tokens por executemany/transação")
+    arg_parser.add_argument('--field', default=None, help=f"Campo com o texto (padrão: {', '.join(TEXT_FIELDS)})")
+    arg_parser.add_argument('--group-id', type=int, default=None, help="group_id gravado (padrão: DATABASE_GROUP_ID)")
+    arg_parser.add_argument('--mode', choices=('line', 'combined', 'regex'), default=None, help="Modo do parser")
+    args = arg_parser.parse_args(argv)
+
+    group_id = args.group_id
+    if group_id is None and Config.DATABASE_GROUP_ID:
+        group_id = int(Config.DATABASE_GROUP_ID)
+
+    print("📥 Ingestão em lote")
+    print("=" * 50)
+    database = TokenDatabase()
+    before = len(database.token_store)
+    stats = ingest(args.files, database, args.workers, args.batch_size, args.field, group_id, args.mode)
+
+    print("=" * 50)
+    print(f"💬 Mensagens: {stats['messages']} de {stats['records']} registros ({stats['skipped']} não são tokens)")
+    print(f"✅ Gravados: {stats['inserted']} em {stats['batches']} transações | 🔁 Duplicados: {stats['duplicates']}")
+    print(f"🗄️ Tokens no banco: {before} -> {len(database.token_store)}")
+    rate = stats['messages'] / stats['elapsed'] if stats['elapsed'] > 0 else 0.0
+    print(f"⏱️ {stats['elapsed']:.2f}s ({rate:.0f} mensagens/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Índice LSH (projeções aleatórias) em espaço logarítmico para recuperar candidatos em tempo sublinear
+"""
+
+import atexit
+import hashlib
+import os
+import time
+import numpy as np
+from typing import Dict, List, Any, Optional, Iterable
+from ann_index import log_features
+from token_store import FEATURE_FIELDS, encode_features
+from vectorized_similarity import TokenMatrix
+
+# Compacta os buckets auxiliares nas tabelas ordenadas quando passam desse tamanho
+COMPACT_MIN_UPDATES = 1000
+COMPACT_FRACTION = 0.05
+
+
+class LSHIndex:
+    """Tabelas de hash com projeções aleatórias (sinal de cada hiperplano = 1 bit).
+
+    Cada tabela usa n_bits hiperplanos passando pelo centro (mediana) dos tokens no espaço
+    log1p(|x|); tokens com vetores parecidos tendem a cair no mesmo bucket em pelo menos
+    uma tabela. Mais tabelas aumentam o recall, mais bits reduzem os candidatos (latência).
+
+    Cada tabela é um par de arrays (chaves ordenadas, ids) consultado por busca binária.
+    Tokens salvos depois da última compactação ficam em buckets auxiliares (dict) e os
+    removidos em um conjunto de exclusão; save() grava tudo em disco (npz) e compacta
+    quando os auxiliares passam de COMPACT_FRACTION do índice.
+    O TokenDatabase mantém o índice a cada save/delete (ver attach_token_index) e, na
+    inicialização, o arquivo é reaproveitado quando os ids do banco não mudaram.
+    """
+
+    def __init__(self, n_tables: int = 8, n_bits: int = 12, path: Optional[str] = None,
+                 fields: Optional[List[str]] = None, seed: int = 0, save_every: int = 100):
+        if not 1 <= n_bits <= 62:
+            raise ValueError("n_bits deve estar entre 1 e 62")
+        self.fields = list(fields or FEATURE_FIELDS)
+        self.n_tables = max(n_tables, 1)
+        self.n_bits = n_bits
+        self.path = path
+        self.seed = seed
+        self.save_every = save_every
+        self.planes = np.random.default_rng(seed).standard_normal((self.n_tables * n_bits, len(self.fields)))
+        self.bit_weights = np.left_shift(np.int64(1), np.arange(n_bits, dtype=np.int64))
+        self.center = np.zeros(len(self.fields), dtype=np.float64)
+        self._set_base(np.zeros((self.n_tables, 0), dtype=np.int64), np.zeros((self.n_tables, 0), dtype=np.int64))
+        self.pending_updates = 0
+        self.stats = {'queries': 0, 'candidates': 0, 'loaded': 0, 'rebuilt': 0}
+        if path:
+            atexit.register(self._save_pending)
+
+    def __len__(self) -> int:
+        return self.sorted_ids.shape[1] - len(self.removed) + len(self.added)
+
+    def _set_base(self, sorted_keys: np.ndarray, sorted_ids: np.ndarray):
+        """Define as tabelas compactadas e zera os buckets auxiliares"""
+        self.sorted_keys = sorted_keys  # n_tabelas x n_tokens, chaves em ordem crescente
+        self.sorted_ids = sorted_ids    # ids na mesma ordem das chaves
+        self.base_ids = np.sort(sorted_ids[0]) if len(sorted_ids) else np.zeros(0, dtype=np.int64)
+        self.added = {}                 # id -> chaves por tabela (tokens após a compactação)
+        self.added_buckets = [{} for _ in range(self.n_tables)]
+        self.removed = set()            # ids compactados que foram apagados do banco
+
+    def _in_base(self, token_ids: np.ndarray) -> np.ndarray:
+        """Máscara dos ids presentes nas tabelas compactadas (busca binária)"""
+        positions = np.searchsorted(self.base_ids, token_ids)
+        found = positions < len(self.base_ids)
+        found[found] = self.base_ids[positions[found]] == token_ids[found]
+        return found
+
+    def _hash(self, points: np.ndarray) -> np.ndarray:
+        """Chaves (n_pontos x n_tabelas) a partir dos pontos em espaço log"""
+        bits = ((points - self.center) @ self.planes.T) > 0
+        bits = bits.reshape(points.shape[0], self.n_tables, self.n_bits)
+        return (bits * self.bit_weights).sum(axis=2)
+
+    def _compact(self, token_ids: np.ndarray, keys: np.ndarray):
+        """Monta as tabelas ordenadas a partir de (ids, chaves n_tokens x n_tabelas)"""
+        orders = np.argsort(keys, axis=0, kind='stable').T
+        self._set_base(np.take_along_axis(keys.T, orders, axis=1), token_ids[orders])
+
+    def _current_entries(self):
+        """(ids, chaves) de todos os tokens indexados, incluindo os buckets auxiliares"""
+        token_ids = self.base_ids
+        keys = np.empty((len(token_ids), self.n_tables), dtype=np.int64)
+        for table in range(self.n_tables):
+            table_order = np.argsort(self.sorted_ids[table], kind='stable')
+            keys[:, table] = self.sorted_keys[table][table_order]
+        if self.removed:
+            keep = ~np.isin(token_ids, np.fromiter(self.removed, dtype=np.int64))
+            token_ids, keys = token_ids[keep], keys[keep]
+        if self.added:
+            token_ids = np.concatenate([token_ids, np.fromiter(self.added.keys(), dtype=np.int64)])
+            keys = np.concatenate([keys, np.array(list(self.added.values()), dtype=np.int64)])
+        return token_ids, keys
+
+    def rebuild(self, matrix: TokenMatrix):
+        """Reconstrói todas as tabelas a partir da matriz do TokenStore"""
+        columns = [matrix.field_index[field] for field in self.fields]
+        points = log_features(matrix.values[:, columns], matrix.present[:, columns])
+        self.center = np.median(points, axis=0) if len(points) else np.zeros(len(self.fields))
+        token_ids = np.asarray(matrix.ids, dtype=np.int64)
+        self._compact(token_ids, self._hash(points) if len(points) else np.zeros((0, self.n_tables), dtype=np.int64))
+        self.stats['rebuilt'] += 1
+        self.save()
+
+    def load_or_build(self, matrix: TokenMatrix):
+        """Carrega o índice salvo se corresponder aos ids atuais; senão reconstrói"""
+        if self.load(matrix.ids):
+            self.stats['loaded'] += 1
+            return
+        self.rebuild(matrix)
+
+    def add(self, token_id: int, values: np.ndarray, present: np.ndarray):
+        """Indexa um token recém-salvo (valores na ordem de FEATURE_FIELDS)"""
+        self.remove_ids([token_id])
+        token_keys = tuple(self._hash(log_features(values, present).reshape(1, -1))[0].tolist())
+        self.added[token_id] = token_keys
+        for buckets, key in zip(self.added_buckets, token_keys):
+            buckets.setdefault(key, set()).add(token_id)
+        self._updated()
+
+    def remove_ids(self, token_ids: Iterable[int]):
+        """Remove tokens apagados do banco"""
+        token_ids = list(token_ids)
+        for token_id in token_ids:
+            token_keys = self.added.pop(token_id, None)
+            if token_keys is None:
+                continue
+            for buckets, key in zip(self.added_buckets, token_keys):
+                buckets[key].discard(token_id)
+                if not buckets[key]:
+                    del buckets[key]
+        if token_ids:
+            compacted = self._in_base(np.asarray(token_ids, dtype=np.int64))
+            self.removed.update(token_id for token_id, found in zip(token_ids, compacted) if found)
+        self._updated()
+
+    def clear(self):
+        self._set_base(np.zeros((self.n_tables, 0), dtype=np.int64), np.zeros((self.n_tables, 0), dtype=np.int64))
+        self._updated()
+
+    def _updated(self):
+        """Salva em disco a cada save_every alterações (e ao encerrar o processo)"""
+        self.pending_updates += 1
+        if self.save_every and self.pending_updates >= self.save_every:
+            self.save()
+
+    def _save_pending(self):
+        if self.pending_updates:
+            self.save()
+
+    def candidate_ids(self, target_token: Dict[str, Any]) -> np.ndarray:
+        """Ids dos tokens que colidem com o alvo em alguma tabela"""
+        values, present = encode_features(target_token, self.fields)
+        target_keys = self._hash(log_features(values, present).reshape(1, -1))[0]
+        parts = []
+        for table, key in enumerate(target_keys):
+            start, end = np.searchsorted(self.sorted_keys[table], [key, key + 1])
+            parts.append(self.sorted_ids[table][start:end])
+            parts.append(np.fromiter(self.added_buckets[table].get(int(key), ()), dtype=np.int64))
+        candidates = np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+        if self.removed:
+            candidates = candidates[~np.isin(candidates, np.fromiter(self.removed, dtype=np.int64))]
+        self.stats['queries'] += 1
+        self.stats['candidates'] += len(candidates)
+        return candidates
+
+    def candidates(self, target_token: Dict[str, Any], matrix: TokenMatrix) -> np.ndarray:
+        """Linhas candidatas da matriz (na ordem original)"""
+        return np.flatnonzero(np.isin(matrix.ids, self.candidate_ids(target_token)))
+
+    def _signature(self, token_ids: np.ndarray) -> str:
+        """Identifica a configuração do índice e o conjunto de ids indexados"""
+        content = repr((self.fields, self.n_tables, self.n_bits, self.seed)).encode()
+        content += np.sort(np.asarray(token_ids, dtype=np.int64)).tobytes()
+        return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+    def _current_ids(self) -> np.ndarray:
+        token_ids = self.base_ids
+        if self.removed:
+            token_ids = token_ids[~np.isin(token_ids, np.fromiter(self.removed, dtype=np.int64))]
+        return np.concatenate([token_ids, np.fromiter(self.added.keys(), dtype=np.int64)])
+
+    def save(self):
+        """Grava as tabelas em disco (npz); compacta os buckets auxiliares quando crescem demais"""
+        if len(self.added) + len(self.removed) > max(COMPACT_MIN_UPDATES, COMPACT_FRACTION * len(self.base_ids)):
+            self._compact(*self._current_entries())
+        self.pending_updates = 0
+        if not self.path:
+            return
+        temp_path = self.path + '.tmp.npz'
+        added_keys = np.array(list(self.added.values()), dtype=np.int64).reshape(-1, self.n_tables)
+        np.savez(temp_path, signature=self._signature(self._current_ids()), center=self.center,
+                 sorted_keys=self.sorted_keys, sorted_ids=self.sorted_ids,
+                 added_ids=np.fromiter(self.added.keys(), dtype=np.int64), added_keys=added_keys,
+                 removed=np.fromiter(self.removed, dtype=np.int64))
+        os.replace(temp_path, self.path)
+
+    def load(self, expected_ids: np.ndarray) -> bool:
+        """Carrega o índice do disco; retorna False se ausente, de outra configuração ou desatualizado"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with np.load(self.path) as data:
+                if str(data['signature']) != self._signature(expected_ids):
+                    return False
+                self.center = data['center']
+                self._set_base(data['sorted_keys'], data['sorted_ids'])
+                self.removed.update(data['removed'].tolist())
+                for token_id, token_keys in zip(data['added_ids'].tolist(), data['added_keys'].tolist()):
+                    self.added[token_id] = tuple(token_keys)
+                    for buckets, key in zip(self.added_buckets, token_keys):
+                        buckets.setdefault(key, set()).add(token_id)
+        except (OSError, ValueError, KeyError):
+            return False
+        self.pending_updates = 0
+        return True
+
+
+def recall_report(calculator, matrix: TokenMatrix, targets: List[Dict[str, Any]], k: int = 3,
+                  n_tables: int = 8, n_bits: int = 12) -> Dict[str, float]:
+    """Compara a busca pelos buckets LSH com a força bruta (recall@k, candidatos e tempos)"""
+    index = LSHIndex(n_tables, n_bits)
+    build_start = time.perf_counter()
+    index.rebuild(matrix)
+    build_time = time.perf_counter() - build_start
+
+    found = 0
+    expected = 0
+    best_hits = 0
+    brute_time = 0.0
+    lsh_time = 0.0
+
+    for target in targets:
+        start = time.perf_counter()
+        brute = calculator.vectorized.find_top_k(target, matrix, k)
+        brute_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        approximate = calculator.vectorized.find_top_k(target, matrix.subset(index.candidates(target, matrix)), k)
+        lsh_time += time.perf_counter() - start
+
+        brute_ids = [token['id'] for token, _, _ in brute]
+        lsh_ids = [token['id'] for token, _, _ in approximate]
+        expected += len(brute_ids)
+        found += len(set(brute_ids) & set(lsh_ids))
+        if brute_ids[:1] == lsh_ids[:1]:
+            best_hits += 1
+
+    queries = max(len(targets), 1)
+    return {
+        'tokens': len(matrix),
+        'tables': n_tables,
+        'bits': n_bits,
+        'recall_at_k': found / expected if expected else 1.0,
+        'best_match_recall': best_hits / queries,
+        'candidates_avg': index.stats['candidates'] / queries,
+        'build_time': build_time,
+        'brute_time_avg': brute_time / queries,
+        'lsh_time_avg': lsh_time / queries
+    }
+
+
+if __name__ == '__main__':
+    import random
+    import sys
+    from database import TokenDatabase
+    from similarity_calculator import SimilarityCalculator
+
+    database = TokenDatabase()
+    calculator = SimilarityCalculator.from_database(database)
+    matrix = database.get_token_matrix()
+
+    # Consultas: tokens do banco com valores perturbados (simulam novos lançamentos parecidos)
+    rng = random.Random(0)
+    targets = []
+    for row in range(min(len(matrix), 200)):
+        token = dict(matrix.tokens[row])
+        for field in calculator.vectorized.fields:
+            if isinstance(token.get(field), (int, float)):
+                token[field] = token[field] * rng.uniform(0.7, 1.3)
+        targets.append(token)
+
+    print("📊 Relatório de recall do índice LSH")
+    print("=" * 50)
+    configurations = [(int(sys.argv[1]), int(sys.argv[2]))] if len(sys.argv) > 2 else [(4, 8), (8, 12), (16, 16)]
+    for n_tables, n_bits in configurations:
+        report = recall_report(calculator, matrix, targets, n_tables=n_tables, n_bits=n_bits)
+        print(", ".join(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}"
+                        for key, value in report.items()))
@@ -1,11 +1,241 @@
 import re
-from typing import Dict, List, Any
+from types import MappingProxyType
+from typing import Dict, List, Any, Tuple, Optional, Mapping
+from config import Config
+from parse_cache import ParseCache
+
+# Linhas dos holders: ├  1. ABC...XYZ - 4.20% - 65.92 SOL
+HOLDER_PATTERN = r'[├└]\s*\d+\.\s+\w+\.\.\.\w+\s*-\s*([\d.,]+)%\s*-\s*([\d.,]+)\s*SOL'
+
+# Linhas dos source wallets: ├ 5tzFki...uAi9 -  5 hops ou ├ Debridge - 10 hops
+SOURCE_PATTERN = r'[├└]\s+[\w🔹]+.*?\s*-\s*(\d+)\s+hops?'
+
+UNIT_MULTIPLIERS = {'K': 1000, 'M': 1000000, 'B': 1000000000}
+
+
+def _money_value(match, group: int = 1) -> float:
+    """$ 71.78K -> 71780.0 (vírgulas são separador de milhar)"""
+    value = float(match.group(group).replace(',', ''))
+    unit = match.group(group + 1)
+    if unit in UNIT_MULTIPLIERS:
+        value *= UNIT_MULTIPLIERS[unit]
+    return value
+
+
+def _int_value(match, group: int = 1) -> int:
+    """1,234 -> 1234"""
+    return int(match.group(group).replace(',', ''))
+
+
+def _percent_value(match, group: int = 1) -> float:
+    """55,22% -> 55.22 (vírgula é separador decimal)"""
+    return float(match.group(group).replace(',', '.'))
+
+
+# Conversores do modo por linhas: padrão do valor (após o ':' do rótulo) e conversão
+MONEY = (re.compile(r'\s*\$\s*([\d.,]+)([KMB]?)'), _money_value)
+INTEGER = (re.compile(r'\s*([\d,]+)'), _int_value)
+PERCENT = (re.compile(r'\s*([\d.,]+)%'), _percent_value)
+SIGNED_PERCENT = (re.compile(r'\s*([-+]?[\d.,]+)%'), _percent_value)
+
+# Rótulo -> (campo, conversor, prefixo exigido) - os mesmos campos e prefixos dos padrões do modo regex
+LINE_LABELS = {
+    # 📊 Market Overview
+    'Market Cap': ('market_cap', MONEY, '├'),
+    'Price%': ('price_change', SIGNED_PERCENT, '├'),
+    'Traders': ('traders', INTEGER, '├'),
+    'Buy Volume': ('buy_volume', MONEY, '├'),
+    'Sell Volume': ('sell_volume', MONEY, '├'),
+    'Buy Count': ('buy_count', INTEGER, '├'),
+    'Sell Count': ('sell_count', INTEGER, '├'),
+    'Buyers': ('buyers', INTEGER, '├'),
+    'Sellers': ('sellers', INTEGER, '└'),
+    # 📊 Wallet Insights
+    'Holders Totais': ('holders_totais', INTEGER, '├'),
+    'Smart Wallets': ('smart_wallets', INTEGER, '├'),
+    'Fresh Wallets': ('fresh_wallets', INTEGER, '├'),
+    'Renowned Wallets': ('renowned_wallets', INTEGER, '├'),
+    'Creator Wallets': ('creator_wallets', INTEGER, '├'),
+    'Sniper Wallets': ('sniper_wallets', INTEGER, '├'),
+    'Rat Traders': ('rat_traders', INTEGER, '├'),
+    'Whale Wallets': ('whale_wallets', INTEGER, '├'),
+    'Top Wallets': ('top_wallets', INTEGER, '├'),
+    'Following Wallets': ('following_wallets', INTEGER, '├'),
+    'Bluechip Holders': ('bluechip_holders', INTEGER, '├'),
+    'Bundler Wallets': ('bundler_wallets', INTEGER, '└'),
+    # 📈 Risk Metrics
+    '%Bluechip Holders': ('bluechip_holders_percentage', PERCENT, '├'),
+    '%Rat Trader Supply': ('rat_trader_supply_percentage', PERCENT, '├'),
+    '%Bundler Supply': ('bundler_supply_percentage', PERCENT, '├'),
+    '%Entrapment Supply': ('entrapment_supply_percentage', PERCENT, '├'),
+    'Degen Calls': ('degen_calls', INTEGER, '├'),
+    'Sinais Técnicos': ('sinais_tecnicos', INTEGER, '└'),
+}
+
+
+
+def _label_pattern(label: str) -> str:
+    """Rótulo de LINE_LABELS -> trecho de regex ('%Bundler Supply' aceita espaços após o %)"""
+    if label.startswith('%'):
+        return r'%\s*' + re.escape(label[1:])
+    return re.escape(label)
+
+
+# Modo regex: um padrão pré-compilado por campo (├\s*Traders:\s*([\d,]+)) -> (padrão, conversor, rótulo)
+FIELD_PATTERNS = {
+    field: (re.compile(branch + r'\s*' + _label_pattern(label) + ':' + value_pattern.pattern), convert, label)
+    for label, (field, (value_pattern, convert), branch) in LINE_LABELS.items()
+}
+
+
+def _combined_pattern():
+    r"""Todos os campos em uma alternação: ├\s*(?:Market Cap:...(?P<market_cap>)|...)|└\s*(?:...)
+    
+    O grupo nomeado fica vazio no fim de cada alternativa: assim cada uma começa com um
+    literal e o re descarta as alternativas pelo primeiro caractere (~4x mais rápido).
+    """
+    alternatives = {}
+    for label, (field, (value_pattern, _), branch) in LINE_LABELS.items():
+        alternatives.setdefault(branch, []).append(f"{_label_pattern(label)}:{value_pattern.pattern}(?P<{field}>)")
+    return re.compile('|'.join(branch + r'\s*(?:' + '|'.join(groups) + ')' for branch, groups in alternatives.items()))
+
+
+# Modo combined: um único finditer; lastgroup indica o campo e os grupos do valor vêm antes do marcador
+COMBINED_PATTERN = _combined_pattern()
+COMBINED_VALUE_GROUPS = {
+    field: COMBINED_PATTERN.groupindex[field] - value_pattern.groups
+    for field, (value_pattern, _), _ in LINE_LABELS.values()
+}
+
+# Nome e contrato (comuns a todos os modos)
+TOKEN_NAME_PATTERN = re.compile(r'^(.+?)\s*\(([^)]+)\)(?:\s*$|\s*├)')
+TOKEN_NAME_FALLBACK_PATTERN = re.compile(r'^([^📊📈🔍👨‍💻🏭🌐]+?)\s*\(([^)]+)\)')
+NAME_EMOJI_PATTERN = re.compile(r'[🟣👀🟢🔴🟡🐋♦️]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+CONTRACT_PATTERNS = [re.compile(pattern, re.MULTILINE) for pattern in (
+    r'├\s*([A-Za-z0-9]{32,50})\s*(?:\n|$)',  # Linha com ├ seguida de endereço
+    r'└\s*([A-Za-z0-9]{32,50})\s*(?:\n|$)',  # Linha com └ seguida de endereço
+    r'^([A-Za-z0-9]{32,50})\s*$',            # Linha só com endereço
+    r'CA:\s*([A-Za-z0-9]{32,50})',           # Formato "CA: endereço"
+    r'Contract:\s*([A-Za-z0-9]{32,50})',     # Formato "Contract: endereço"
+)]
+NUMERIC_PATTERN = re.compile(r'^\d+$')
+
+# Totais das seções (linha com o emoji da seção)
+TOP_HOLDERS_PATTERN = re.compile(r'📊.*?Top 10 Holders:\s*([\d.,]+)%')
+SOURCE_WALLETS_PATTERN = re.compile(r'🔍.*?Source Wallets:\s*([\d.,]+)%')
+# Totais de seção do modo por linhas: (emoji, rótulo, campo)
+SECTION_TOTALS = (('📊', 'Top 10 Holders:', 'top_holders_percentage'),
+                  ('🔍', 'Source Wallets:', 'source_wallets_percentage'))
+HOLDER_LINE = re.compile(HOLDER_PATTERN)
+SOURCE_LINE = re.compile(SOURCE_PATTERN)
+
 
 class MessageParser:
-    def __init__(self):
-        pass
+    # Padrões característicos das mensagens de token
+    TOKEN_MESSAGE_INDICATORS = [
+        '📊 Market Overview',
+        'Market Cap:',
+        '📊 Wallet Insights',
+        '📈 Risk Metrics',
+        '📊 Top 10 Holders',
+        
+        # Mantém compatibilidade com formato antigo
+        '👥 Wallet Statistics',
+        '📊 Top 20 Holders'
+    ]
+    
+    def __init__(self, mode: Optional[str] = None, cache: Optional[ParseCache] = None):
+        # 'regex' (uma busca por campo sobre o texto todo), 'line' (uma passada pelas linhas)
+        # ou 'combined' (um finditer com todos os campos, com fallback por campo)
+        self.mode = mode or Config.PARSER_MODE
+        if self.mode not in ('regex', 'line', 'combined'):
+            raise ValueError(f"Modo de parser inválido: {self.mode}")
+        self.stats = {'parsed': 0, 'fallback_messages': 0, 'fallback_hits': 0}
+        self.fallback_fields = {}  # Campo -> acertos do fallback (mudança no formato das mensagens)
+        self.cache = cache  # ParseCache opcional para mensagens repetidas/encaminhadas
+    
+    def is_token_message(self, message_text: str) -> bool:
+        """Verifica se a mensagem contém informações de token"""
+        return any(indicator in message_text for indicator in self.TOKEN_MESSAGE_INDICATORS)
+    
+    def extract_token_name(self, message_text: str, lines: Optional[List[str]] = None) -> Optional[str]:
+        """Nome do token: primeira linha sem emoji de seção ("Nome (Símbolo)" ou a linha inteira)"""
+        if lines is None:
+            lines = message_text.strip().split('\n')
+        token_name = None
+        
+        # Procura o nome do token na primeira linha que não contenha emojis de seção
+        for line in lines:
+            line = line.strip()
+            if line and not any(emoji in line for emoji in ['📊', '📈', '🔍', '👨‍💻', '🏭', '🌐']):
+                # Procura por padrão "Nome (Símbolo)" na primeira linha válida
+                token_match = TOKEN_NAME_PATTERN.search(line)
+                if token_match:
+                    token_name = token_match.group(1).strip()
+                    break
+                else:
+                    # Se não encontrar parênteses, usa a linha inteira (até o primeiro ├ se houver)
+                    if '├' in line:
+                        token_name = line.split('├')[0].strip()
+                    else:
+                        token_name = line.strip()
+                    break
+        
+        # Fallback: se não encontrou nas primeiras linhas, procura por padrão mais flexível
+        if not token_name:
+            # Procura por qualquer texto seguido de parênteses que não seja uma seção
+            token_match = TOKEN_NAME_FALLBACK_PATTERN.search(message_text.strip())
+            if token_match:
+                token_name = token_match.group(1).strip()
+        
+        # Limpa o nome do token de caracteres desnecessários
+        if token_name:
+            # Remove emojis comuns que podem aparecer
+            token_name = NAME_EMOJI_PATTERN.sub('', token_name).strip()
+            # Remove múltiplos espaços
+            token_name = WHITESPACE_PATTERN.sub(' ', token_name)
+        return token_name
+    
+    def extract_contract_address(self, message_text: str) -> Optional[str]:
+        """Endereço do contrato (o mesmo do parse completo) sem extrair os demais campos.
+        
+        Usado pelo bot antes do parse para descartar contratos repetidos.
+        """
+        # Busca padrões mais flexíveis para capturar o endereço (CONTRACT_PATTERNS)
+        for pattern in CONTRACT_PATTERNS:
+            contract_match = pattern.search(message_text)
+            if contract_match:
+                potential_address = contract_match.group(1).strip()
+                # Verifica se não é um valor numérico (como timestamp ou ID)
+                if not NUMERIC_PATTERN.match(potential_address):
+                    return potential_address
+        return None
     
     def parse_token_message(self, message_text: str) -> Dict[str, Any]:
+        """Extrai os valores da mensagem (cópia mutável; com cache, repetições não são parseadas de novo)"""
+        if self.cache is None:
+            return self._parse_token_message(message_text)
+        token_data = dict(self.parse_token_message_frozen(message_text))
+        token_data['raw_message'] = message_text  # Texto original, não o normalizado da chave
+        return token_data
+    
+    def parse_token_message_frozen(self, message_text: str) -> Mapping[str, Any]:
+        """Como parse_token_message, mas retorna o resultado somente leitura guardado no cache.
+        
+        Com cache o parse é feito sobre o texto normalizado (ParseCache.normalize), de modo
+        que o resultado depende apenas da chave.
+        """
+        if self.cache is None:
+            return MappingProxyType(self._parse_token_message(message_text))
+        normalized_text = ParseCache.normalize(message_text)
+        key = ParseCache.key(normalized_text)
+        token_data = self.cache.get(key)
+        if token_data is None:
+            token_data = self.cache.put(key, self._parse_token_message(normalized_text))
+        return token_data
+    
+    def _parse_token_message(self, message_text: str) -> Dict[str, Any]:
         """
         Extrai apenas os valores numéricos principais para comparação
         """
@@ -67,223 +297,24 @@ class MessageParser:
         
         # Extrai nome do token - procura no início da mensagem, antes de qualquer seção com emojis
         lines = message_text.strip().split('\n')
-        token_name = None
-        
-        # Procura o nome do token na primeira linha que não contenha emojis de seção
-        for line in lines:
-            line = line.strip()
-            if line and not any(emoji in line for emoji in ['📊', '📈', '🔍', '👨‍💻', '🏭', '🌐']):
-                # Procura por padrão "Nome (Símbolo)" na primeira linha válida
-                token_match = re.search(r'^(.+?)\s*\(([^)]+)\)(?:\s*$|\s*├)', line)
-                if token_match:
-                    token_name = token_match.group(1).strip()
-                    break
-                else:
-                    # Se não encontrar parênteses, usa a linha inteira (até o primeiro ├ se houver)
-                    if '├' in line:
-                        token_name = line.split('├')[0].strip()
-                    else:
-                        token_name = line.strip()
-                    break
-        
-        # Fallback: se não encontrou nas primeiras linhas, procura por padrão mais flexível
-        if not token_name:
-            # Procura por qualquer texto seguido de parênteses que não seja uma seção
-            token_match = re.search(r'^([^📊📈🔍👨‍💻🏭🌐]+?)\s*\(([^)]+)\)', message_text.strip())
-            if token_match:
-                token_name = token_match.group(1).strip()
-        
-        # Limpa o nome do token de caracteres desnecessários
-        if token_name:
-            # Remove emojis comuns que podem aparecer
-            token_name = re.sub(r'[🟣👀🟢🔴🟡🐋♦️]', '', token_name).strip()
-            # Remove múltiplos espaços
-            token_name = re.sub(r'\s+', ' ', token_name)
-            
-        token_data['token_name'] = token_name
+        token_data['token_name'] = self.extract_token_name(message_text, lines)
         
         # 📊 Contract Address - extrai endereço de contrato
-        # Busca padrões mais flexíveis para capturar o endereço
-        contract_patterns = [
-            r'├\s*([A-Za-z0-9]{32,50})\s*(?:\n|$)',  # Linha com ├ seguida de endereço
-            r'└\s*([A-Za-z0-9]{32,50})\s*(?:\n|$)',  # Linha com └ seguida de endereço
-            r'^([A-Za-z0-9]{32,50})\s*$',            # Linha só com endereço
-            r'CA:\s*([A-Za-z0-9]{32,50})',           # Formato "CA: endereço"
-            r'Contract:\s*([A-Za-z0-9]{32,50})',     # Formato "Contract: endereço"
-        ]
-        
-        for pattern in contract_patterns:
-            contract_match = re.search(pattern, message_text, re.MULTILINE)
-            if contract_match:
-                potential_address = contract_match.group(1).strip()
-                # Verifica se não é um valor numérico (como timestamp ou ID)
-                if not re.match(r'^\d+$', potential_address):
-                    token_data['contract_address'] = potential_address
-                    break
-        
-        # 📊 Market Overview - extrai valores numéricos
-        # Market Cap
-        market_cap_match = re.search(r'├\s*Market Cap:\s*\$\s*([\d.,]+)([KMB]?)', message_text)
-        if market_cap_match:
-            value = float(market_cap_match.group(1).replace(',', ''))
-            unit = market_cap_match.group(2)
-            if unit == 'K':
-                value *= 1000
-            elif unit == 'M':
-                value *= 1000000
-            elif unit == 'B':
-                value *= 1000000000
-            token_data['market_cap'] = value
-        
-        # Price Change
-        price_change_match = re.search(r'├\s*Price%:\s*([-+]?[\d.,]+)%', message_text)
-        if price_change_match:
-            token_data['price_change'] = float(price_change_match.group(1).replace(',', '.'))
-        
-        # Traders
-        traders_match = re.search(r'├\s*Traders:\s*([\d,]+)', message_text)
-        if traders_match:
-            token_data['traders'] = int(traders_match.group(1).replace(',', ''))
-        
-        # Buy Volume
-        buy_volume_match = re.search(r'├\s*Buy Volume:\s*\$\s*([\d.,]+)([KMB]?)', message_text)
-        if buy_volume_match:
-            value = float(buy_volume_match.group(1).replace(',', ''))
-            unit = buy_volume_match.group(2)
-            if unit == 'K':
-                value *= 1000
-            elif unit == 'M':
-                value *= 1000000
-            elif unit == 'B':
-                value *= 1000000000
-            token_data['buy_volume'] = value
-        
-        # Sell Volume
-        sell_volume_match = re.search(r'├\s*Sell Volume:\s*\$\s*([\d.,]+)([KMB]?)', message_text)
-        if sell_volume_match:
-            value = float(sell_volume_match.group(1).replace(',', ''))
-            unit = sell_volume_match.group(2)
-            if unit == 'K':
-                value *= 1000
-            elif unit == 'M':
-                value *= 1000000
-            elif unit == 'B':
-                value *= 1000000000
-            token_data['sell_volume'] = value
-        
-        # Buy Count
-        buy_count_match = re.search(r'├\s*Buy Count:\s*([\d,]+)', message_text)
-        if buy_count_match:
-            token_data['buy_count'] = int(buy_count_match.group(1).replace(',', ''))
-        
-        # Sell Count
-        sell_count_match = re.search(r'├\s*Sell Count:\s*([\d,]+)', message_text)
-        if sell_count_match:
-            token_data['sell_count'] = int(sell_count_match.group(1).replace(',', ''))
-        
-        # Buyers
-        buyers_match = re.search(r'├\s*Buyers:\s*([\d,]+)', message_text)
-        if buyers_match:
-            token_data['buyers'] = int(buyers_match.group(1).replace(',', ''))
-        
-        # Sellers
-        sellers_match = re.search(r'└\s*Sellers:\s*([\d,]+)', message_text)
-        if sellers_match:
-            token_data['sellers'] = int(sellers_match.group(1).replace(',', ''))
-        
-
-        
-        # 📊 Wallet Insights - extrai valores numéricos
-        # Holders Totais
-        holders_totais_match = re.search(r'├\s*Holders Totais:\s*([\d,]+)', message_text)
-        if holders_totais_match:
-            token_data['holders_totais'] = int(holders_totais_match.group(1).replace(',', ''))
-        
-        # Smart Wallets
-        smart_wallets_match = re.search(r'├\s*Smart Wallets:\s*([\d,]+)', message_text)
-        if smart_wallets_match:
-            token_data['smart_wallets'] = int(smart_wallets_match.group(1).replace(',', ''))
-        
-        # Fresh Wallets
-        fresh_wallets_match = re.search(r'├\s*Fresh Wallets:\s*([\d,]+)', message_text)
-        if fresh_wallets_match:
-            token_data['fresh_wallets'] = int(fresh_wallets_match.group(1).replace(',', ''))
-        
-        # Renowned Wallets
-        renowned_wallets_match = re.search(r'├\s*Renowned Wallets:\s*([\d,]+)', message_text)
-        if renowned_wallets_match:
-            token_data['renowned_wallets'] = int(renowned_wallets_match.group(1).replace(',', ''))
-        
-        # Creator Wallets
-        creator_wallets_match = re.search(r'├\s*Creator Wallets:\s*([\d,]+)', message_text)
-        if creator_wallets_match:
-            token_data['creator_wallets'] = int(creator_wallets_match.group(1).replace(',', ''))
-        
-        # Sniper Wallets
-        sniper_wallets_match = re.search(r'├\s*Sniper Wallets:\s*([\d,]+)', message_text)
-        if sniper_wallets_match:
-            token_data['sniper_wallets'] = int(sniper_wallets_match.group(1).replace(',', ''))
-        
-        # Rat Traders
-        rat_traders_match = re.search(r'├\s*Rat Traders:\s*([\d,]+)', message_text)
-        if rat_traders_match:
-            token_data['rat_traders'] = int(rat_traders_match.group(1).replace(',', ''))
-        
-        # Whale Wallets
-        whale_wallets_match = re.search(r'├\s*Whale Wallets:\s*([\d,]+)', message_text)
-        if whale_wallets_match:
-            token_data['whale_wallets'] = int(whale_wallets_match.group(1).replace(',', ''))
-        
-        # Top Wallets
-        top_wallets_match = re.search(r'├\s*Top Wallets:\s*([\d,]+)', message_text)
-        if top_wallets_match:
-            token_data['top_wallets'] = int(top_wallets_match.group(1).replace(',', ''))
-        
-        # Following Wallets
-        following_wallets_match = re.search(r'├\s*Following Wallets:\s*([\d,]+)', message_text)
-        if following_wallets_match:
-            token_data['following_wallets'] = int(following_wallets_match.group(1).replace(',', ''))
-        
-        # Bluechip Holders
-        bluechip_holders_match = re.search(r'├\s*Bluechip Holders:\s*([\d,]+)', message_text)
-        if bluechip_holders_match:
-            token_data['bluechip_holders'] = int(bluechip_holders_match.group(1).replace(',', ''))
-        
-        # Bundler Wallets
-        bundler_wallets_match = re.search(r'└\s*Bundler Wallets:\s*([\d,]+)', message_text)
-        if bundler_wallets_match:
-            token_data['bundler_wallets'] = int(bundler_wallets_match.group(1).replace(',', ''))
-        
-        # 📈 Risk Metrics - extrai porcentagens
-        # % Bluechip Holders
-        bluechip_pct_match = re.search(r'├\s*%\s*Bluechip Holders:\s*([\d.,]+)%', message_text)
-        if bluechip_pct_match:
-            token_data['bluechip_holders_percentage'] = float(bluechip_pct_match.group(1).replace(',', '.'))
-        
-        # % Rat Trader Supply
-        rat_trader_pct_match = re.search(r'├\s*%\s*Rat Trader Supply:\s*([\d.,]+)%', message_text)
-        if rat_trader_pct_match:
-            token_data['rat_trader_supply_percentage'] = float(rat_trader_pct_match.group(1).replace(',', '.'))
-        
-        # % Bundler Supply
-        bundler_supply_pct_match = re.search(r'├\s*%\s*Bundler Supply:\s*([\d.,]+)%', message_text)
-        if bundler_supply_pct_match:
-            token_data['bundler_supply_percentage'] = float(bundler_supply_pct_match.group(1).replace(',', '.'))
-        
-        # % Entrapment Supply
-        entrapment_pct_match = re.search(r'├\s*%\s*Entrapment Supply:\s*([\d.,]+)%', message_text)
-        if entrapment_pct_match:
-            token_data['entrapment_supply_percentage'] = float(entrapment_pct_match.group(1).replace(',', '.'))
-        
-        # Degen Calls
-        degen_calls_match = re.search(r'├\s*Degen Calls:\s*([\d,]+)', message_text)
-        if degen_calls_match:
-            token_data['degen_calls'] = int(degen_calls_match.group(1).replace(',', ''))
-        
-        # Sinais Técnicos
-        sinais_match = re.search(r'└\s*Sinais Técnicos:\s*([\d,]+)', message_text)
-        if sinais_match:
-            token_data['sinais_tecnicos'] = int(sinais_match.group(1).replace(',', ''))
+        token_data['contract_address'] = self.extract_contract_address(message_text)
+        
+        self.stats['parsed'] += 1
+        if self.mode == 'line':
+            self._parse_lines(lines, token_data)
+            return token_data
+        
+        if self.mode == 'combined':
+            self._parse_combined(message_text, token_data)
+        else:
+            # 📊 Market Overview, 📊 Wallet Insights e 📈 Risk Metrics - uma busca por campo
+            for field, (pattern, convert, _) in FIELD_PATTERNS.items():
+                field_match = pattern.search(message_text)
+                if field_match:
+                    token_data[field] = convert(field_match)
         
         # 📊 Top 10 Holders - análise sofisticada
         self._extract_holders_analysis(message_text, token_data)
@@ -291,26 +322,141 @@ class MessageParser:
         # 🔍 Source Wallets - análise real
         self._extract_source_wallets_analysis(message_text, token_data)
         
-
-        
         return token_data
     
+    def _parse_combined(self, message_text: str, token_data: Dict[str, Any]):
+        """Extrai os campos numéricos com um único finditer de COMBINED_PATTERN.
+        
+        Campos que não apareceram no passe combinado e cujo rótulo está na mensagem são
+        procurados com o padrão do campo (FIELD_PATTERNS); cada acerto desse fallback é
+        contado em stats/fallback_fields, sinalizando mudança no formato das mensagens.
+        """
+        for field_match in COMBINED_PATTERN.finditer(message_text):
+            field = field_match.lastgroup
+            if token_data[field] is None:
+                token_data[field] = FIELD_PATTERNS[field][1](field_match, COMBINED_VALUE_GROUPS[field])
+        
+        hits = 0
+        for field, (pattern, convert, label) in FIELD_PATTERNS.items():
+            if token_data[field] is not None or label.lstrip('%') not in message_text:
+                continue
+            field_match = pattern.search(message_text)
+            if field_match:
+                token_data[field] = convert(field_match)
+                self.fallback_fields[field] = self.fallback_fields.get(field, 0) + 1
+                hits += 1
+        if hits:
+            self.stats['fallback_messages'] += 1
+            self.stats['fallback_hits'] += hits
+    
+    def _parse_lines(self, lines: List[str], token_data: Dict[str, Any]):
+        """Extrai os campos numéricos em uma única passada pelas linhas.
+        
+        Cada trecho após ├/└ tem o rótulo (até o ':') despachado por LINE_LABELS para o
+        conversor do campo; vale a primeira ocorrência válida, como no modo regex.
+        """
+        holder_matches = []
+        source_matches = []
+        carried = ''
+        
+        for line in lines:
+            # ├/└, '├ Rótulo:' ou '📊 Top 10 Holders:' sem valor no fim da linha vale para a
+            # próxima (o \s* do modo regex atravessa a quebra)
+            if carried:
+                line = carried + line
+            carried = self._pending_branch(line) or self._pending_section_total(line, token_data)
+            
+            if token_data['top_holders_percentage'] is None and '📊' in line:
+                self._section_total(TOP_HOLDERS_PATTERN, line, 'top_holders_percentage', token_data)
+            if token_data['source_wallets_percentage'] is None and '🔍' in line:
+                self._section_total(SOURCE_WALLETS_PATTERN, line, 'source_wallets_percentage', token_data)
+            if '├' not in line and '└' not in line:
+                continue
+            
+            if '...' in line and 'SOL' in line:
+                holder_matches.extend(HOLDER_LINE.findall(line))
+            if 'hop' in line:
+                source_matches.extend(SOURCE_LINE.findall(line))
+            
+            for branch_position, branch in enumerate(line):
+                if branch != '├' and branch != '└':
+                    continue
+                segment = line[branch_position + 1:].lstrip()
+                colon = segment.find(':')
+                if colon <= 0:
+                    continue
+                label = segment[:colon]
+                if label[0] == '%':
+                    label = '%' + label[1:].lstrip()
+                entry = LINE_LABELS.get(label)
+                if entry is None:
+                    continue
+                field, (pattern, convert), required_branch = entry
+                if branch != required_branch or token_data[field] is not None:
+                    continue
+                value_match = pattern.match(segment, colon + 1)
+                if value_match:
+                    token_data[field] = convert(value_match)
+        
+        # 📊 Top 10 Holders e 🔍 Source Wallets - mesmas métricas do modo regex
+        if holder_matches:
+            self._apply_holders_analysis(holder_matches, token_data)
+        if source_matches:
+            self._apply_source_wallets_analysis(source_matches, token_data)
+    
+    @staticmethod
+    def _pending_branch(line: str) -> str:
+        """Trecho final da linha que continua na próxima: ├/└ sozinho ou seguido de um rótulo com ':' e sem valor"""
+        tail = line.rstrip()
+        branch_position = max(tail.rfind('├'), tail.rfind('└'))
+        if branch_position < 0:
+            return ''
+        segment = tail[branch_position + 1:].lstrip()
+        if segment:
+            if segment.find(':') != len(segment) - 1:
+                return ''
+            label = segment[:-1]
+            if label[0] == '%':
+                label = '%' + label[1:].lstrip()
+            if label not in LINE_LABELS:
+                return ''
+        return tail[branch_position:] + '\n'
+    
+    @staticmethod
+    def _pending_section_total(line: str, token_data: Dict[str, Any]) -> str:
+        """Trecho '📊 ... Top 10 Holders:' / '🔍 ... Source Wallets:' sem valor no fim da linha (o total vem na próxima)"""
+        tail = line.rstrip()
+        for emoji, label, field in SECTION_TOTALS:
+            if token_data[field] is not None or not tail.endswith(label):
+                continue
+            emoji_position = tail.rfind(emoji)
+            if emoji_position >= 0 and '\n' not in tail[emoji_position:]:
+                return tail[emoji_position:] + '\n'
+        return ''
+    
+    @staticmethod
+    def _section_total(pattern, line: str, field: str, token_data: Dict[str, Any]):
+        total_match = pattern.search(line)
+        if total_match:
+            token_data[field] = _percent_value(total_match)
+    
     def _extract_holders_analysis(self, message_text: str, token_data: Dict[str, Any]):
         """Extrai análise detalhada dos Top 10 Holders"""
         
         # 1. Porcentagem total dos top 10
-        holders_match = re.search(r'📊.*?Top 10 Holders:\s*([\d.,]+)%', message_text)
+        holders_match = TOP_HOLDERS_PATTERN.search(message_text)
         if holders_match:
             token_data['top_holders_percentage'] = float(holders_match.group(1).replace(',', '.'))
         
         # 2. Extrai porcentagens individuais dos holders e valores de SOL
+        holder_matches = HOLDER_LINE.findall(message_text)
+        self._apply_holders_analysis(holder_matches, token_data)
+    
+    def _apply_holders_analysis(self, holder_matches: List[Tuple[str, str]], token_data: Dict[str, Any]):
+        """Métricas de concentração a partir das linhas dos holders [(porcentagem, SOL)]"""
         holder_percentages = []
         holder_sol_amounts = []
         
-        # Padrão para encontrar as linhas dos holders: ├  1. ABC...XYZ - 4.20% - 65.92 SOL
-        holder_pattern = r'[├└]\s*\d+\.\s+\w+\.\.\.\w+\s*-\s*([\d.,]+)%\s*-\s*([\d.,]+)\s*SOL'
-        holder_matches = re.findall(holder_pattern, message_text)
-        
         for match in holder_matches:
             percentage = float(match[0].replace(',', '.'))
             sol_amount = float(match[1].replace(',', '.'))
@@ -382,18 +528,19 @@ class MessageParser:
         """Extrai análise detalhada dos Source Wallets"""
         
         # 1. Porcentagem total dos source wallets: 🔍 Source Wallets: 14.73% (com possível link no meio)
-        source_wallets_match = re.search(r'🔍.*?Source Wallets:\s*([\d.,]+)%', message_text)
+        source_wallets_match = SOURCE_WALLETS_PATTERN.search(message_text)
         if source_wallets_match:
             token_data['source_wallets_percentage'] = float(source_wallets_match.group(1).replace(',', '.'))
         
         # 2. Extrai informações individuais dos source wallets
+        source_matches = SOURCE_LINE.findall(message_text)
+        self._apply_source_wallets_analysis(source_matches, token_data)
+    
+    def _apply_source_wallets_analysis(self, source_matches: List[str], token_data: Dict[str, Any]):
+        """Quantidade e média de hops a partir das linhas dos source wallets"""
         hop_values = []
         wallet_count = 0
         
-        # Padrão para encontrar linhas: ├ 5tzFki...uAi9 -  5 hops ou ├ Debridge - 10 hops
-        source_pattern = r'[├└]\s+[\w🔹]+.*?\s*-\s*(\d+)\s+hops?'
-        source_matches = re.findall(source_pattern, message_text)
-        
         for match in source_matches:
             hops = int(match)
             hop_values.append(hops)
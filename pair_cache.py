@@ -0,0 +1,158 @@
+import hashlib
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Any, Tuple, Iterable
+from vectorized_similarity import TokenMatrix
+
+
+class PairScoreCache:
+    """Cache LRU de scores (alvo, token do banco) -> (similaridade geral, seções).
+
+    As entradas são agrupadas por fingerprint do alvo em blocos colunares ordenados por id
+    do banco, e o limite de tamanho conta pares. Invalidado pelo TokenDatabase quando
+    tokens são removidos, o banco é limpo ou restaurado.
+    """
+
+    def __init__(self, section_names: List[str], fields: List[str], max_pairs: int = 200000):
+        self.section_names = list(section_names)
+        self.fields = list(fields)
+        self.max_pairs = max_pairs
+        self.blocks = OrderedDict()  # fingerprint -> (ids, overall, {seção: scores})
+        self.size = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_pairs > 0
+
+    def fingerprint(self, target_token: Dict[str, Any]) -> bytes:
+        """Identifica o alvo pelos valores dos campos pontuados (ValueError se não numérico)"""
+        values = np.zeros(len(self.fields), dtype=np.float64)
+        present = np.zeros(len(self.fields), dtype=bool)
+        for col, field in enumerate(self.fields):
+            value = TokenMatrix.to_float(target_token.get(field))
+            if value is not None:
+                values[col] = value
+                present[col] = True
+        return hashlib.blake2b(values.tobytes() + np.packbits(present).tobytes(), digest_size=16).digest()
+
+    def lookup(self, fingerprint: bytes, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        """Retorna (encontrado, similaridade, seções) alinhados com ids (zeros onde não encontrado)"""
+        found = np.zeros(len(ids), dtype=bool)
+        overall = np.zeros(len(ids), dtype=np.float64)
+        sections = {name: np.zeros(len(ids), dtype=np.float64) for name in self.section_names}
+
+        block = self.blocks.get(fingerprint)
+        if block is not None and len(ids):
+            self.blocks.move_to_end(fingerprint)
+            block_ids, block_overall, block_sections = block
+            positions = np.minimum(np.searchsorted(block_ids, ids), max(len(block_ids) - 1, 0))
+            if len(block_ids):
+                found = block_ids[positions] == ids
+                overall[found] = block_overall[positions[found]]
+                for name in self.section_names:
+                    sections[name][found] = block_sections[name][positions[found]]
+
+        hits = int(np.count_nonzero(found))
+        self.stats['hits'] += hits
+        self.stats['misses'] += len(ids) - hits
+        return found, overall, sections
+
+    def store(self, fingerprint: bytes, ids: np.ndarray, overall: np.ndarray, sections: Dict[str, np.ndarray]):
+        """Adiciona pares ao bloco do alvo (ids ainda não presentes no bloco)"""
+        if not self.enabled or len(ids) == 0:
+            return
+
+        block = self.blocks.pop(fingerprint, None)
+        if block is not None:
+            self.size -= len(block[0])
+            ids = np.concatenate([block[0], ids])
+            overall = np.concatenate([block[1], overall])
+            sections = {name: np.concatenate([block[2][name], sections[name]]) for name in self.section_names}
+
+        if len(ids) > self.max_pairs:
+            return
+
+        order = np.argsort(ids, kind='stable')
+        self.blocks[fingerprint] = (ids[order], overall[order], {name: sections[name][order] for name in self.section_names})
+        self.size += len(ids)
+
+        while self.size > self.max_pairs:
+            _, (evicted_ids, _, _) = self.blocks.popitem(last=False)
+            self.size -= len(evicted_ids)
+            self.stats['evictions'] += 1
+
+    def invalidate_ids(self, token_ids: Iterable[int]):
+        """Remove os pares dos tokens do banco informados"""
+        token_ids = np.fromiter(token_ids, dtype=np.int64)
+        if len(token_ids) == 0 or not self.blocks:
+            return
+        for fingerprint, (ids, overall, sections) in list(self.blocks.items()):
+            keep = ~np.isin(ids, token_ids)
+            if keep.all():
+                continue
+            self.size -= int(len(keep) - np.count_nonzero(keep))
+            self.stats['invalidations'] += int(len(keep) - np.count_nonzero(keep))
+            self.blocks[fingerprint] = (ids[keep], overall[keep], {name: scores[keep] for name, scores in sections.items()})
+
+    def clear(self):
+        """Remove todas as entradas (banco limpo/restaurado ou pesos alterados)"""
+        self.stats['invalidations'] += self.size
+        self.blocks.clear()
+        self.size = 0
+
+
+class ContractSectionCache:
+    """Último token pontuado por contrato, com digest por seção e os scores por seção.
+
+    Quando o mesmo contrato volta com dados atualizados, só as seções cujo digest mudou
+    precisam ser recalculadas; as demais reaproveitam os scores guardados.
+    """
+
+    def __init__(self, section_fields: Dict[str, List[str]], max_contracts: int = 64):
+        self.section_fields = section_fields
+        self.max_contracts = max_contracts
+        self.contracts = OrderedDict()  # contrato -> (digests, ids, {seção: scores})
+        self.stats = {'incremental': 0, 'reused_sections': 0, 'rescored_sections': 0}
+
+    def __len__(self) -> int:
+        return len(self.contracts)
+
+    def section_digests(self, target_token: Dict[str, Any]) -> Dict[str, bytes]:
+        """Digest dos valores de cada seção do token (ValueError se não numérico)"""
+        digests = {}
+        for section_name, fields in self.section_fields.items():
+            values = [TokenMatrix.to_float(target_token.get(field)) for field in fields]
+            digests[section_name] = hashlib.blake2b(repr(values).encode(), digest_size=16).digest()
+        return digests
+
+    def get(self, contract_address: str):
+        state = self.contracts.get(contract_address)
+        if state is not None:
+            self.contracts.move_to_end(contract_address)
+        return state
+
+    def put(self, contract_address: str, digests: Dict[str, bytes], ids: np.ndarray, sections: Dict[str, np.ndarray]):
+        """Guarda o estado do contrato (ids em ordem crescente, como no TokenStore)"""
+        if self.max_contracts <= 0:
+            return
+        self.contracts[contract_address] = (digests, ids.copy(), {name: scores.copy() for name, scores in sections.items()})
+        self.contracts.move_to_end(contract_address)
+        while len(self.contracts) > self.max_contracts:
+            self.contracts.popitem(last=False)
+
+    def invalidate_ids(self, token_ids: Iterable[int]):
+        """Remove as linhas dos tokens do banco informados"""
+        token_ids = np.fromiter(token_ids, dtype=np.int64)
+        if len(token_ids) == 0:
+            return
+        for contract_address, (digests, ids, sections) in list(self.contracts.items()):
+            keep = ~np.isin(ids, token_ids)
+            if not keep.all():
+                self.contracts[contract_address] = (digests, ids[keep], {name: scores[keep] for name, scores in sections.items()})
+
+    def clear(self):
+        self.contracts.clear()
@@ -0,0 +1,78 @@
+import hashlib
+import sys
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional
+
+
+class ParseCache:
+    """Cache LRU de mensagens já parseadas, indexado pelo hash do texto normalizado.
+
+    O mesmo relatório chega nos grupos de banco e de comparação ou é encaminhado várias
+    vezes; com o cache o parse acontece uma vez. As entradas são somente leitura
+    (MappingProxyType) e o limite vale para a quantidade de entradas e para o total de
+    bytes estimado. Não é thread-safe (o parser roda no worker único do WorkExecutor).
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # hash do texto -> (token_data congelado, bytes)
+        self.size_bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    @staticmethod
+    def normalize(message_text: str) -> str:
+        """Texto usado na chave e no parse (o Telegram já remove os espaços das pontas)"""
+        return message_text.strip()
+
+    @staticmethod
+    def key(normalized_text: str) -> bytes:
+        return hashlib.blake2b(normalized_text.encode('utf-8'), digest_size=16).digest()
+
+    @staticmethod
+    def entry_size(token_data: Dict[str, Any]) -> int:
+        """Bytes aproximados do dicionário e dos valores (as chaves são compartilhadas)"""
+        return sys.getsizeof(token_data) + sum(sys.getsizeof(value) for value in token_data.values())
+
+    def get(self, key: bytes) -> Optional[Mapping[str, Any]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return entry[0]
+
+    def put(self, key: bytes, token_data: Dict[str, Any]) -> Mapping[str, Any]:
+        """Guarda uma cópia congelada de token_data e a retorna"""
+        frozen = MappingProxyType(dict(token_data))
+        if not self.enabled:
+            return frozen
+
+        size = self.entry_size(token_data)
+        if size > self.max_bytes:
+            return frozen
+
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size_bytes -= previous[1]
+        self.entries[key] = (frozen, size)
+        self.size_bytes += size
+
+        while len(self.entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.size_bytes -= evicted_size
+            self.stats['evictions'] += 1
+        return frozen
+
+    def clear(self):
+        self.entries.clear()
+        self.size_bytes = 0
@@ -0,0 +1,85 @@
+from typing import Dict, List, Any, Tuple, Optional
+from vectorized_similarity import TokenMatrix, PRUNING_EPSILON
+
+# Colunas de alto sinal usadas nos predicados de faixa (indexadas no SQLite)
+PREFILTER_FIELDS = ['market_cap', 'holders_totais', 'traders']
+
+
+class RangePrefilter:
+    """Pré-filtro SQL por faixas de razão nas colunas de alto sinal.
+
+    A similaridade de um campo é min/max * 100, então um token do banco cujo valor está
+    fora de [alvo * r, alvo / r] pontua menos que r * 100 naquele campo. Modos:
+
+    - 'fast': r = threshold / 100 (descarta quem já perde o threshold no próprio campo;
+      pode perder matches que compensam nas outras seções)
+    - 'guaranteed': r é o maior valor para o qual nenhum token fora da faixa pode alcançar
+      o threshold, mesmo com todos os outros campos perfeitos. Valores ausentes/zero
+      (seção possivelmente zerada e fora da média) nunca são descartados.
+    """
+
+    MODES = ('off', 'fast', 'guaranteed')
+
+    def __init__(self, fields: Optional[List[str]] = None, mode: str = 'off'):
+        if mode not in self.MODES:
+            raise ValueError(f"Modo de pré-filtro inválido: {mode}")
+        self.fields = list(fields or PREFILTER_FIELDS)
+        self.mode = mode
+        self.stats = {'queries': 0, 'candidates': 0, 'filtered': 0, 'last_candidates': 0, 'last_filtered': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != 'off'
+
+    def ratio_bound(self, field: str, threshold: float, vectorized) -> float:
+        """Razão mínima (0-1) que um token precisa ter no campo para poder alcançar o threshold"""
+        if self.mode == 'fast':
+            return threshold / 100
+
+        section_name = next((name for name, fields in vectorized.section_fields.items() if field in fields), None)
+        if section_name is None or section_name in vectorized.weighted_sections:
+            return 0.0
+
+        # Maior score da seção do campo com o qual a geral ainda fica abaixo do threshold:
+        # a geral é a média das seções > 0 e as demais valem no máximo section_max
+        cutoff = threshold - PRUNING_EPSILON
+        remaining = sorted((vectorized.section_max[name] for name in vectorized.section_fields if name != section_name),
+                           reverse=True)
+        section_limit = cutoff
+        running_sum = 0.0
+        for count, section_max in enumerate(remaining, 2):
+            running_sum += section_max
+            section_limit = min(section_limit, count * cutoff - running_sum)
+
+        # Seção padrão com n campos: com os outros n-1 em 100, o campo precisa de razão >= r
+        n_fields = len(vectorized.section_fields[section_name])
+        return max((n_fields * section_limit - 100 * (n_fields - 1)) / 100, 0.0)
+
+    def predicates(self, target_token: Dict[str, Any], threshold: float, vectorized) -> Tuple[str, List[float]]:
+        """Cláusula WHERE (vazia se nada pode ser descartado) e seus parâmetros"""
+        clauses = []
+        params = []
+        for field in self.fields:
+            value = TokenMatrix.to_float(target_token.get(field))
+            if not value:
+                # Alvo ausente ou zero: a similaridade do campo não depende da razão
+                continue
+            ratio = min(self.ratio_bound(field, threshold, vectorized), 1.0)
+            if ratio <= 0:
+                continue
+            # Folga relativa para o arredondamento de min/max no cálculo da similaridade
+            low, high = abs(value) * ratio * (1 - 1e-9), abs(value) / ratio * (1 + 1e-9)
+            if self.mode == 'guaranteed':
+                clauses.append(f"({field} IS NULL OR {field} = 0 OR {field} BETWEEN ? AND ? OR {field} BETWEEN ? AND ?)")
+            else:
+                clauses.append(f"({field} BETWEEN ? AND ? OR {field} BETWEEN ? AND ?)")
+            params.extend([low, high, -high, -low])
+        return ' AND '.join(clauses), params
+
+    def record(self, total: int, candidates: int):
+        """Acumula quantos tokens o pré-filtro deixou de fora"""
+        self.stats['queries'] += 1
+        self.stats['candidates'] += candidates
+        self.stats['filtered'] += total - candidates
+        self.stats['last_candidates'] = candidates
+        self.stats['last_filtered'] = total - candidates
@@ -0,0 +1,82 @@
+import json
+from typing import Dict, List, Any, Tuple, Optional
+
+# Pesos padrão por campo das seções com algoritmo ponderado
+DEFAULT_SECTION_WEIGHTS = {
+    'top_holders': {
+        'top_holders_percentage': 15,           # Porcentagem total dos top 10
+        'top1_holder_percentage': 20,           # Concentração do top 1 (%)
+        'top5_holders_percentage': 15,          # Top 5 holders (%)
+        'holders_distribution_score': 15,       # Score de distribuição (%)
+        'top_holders_sol_total': 10,            # Total de SOL dos holders
+        'holders_sol_concentration_ratio': 15,  # Concentração de SOL do top 1
+        'holders_sol_distribution_score': 10    # Distribuição de SOL
+    },
+    'source_wallets': {
+        'source_wallets_percentage': 50,  # Porcentagem total (mais importante)
+        'source_wallets_count': 25,       # Quantidade de wallets
+        'source_wallets_avg_hops': 25     # Média de hops
+    }
+}
+
+# Chave da tabela settings onde os pesos editados via /weights são persistidos
+WEIGHTS_SETTING_KEY = 'section_weights'
+
+
+class ScoringPlan:
+    """Plano de pontuação compilado uma única vez (campos, pesos e regra de cada seção).
+
+    Seções 'standard' fazem a média dos campos presentes em pelo menos um token; seções
+    'weighted' somam similaridade * peso / 100 dos campos presentes nos dois tokens. O
+    plano é imutável: alterar um peso gera um novo plano (recompilação).
+    """
+
+    def __init__(self, section_fields: Dict[str, List[str]], section_weights: Optional[Dict[str, Dict[str, float]]] = None):
+        section_weights = DEFAULT_SECTION_WEIGHTS if section_weights is None else section_weights
+        self.section_fields = {name: list(fields) for name, fields in section_fields.items()}
+        self.section_weights = {}
+
+        for section_name, weights in section_weights.items():
+            if section_name not in self.section_fields:
+                raise ValueError(f"Seção desconhecida: {section_name}")
+            for field, weight in weights.items():
+                if field not in self.section_fields[section_name]:
+                    raise ValueError(f"Campo {field} não pertence à seção {section_name}")
+                if weight < 0:
+                    raise ValueError(f"Peso negativo para {field}")
+            self.section_weights[section_name] = dict(weights)
+
+        # Regras compiladas: seção -> ('standard', campos) ou ('weighted', ((campo, peso), ...))
+        self.sections = {}
+        for section_name, fields in self.section_fields.items():
+            if section_name in self.section_weights:
+                self.sections[section_name] = ('weighted', tuple(self.section_weights[section_name].items()))
+            else:
+                self.sections[section_name] = ('standard', tuple(fields))
+
+    def with_weight(self, section_name: str, field: str, weight: float) -> 'ScoringPlan':
+        """Novo plano com o peso de um campo alterado"""
+        if section_name not in self.section_weights:
+            raise ValueError(f"A seção {section_name} não usa pesos")
+        section_weights = {name: dict(weights) for name, weights in self.section_weights.items()}
+        if field not in section_weights[section_name]:
+            raise ValueError(f"Campo {field} não pertence à seção {section_name}")
+        section_weights[section_name][field] = weight
+        return ScoringPlan(self.section_fields, section_weights)
+
+    def weight_totals(self) -> Dict[str, float]:
+        """Soma dos pesos de cada seção ponderada (máximo da seção)"""
+        return {name: sum(weights.values()) for name, weights in self.section_weights.items()}
+
+    def to_json(self) -> str:
+        return json.dumps(self.section_weights)
+
+    @classmethod
+    def from_json(cls, section_fields: Dict[str, List[str]], data: Optional[str]) -> 'ScoringPlan':
+        """Plano a partir dos pesos persistidos; usa os padrões se ausentes ou inválidos"""
+        if data:
+            try:
+                return cls(section_fields, json.loads(data))
+            except (ValueError, TypeError, AttributeError):
+                pass
+        return cls(section_fields)
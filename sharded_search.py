@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Busca de similaridade particionada (shards) entre processos com a matriz em memória compartilhada
+"""
+
+import atexit
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Any, Tuple, Optional
+from vectorized_similarity import VectorizedSimilarity, TokenMatrix, TopKHeap
+
+# Linhas mínimas reservadas nos blocos compartilhados (folga para novos tokens)
+_MIN_CAPACITY = 1024
+
+# Estado de cada processo worker (motor no initializer, blocos anexados sob demanda)
+_worker_state = {}
+
+
+def _init_worker(section_fields: Dict[str, List[str]], weighted_sections: Dict[str, Dict[str, float]]):
+    """Cria o motor do worker; os blocos de memória são anexados na primeira busca"""
+    _worker_state['engine'] = VectorizedSimilarity(section_fields, weighted_sections)
+    _worker_state['blocks'] = None
+
+
+def _attach(blocks: Tuple[str, str, int, List[str]]):
+    """Anexa o worker aos blocos compartilhados (sem cópia); só reanexa quando os blocos mudam"""
+    if _worker_state.get('blocks') == blocks:
+        return
+    for block in _worker_state.get('shm', ()):
+        block.close()
+    values_name, present_name, capacity, fields = blocks
+    values_shm = shared_memory.SharedMemory(name=values_name)
+    present_shm = shared_memory.SharedMemory(name=present_name)
+    shape = (capacity, len(fields))
+    _worker_state['shm'] = (values_shm, present_shm)
+    _worker_state['values'] = np.ndarray(shape, dtype=np.float64, buffer=values_shm.buf)
+    _worker_state['present'] = np.ndarray(shape, dtype=bool, buffer=present_shm.buf)
+    _worker_state['blocks'] = blocks
+
+
+def _search_shard(blocks: Tuple[str, str, int, List[str]], start: int, end: int, target_token: Dict[str, Any],
+                  k: int, min_similarity: Optional[float]) -> Tuple[List[Tuple[int, float, Dict[str, float]]], int]:
+    """Top-k local das linhas [start, end); os 'tokens' do shard são os índices globais das linhas"""
+    _attach(blocks)
+    engine = _worker_state['engine']
+    shard = TokenMatrix(blocks[3], _worker_state['values'][start:end],
+                        _worker_state['present'][start:end], range(start, end))
+    if min_similarity is None:
+        return engine.find_top_k(target_token, shard, k), 0
+    return engine.find_top_k_pruned(target_token, shard, k, min_similarity)
+
+
+class ShardedSearch:
+    """Divide a matriz do TokenStore entre os workers de um ProcessPoolExecutor.
+
+    A matriz é copiada para blocos de memória compartilhada com folga de capacidade; cada
+    chamada envia apenas o token alvo, o intervalo do shard e a identificação dos blocos.
+    Tokens novos (append no store) são copiados no fim dos blocos sem recriar o pool;
+    remoções recopiam as linhas, e só o estouro da capacidade cria blocos maiores, que os
+    workers anexam na busca seguinte. Os top-k locais são mesclados com a mesma regra de
+    desempate (primeira ocorrência) da busca em um único processo.
+    """
+
+    def __init__(self, section_fields: Dict[str, List[str]], weighted_sections: Dict[str, Dict[str, float]],
+                 workers: int = 2):
+        self.section_fields = section_fields
+        self.weighted_sections = weighted_sections
+        self.workers = max(workers, 1)
+        self.executor = None
+        self.shared = ()
+        self.blocks = None
+        self.values = self.present = None
+        self.capacity = 0
+        self.version = None
+        self.layout = None
+        self.size = 0
+        self.stats = {'reloads': 0, 'appends': 0, 'grows': 0}
+
+    def _allocate(self, needed: int, fields: List[str], keep: int):
+        """Cria blocos maiores preservando as primeiras `keep` linhas já publicadas"""
+        capacity = max(needed + needed // 4, self.capacity * 2, _MIN_CAPACITY)
+        shape = (capacity, len(fields))
+        values_shm = shared_memory.SharedMemory(create=True, size=capacity * len(fields) * 8)
+        present_shm = shared_memory.SharedMemory(create=True, size=max(capacity * len(fields), 1))
+        values = np.ndarray(shape, dtype=np.float64, buffer=values_shm.buf)
+        present = np.ndarray(shape, dtype=bool, buffer=present_shm.buf)
+        if keep:
+            values[:keep] = self.values[:keep]
+            present[:keep] = self.present[:keep]
+        self._release_blocks()
+        self.shared = (values_shm, present_shm)
+        self.values, self.present = values, present
+        self.capacity = capacity
+        self.blocks = (values_shm.name, present_shm.name, capacity, list(fields))
+        self.stats['grows'] += 1
+
+    def _release_blocks(self):
+        """Libera os blocos atuais (workers ainda anexados mantêm a memória até reanexar)"""
+        self.values = self.present = None
+        for block in self.shared:
+            block.close()
+            block.unlink()
+        self.shared = ()
+        self.blocks = None
+
+    def ensure_loaded(self, matrix: TokenMatrix) -> bool:
+        """Sincroniza a memória compartilhada com o store; retorna True se copiou linhas.
+
+        Se o layout das linhas não mudou (só houve append) copia apenas as linhas novas;
+        caso contrário recopia a matriz inteira. O pool de processos é mantido.
+        """
+        size = len(matrix)
+        if self.executor is not None and matrix.version is not None \
+                and matrix.version == self.version and size == self.size:
+            return False
+
+        same_fields = self.blocks is not None and list(matrix.fields) == self.blocks[3]
+        appended = same_fields and matrix.layout is not None and matrix.layout == self.layout and size >= self.size
+        start = self.size if appended else 0
+        if not same_fields or size > self.capacity:
+            self._allocate(size, matrix.fields, start)
+        self.values[start:size] = np.asarray(matrix.values[start:size])
+        self.present[start:size] = np.asarray(matrix.present[start:size])
+        self.stats['appends' if appended else 'reloads'] += 1
+
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.section_fields, self.weighted_sections)
+            )
+            atexit.register(self.close)
+        self.version, self.layout, self.size = matrix.version, matrix.layout, size
+        return True
+
+    def shards(self) -> List[Tuple[int, int]]:
+        """Intervalos contíguos de linhas, um por worker"""
+        bounds = np.linspace(0, self.size, self.workers + 1).astype(int)
+        return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+    def find_top_k(self, target_token: Dict[str, Any], matrix: TokenMatrix, k: int,
+                   min_similarity: Optional[float] = None) -> Tuple[List[Tuple[Dict[str, Any], float, Dict[str, float]]], int]:
+        """Top-k global (mesmo resultado de find_top_k/find_top_k_pruned) e total de podas"""
+        if len(matrix) == 0 or k <= 0:
+            return [], 0
+        self.ensure_loaded(matrix)
+
+        futures = [
+            self.executor.submit(_search_shard, self.blocks, start, end, target_token, k, min_similarity)
+            for start, end in self.shards()
+        ]
+
+        heap = TopKHeap(k)
+        pruned = 0
+        for future in futures:
+            local_top, local_pruned = future.result()
+            pruned += local_pruned
+            for row, score, section_dict in local_top:
+                heap.push(score, row, section_dict)
+
+        return [
+            (matrix.tokens[row], score, section_dict)
+            for score, row, section_dict in heap.sorted_items()
+        ], pruned
+
+    def close(self):
+        """Encerra o pool e libera a memória compartilhada"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+            atexit.unregister(self.close)
+        self._release_blocks()
+        self.capacity = 0
+        self.version = None
+        self.layout = None
+        self.size = 0
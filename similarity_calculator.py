@@ -1,8 +1,16 @@
 import json
 import re
-from typing import Dict, List, Any, Tuple, Optional
+import numpy as np
+from typing import Dict, List, Any, Tuple, Optional, Iterable
 from ai_link_analyzer import AILinkAnalyzer
 from config import Config
+from vectorized_similarity import VectorizedSimilarity, TokenMatrix, TopKHeap, overall_upper_bound, PRUNING_EPSILON
+from ann_index import ANNIndex
+from lsh_index import LSHIndex
+from sharded_search import ShardedSearch
+from scoring_plan import ScoringPlan
+from pair_cache import PairScoreCache, ContractSectionCache
+from range_prefilter import RangePrefilter
 import asyncio
 
 class SimilarityCalculator:
@@ -40,6 +48,37 @@ class SimilarityCalculator:
             'top_holders': r'📊.*?Top 10 Holders',
             'source_wallets': r'🔍 Source Wallets'
         }
+        
+        # Plano de pontuação compilado (pesos editáveis via /weights)
+        self.scoring_plan = ScoringPlan(self.section_fields)
+        self.section_weights = self.scoring_plan.section_weights
+        
+        # Motor de cálculo: 'vectorized' (NumPy) ou 'scalar' (referência)
+        self.engine = Config.SIMILARITY_ENGINE
+        self.vectorized = VectorizedSimilarity(self.section_fields, self.section_weights)
+        
+        # Estatísticas das buscas com poda pelo threshold
+        self.search_stats = {'searches': 0, 'candidates': 0, 'pruned': 0, 'last_candidates': 0, 'last_pruned': 0}
+        
+        # Índice aproximado (opcional) sobre a matriz residente do banco
+        self.ann_enabled = Config.ANN_ENABLED
+        self.ann_index = ANNIndex(self.section_fields, Config.ANN_LEAF_SIZE, Config.ANN_MAX_LEAVES)
+        
+        # Índice LSH (opcional), mantido pelo TokenDatabase a cada save/delete (attach_token_index)
+        self.lsh_index = LSHIndex(Config.LSH_TABLES, Config.LSH_BITS, Config.LSH_INDEX_FILE) if Config.LSH_ENABLED else None
+        
+        # Cache de scores (alvo, token do banco) para alvos repetidos (mesmo contrato reenviado)
+        self.pair_cache = PairScoreCache(list(self.section_fields.keys()), self.vectorized.fields, Config.PAIR_CACHE_SIZE)
+        
+        # Último token por contrato com digest por seção (reavaliação incremental de atualizações)
+        self.section_cache = ContractSectionCache(self.section_fields, Config.SECTION_CACHE_CONTRACTS)
+        
+        # Pré-filtro SQL por faixas de razão (aplicado pelo bot antes da busca com threshold)
+        self.range_prefilter = RangePrefilter(mode=Config.SQL_PREFILTER_MODE)
+        
+        # Busca particionada entre processos (criada sob demanda para bancos muito grandes)
+        self.search_workers = Config.SIMILARITY_WORKERS
+        self.sharded_search = None
     
     def calculate_field_similarity(self, value1, value2) -> float:
         """Calcula similaridade entre dois valores (numéricos ou strings) (0-100%)"""
@@ -72,21 +111,18 @@ class SimilarityCalculator:
     
     def calculate_section_similarity(self, token1: Dict[str, Any], token2: Dict[str, Any], section_name: str) -> float:
         """Calcula similaridade média para uma seção específica"""
-        if section_name not in self.section_fields:
+        rule = self.scoring_plan.sections.get(section_name)
+        if rule is None:
             return 0.0
         
-        fields = self.section_fields[section_name]
-        similarities = []
-        
-        # Para Top Holders, usa algoritmo sofisticado com pesos
-        if section_name == 'top_holders':
-            return self._calculate_holders_similarity(token1, token2)
+        kind, fields = rule
         
-        # Para Source Wallets, usa algoritmo com pesos
-        if section_name == 'source_wallets':
-            return self._calculate_source_wallets_similarity(token1, token2)
+        # Top Holders e Source Wallets usam algoritmo com pesos
+        if kind == 'weighted':
+            return self._calculate_weighted_similarity(token1, token2, fields)
         
         # Para outras seções, usa algoritmo padrão
+        similarities = []
         for field in fields:
             value1 = token1.get(field)
             value2 = token2.get(field)
@@ -102,119 +138,41 @@ class SimilarityCalculator:
         else:
             return 0.0
     
-    def _calculate_holders_similarity(self, token1: Dict[str, Any], token2: Dict[str, Any]) -> float:
-        """Algoritmo sofisticado para calcular similaridade dos Top 10 Holders (com análise de SOL)"""
-        
-        # Pesos para diferentes aspectos da análise (expandido com métricas de SOL)
-        weights = {
-            'total_pct_weight': 15,          # Porcentagem total dos top 10
-            'concentration_pct_weight': 20,  # Concentração do top 1 (%)
-            'oligopoly_pct_weight': 15,      # Top 5 holders (%)
-            'distribution_pct_weight': 15,   # Score de distribuição (%)
-            'sol_total_weight': 10,          # Total de SOL dos holders
-            'sol_concentration_weight': 15,  # Concentração de SOL do top 1
-            'sol_distribution_weight': 10    # Distribuição de SOL
-        }
-        
-        similarities = []
-        
-        # === MÉTRICAS DE PORCENTAGEM (65% do peso total) ===
-        
-        # 1. Similaridade do total (peso 15%)
-        total1 = token1.get('top_holders_percentage')
-        total2 = token2.get('top_holders_percentage')
-        if total1 is not None and total2 is not None:
-            total_sim = self.calculate_field_similarity(total1, total2)
-            similarities.append(total_sim * weights['total_pct_weight'] / 100)
-        
-        # 2. Similaridade da concentração do top 1 holder (peso 20%)
-        top1_1 = token1.get('top1_holder_percentage')
-        top1_2 = token2.get('top1_holder_percentage')
-        if top1_1 is not None and top1_2 is not None:
-            concentration_sim = self.calculate_field_similarity(top1_1, top1_2)
-            similarities.append(concentration_sim * weights['concentration_pct_weight'] / 100)
-        
-        # 3. Similaridade do oligopólio (top 5) (peso 15%)
-        top5_1 = token1.get('top5_holders_percentage')
-        top5_2 = token2.get('top5_holders_percentage')
-        if top5_1 is not None and top5_2 is not None:
-            oligopoly_sim = self.calculate_field_similarity(top5_1, top5_2)
-            similarities.append(oligopoly_sim * weights['oligopoly_pct_weight'] / 100)
-        
-        # 4. Similaridade da distribuição (peso 15%)
-        dist1 = token1.get('holders_distribution_score')
-        dist2 = token2.get('holders_distribution_score')
-        if dist1 is not None and dist2 is not None:
-            distribution_sim = self.calculate_field_similarity(dist1, dist2)
-            similarities.append(distribution_sim * weights['distribution_pct_weight'] / 100)
-        
-        # === MÉTRICAS DE SOL (35% do peso total) ===
-        
-        # 5. Similaridade do total de SOL (peso 10%)
-        sol_total1 = token1.get('top_holders_sol_total')
-        sol_total2 = token2.get('top_holders_sol_total')
-        if sol_total1 is not None and sol_total2 is not None:
-            sol_total_sim = self.calculate_field_similarity(sol_total1, sol_total2)
-            similarities.append(sol_total_sim * weights['sol_total_weight'] / 100)
-        
-        # 6. Similaridade da concentração de SOL do top 1 (peso 15%)
-        sol_conc1 = token1.get('holders_sol_concentration_ratio')
-        sol_conc2 = token2.get('holders_sol_concentration_ratio')
-        if sol_conc1 is not None and sol_conc2 is not None:
-            sol_conc_sim = self.calculate_field_similarity(sol_conc1, sol_conc2)
-            similarities.append(sol_conc_sim * weights['sol_concentration_weight'] / 100)
-        
-        # 7. Similaridade da distribuição de SOL (peso 10%)
-        sol_dist1 = token1.get('holders_sol_distribution_score')
-        sol_dist2 = token2.get('holders_sol_distribution_score')
-        if sol_dist1 is not None and sol_dist2 is not None:
-            sol_dist_sim = self.calculate_field_similarity(sol_dist1, sol_dist2)
-            similarities.append(sol_dist_sim * weights['sol_distribution_weight'] / 100)
-        
-        # Retorna a média ponderada
-        if similarities:
-            return sum(similarities)
-        else:
-            return 0.0
+    def _calculate_weighted_similarity(self, token1: Dict[str, Any], token2: Dict[str, Any],
+                                       weighted_fields: Tuple[Tuple[str, float], ...]) -> float:
+        """Soma ponderada das similaridades dos campos presentes nos dois tokens"""
+        total = 0.0
+        for field, weight in weighted_fields:
+            value1 = token1.get(field)
+            value2 = token2.get(field)
+            if value1 is not None and value2 is not None:
+                total += self.calculate_field_similarity(value1, value2) * weight / 100
+        return total
     
-    def _calculate_source_wallets_similarity(self, token1: Dict[str, Any], token2: Dict[str, Any]) -> float:
-        """Algoritmo para calcular similaridade dos Source Wallets"""
-        
-        # Pesos para diferentes aspectos da análise
-        weights = {
-            'percentage_weight': 50,  # Porcentagem total (mais importante)
-            'count_weight': 25,       # Quantidade de wallets
-            'hops_weight': 25         # Média de hops
-        }
-        
-        similarities = []
-        
-        # 1. Similaridade da porcentagem total (peso 50%)
-        pct1 = token1.get('source_wallets_percentage')
-        pct2 = token2.get('source_wallets_percentage')
-        if pct1 is not None and pct2 is not None:
-            pct_sim = self.calculate_field_similarity(pct1, pct2)
-            similarities.append(pct_sim * weights['percentage_weight'] / 100)
-        
-        # 2. Similaridade da quantidade de wallets (peso 25%)
-        count1 = token1.get('source_wallets_count')
-        count2 = token2.get('source_wallets_count')
-        if count1 is not None and count2 is not None:
-            count_sim = self.calculate_field_similarity(count1, count2)
-            similarities.append(count_sim * weights['count_weight'] / 100)
-        
-        # 3. Similaridade da média de hops (peso 25%)
-        hops1 = token1.get('source_wallets_avg_hops')
-        hops2 = token2.get('source_wallets_avg_hops')
-        if hops1 is not None and hops2 is not None:
-            hops_sim = self.calculate_field_similarity(hops1, hops2)
-            similarities.append(hops_sim * weights['hops_weight'] / 100)
-        
-        # Retorna a média ponderada
-        if similarities:
-            return sum(similarities)
-        else:
-            return 0.0
+    @classmethod
+    def from_database(cls, database) -> 'SimilarityCalculator':
+        """Calculador com os pesos persistidos no banco (/weights); usado por todos os pontos de entrada"""
+        calculator = cls()
+        calculator.load_scoring_plan(database)
+        return calculator
+    
+    def load_scoring_plan(self, database) -> ScoringPlan:
+        """Aplica os pesos persistidos no banco (settings) e retorna o plano aplicado"""
+        scoring_plan = ScoringPlan.from_json(self.section_fields, database.get_section_weights())
+        self.set_scoring_plan(scoring_plan)
+        return scoring_plan
+    
+    def set_scoring_plan(self, scoring_plan: ScoringPlan) -> None:
+        """Aplica um novo plano de pontuação e recompila os motores que dependem dos pesos"""
+        self.scoring_plan = scoring_plan
+        self.section_weights = scoring_plan.section_weights
+        self.vectorized = VectorizedSimilarity(self.section_fields, self.section_weights)
+        self.pair_cache.clear()
+        self.section_cache.clear()
+        if self.sharded_search is not None:
+            # Os workers guardam os pesos do initializer: recria o pool na próxima busca
+            self.sharded_search.close()
+            self.sharded_search = None
     
     def calculate_overall_similarity(self, token1: Dict[str, Any], token2: Dict[str, Any]) -> Tuple[float, Dict[str, float]]:
         """Calcula similaridade geral e por seção"""
@@ -254,6 +212,373 @@ class SimilarityCalculator:
         
         return best_match, best_similarity, best_section_similarities
     
+    def find_most_similar_token_vectorized(self, target_token: Dict[str, Any], database_tokens) -> Tuple[Optional[Dict[str, Any]], float, Dict[str, float]]:
+        """Versão vetorizada de find_most_similar_token (aceita lista de tokens ou TokenMatrix)"""
+        if not database_tokens:
+            return None, 0.0, {}
+        
+        try:
+            if isinstance(database_tokens, TokenMatrix):
+                matrix = database_tokens
+            else:
+                matrix = self.vectorized.build_matrix(database_tokens)
+            matrix = self._candidate_matrix(target_token, matrix)
+            if self._use_sharded_search(matrix):
+                top_matches, _ = self._get_sharded_search().find_top_k(target_token, matrix, 1)
+                return top_matches[0] if top_matches else (None, 0.0, {})
+            if self._use_pair_cache(matrix):
+                top_matches = self._cached_top_k(target_token, matrix, 1)
+                return top_matches[0] if top_matches else (None, 0.0, {})
+            return self.vectorized.find_most_similar(target_token, matrix)
+        except ValueError:
+            # Valores não numéricos: volta para o cálculo escalar de referência
+            tokens = database_tokens.tokens if isinstance(database_tokens, TokenMatrix) else database_tokens
+            return self.find_most_similar_token(target_token, tokens)
+    
+    def find_best_match(self, target_token: Dict[str, Any], database_tokens,
+                        min_similarity: Optional[float] = None) -> Tuple[Optional[Dict[str, Any]], float, Dict[str, float]]:
+        """Encontra o token mais similar usando o motor configurado.
+        
+        Com min_similarity (threshold de exibição) usa poda branch-and-bound: o resultado só
+        é retornado se atingir o threshold, caso contrário retorna (None, 0.0, {}).
+        """
+        if min_similarity is not None:
+            top_matches = self.find_top_k_similar(target_token, database_tokens, 1, min_similarity)
+            return top_matches[0] if top_matches else (None, 0.0, {})
+        
+        if self.engine == 'vectorized':
+            return self.find_most_similar_token_vectorized(target_token, database_tokens)
+        if isinstance(database_tokens, TokenMatrix):
+            database_tokens = database_tokens.tokens
+        return self.find_most_similar_token(target_token, database_tokens)
+    
+    def find_top_k_similar(self, target_token: Dict[str, Any], database_tokens, k: int = 3,
+                           min_similarity: Optional[float] = None) -> List[Tuple[Dict[str, Any], float, Dict[str, float]]]:
+        """Retorna os k tokens mais similares [(token, similaridade, seções)], do maior para o menor.
+        
+        Com min_similarity retorna apenas tokens com similaridade >= threshold, podando os
+        candidatos que não podem alcançá-lo (ver search_stats para a contagem de podas).
+        """
+        if not database_tokens or k <= 0:
+            return []
+        
+        if self.engine == 'vectorized':
+            try:
+                if isinstance(database_tokens, TokenMatrix):
+                    matrix = database_tokens
+                else:
+                    matrix = self.vectorized.build_matrix(database_tokens)
+                matrix = self._candidate_matrix(target_token, matrix)
+                if self._use_sharded_search(matrix):
+                    top_matches, pruned = self._get_sharded_search().find_top_k(target_token, matrix, k, min_similarity)
+                    if min_similarity is not None:
+                        self._record_search(len(matrix), pruned)
+                    return top_matches
+                if self._use_pair_cache(matrix):
+                    return self._cached_top_k(target_token, matrix, k, min_similarity)
+                if min_similarity is None:
+                    return self.vectorized.find_top_k(target_token, matrix, k)
+                top_matches, pruned = self.vectorized.find_top_k_pruned(target_token, matrix, k, min_similarity)
+                self._record_search(len(matrix), pruned)
+                return top_matches
+            except ValueError:
+                # Valores não numéricos: volta para o cálculo escalar
+                pass
+        
+        if isinstance(database_tokens, TokenMatrix):
+            database_tokens = database_tokens.tokens
+        
+        # Caminho escalar: seleção com heap limitado a k candidatos
+        heap = TopKHeap(k)
+        candidates, pruned = self._scalar_top_k(target_token, database_tokens, heap, min_similarity)
+        if min_similarity is not None:
+            self._record_search(candidates, pruned)
+        
+        return [(db_token, similarity, section_sims) for similarity, _, (db_token, section_sims) in heap.sorted_items()]
+    
+    def _scalar_top_k(self, target_token: Dict[str, Any], database_tokens: Iterable[Dict[str, Any]], heap: TopKHeap,
+                      min_similarity: Optional[float] = None, offset: int = 0) -> Tuple[int, int]:
+        """Loop escalar sobre o heap informado (ordem = offset + posição); retorna (candidatos, podas).
+        
+        Com min_similarity o limite da poda é o maior entre o threshold e o k-ésimo score do heap.
+        """
+        pruned = 0
+        candidates = 0
+        for order, db_token in enumerate(database_tokens, offset):
+            candidates += 1
+            if min_similarity is None:
+                similarity, section_sims = self.calculate_overall_similarity(target_token, db_token)
+            else:
+                result = self.calculate_overall_similarity_bounded(
+                    target_token, db_token, max(min_similarity, heap.min_score())
+                )
+                if result is None:
+                    pruned += 1
+                    continue
+                similarity, section_sims = result
+                if similarity < min_similarity:
+                    continue
+            if similarity > 0:
+                heap.push(similarity, order, (db_token, section_sims))
+        return candidates, pruned
+    
+    def find_top_k_batch(self, target_tokens: List[Dict[str, Any]], database_tokens, k: int = 1,
+                         min_similarity: Optional[float] = None) -> List[List[Tuple[Dict[str, Any], float, Dict[str, float]]]]:
+        """Top-k de vários alvos contra o banco (uma lista de resultados por alvo).
+        
+        No motor vetorizado todos os alvos são pontuados em blocos (N alvos x M tokens);
+        o resultado de cada alvo é o mesmo de find_top_k_similar.
+        """
+        if not target_tokens:
+            return []
+        if not database_tokens or k <= 0:
+            return [[] for _ in target_tokens]
+        
+        if self.engine == 'vectorized':
+            try:
+                if isinstance(database_tokens, TokenMatrix):
+                    matrix = database_tokens
+                else:
+                    matrix = self.vectorized.build_matrix(database_tokens)
+                return self.vectorized.find_top_k_batch(target_tokens, matrix, k, min_similarity)
+            except ValueError:
+                # Valores não numéricos: pontua alvo a alvo
+                pass
+        
+        return [self.find_top_k_similar(target_token, database_tokens, k, min_similarity)
+                for target_token in target_tokens]
+    
+    def find_top_k_streaming(self, target_token: Dict[str, Any], token_batches: Iterable[List[Dict[str, Any]]], k: int = 3,
+                             min_similarity: Optional[float] = None) -> List[Tuple[Dict[str, Any], float, Dict[str, float]]]:
+        """Top-k consumindo os tokens lote a lote (ex.: TokenDatabase.iter_token_features).
+        
+        Só o lote atual e os k melhores ficam em memória; o resultado é o mesmo de
+        find_top_k_similar sobre a lista completa (empates vencidos pela primeira ocorrência).
+        Um único heap atravessa os lotes: o k-ésimo score já encontrado é o piso da poda dos
+        lotes seguintes, e search_stats registra uma busca com todos os candidatos.
+        """
+        if k <= 0:
+            return []
+        
+        heap = TopKHeap(k)
+        offset = 0
+        candidates = 0
+        pruned = 0
+        for batch in token_batches:
+            candidates += len(batch)
+            pruned += self._push_streaming_batch(target_token, batch, heap, offset, min_similarity)
+            offset += len(batch)
+        
+        if min_similarity is not None:
+            self._record_search(candidates, pruned)
+        
+        return [(db_token, similarity, section_sims) for similarity, _, (db_token, section_sims) in heap.sorted_items()]
+    
+    def _push_streaming_batch(self, target_token: Dict[str, Any], batch: List[Dict[str, Any]], heap: TopKHeap,
+                              offset: int, min_similarity: Optional[float]) -> int:
+        """Pontua um lote do streaming no heap global e retorna as podas do lote"""
+        if not batch:
+            return 0
+        
+        if self.engine == 'vectorized':
+            # Candidatos abaixo do k-ésimo score atual não entram no heap: viram o piso da poda
+            floor = heap.min_score() if min_similarity is None else max(min_similarity, heap.min_score())
+            try:
+                matrix = self.vectorized.build_matrix(batch)
+                if min_similarity is None and floor <= 0:
+                    top_matches, pruned = self.vectorized.find_top_k(target_token, matrix, heap.k), 0
+                else:
+                    top_matches, pruned = self.vectorized.find_top_k_pruned(target_token, matrix, heap.k, floor)
+            except ValueError:
+                # Valores não numéricos: volta para o cálculo escalar
+                top_matches = None
+            if top_matches is not None:
+                positions = {id(db_token): order for order, db_token in enumerate(batch)}
+                for db_token, similarity, section_sims in top_matches:
+                    heap.push(similarity, offset + positions[id(db_token)], (db_token, section_sims))
+                return pruned
+        
+        _, pruned = self._scalar_top_k(target_token, batch, heap, min_similarity, offset)
+        return pruned
+    
+    def find_most_similar_token_streaming(self, target_token: Dict[str, Any],
+                                          token_batches: Iterable[List[Dict[str, Any]]]) -> Tuple[Optional[Dict[str, Any]], float, Dict[str, float]]:
+        """find_most_similar_token lendo os tokens em lotes, mantendo apenas o melhor até o momento"""
+        top_matches = self.find_top_k_streaming(target_token, token_batches, 1)
+        return top_matches[0] if top_matches else (None, 0.0, {})
+    
+    def _candidate_matrix(self, target_token: Dict[str, Any], matrix: TokenMatrix) -> TokenMatrix:
+        """Reduz a matriz aos candidatos do índice LSH ou ANN (quando habilitado e o banco é grande).
+        
+        Só atua sobre matrizes do TokenStore (com versão), para que o índice seja reconstruído
+        apenas quando o banco muda. Os candidatos mantêm a ordem original das linhas.
+        """
+        if self.lsh_index is not None and matrix.version is not None and len(matrix) >= Config.LSH_MIN_TOKENS \
+                and len(self.lsh_index) == len(matrix):
+            # Buckets que colidem com o alvo; o índice só vale se estiver sincronizado com o store
+            return matrix.subset(self.lsh_index.candidates(target_token, matrix))
+        if not self.ann_enabled or matrix.version is None:
+            return matrix
+        if len(matrix) < max(Config.ANN_MIN_TOKENS, Config.ANN_CANDIDATES):
+            return matrix
+        rows = self.ann_index.candidates(target_token, matrix, Config.ANN_CANDIDATES)
+        return matrix.subset(rows)
+    
+    def _use_pair_cache(self, matrix: TokenMatrix) -> bool:
+        """Cache só para matrizes do TokenStore (linhas identificadas pelo id do banco)"""
+        return self.pair_cache.enabled and matrix.ids is not None
+    
+    def _cached_top_k(self, target_token: Dict[str, Any], matrix: TokenMatrix, k: int,
+                      min_similarity: Optional[float] = None) -> List[Tuple[Dict[str, Any], float, Dict[str, float]]]:
+        """Top-k usando o cache de pares: só as linhas ainda não pontuadas para este alvo são calculadas.
+        
+        Com min_similarity as linhas sem score passam pela poda branch-and-bound, partindo do
+        k-ésimo melhor score já conhecido; as podadas não entram nos caches.
+        """
+        section_names = list(self.section_fields.keys())
+        fingerprint = self.pair_cache.fingerprint(target_token)
+        found, overall, section_scores = self.pair_cache.lookup(fingerprint, matrix.ids)
+        contract_address = target_token.get('contract_address')
+        digests = self.section_cache.section_digests(target_token) if contract_address else None
+        
+        scored = found.copy()
+        pruned = 0
+        missing = np.flatnonzero(~found)
+        if len(missing):
+            scored[self._rescore_known_rows(target_token, matrix, missing, contract_address, digests,
+                                            overall, section_scores)] = True
+            unknown = np.flatnonzero(~scored)
+            if len(unknown) and min_similarity is None:
+                unknown_matrix = matrix if len(unknown) == len(matrix) else matrix.subset(unknown)
+                rescored = self.vectorized.score_sections(target_token, unknown_matrix, section_names)
+                overall[unknown] = self.vectorized.overall_scores(rescored, len(unknown))
+                for section_name, scores in rescored.items():
+                    section_scores[section_name][unknown] = scores
+                scored[unknown] = True
+            elif len(unknown):
+                # O k-ésimo melhor entre as linhas já pontuadas é o limite inicial da poda
+                heap = TopKHeap(k)
+                for index in self.vectorized.top_k_indices(np.where(scored & (overall >= min_similarity), overall, 0.0), k):
+                    heap.push(float(overall[index]), index)
+                survivors = []
+                candidate_rows = None if len(unknown) == len(matrix) else unknown
+                _, pruned = self.vectorized.find_top_k_pruned(target_token, matrix, k, min_similarity, rows=candidate_rows,
+                                                              heap=heap, survivors=survivors)
+                for rows, rows_overall, rows_sections in survivors:
+                    overall[rows] = rows_overall
+                    for section_name, scores in rows_sections.items():
+                        section_scores[section_name][rows] = scores
+                    scored[rows] = True
+            
+            new_rows = np.flatnonzero(scored & ~found)
+            self.pair_cache.store(fingerprint, matrix.ids[new_rows], overall[new_rows],
+                                  {name: scores[new_rows] for name, scores in section_scores.items()})
+        
+        if contract_address:
+            if scored.all():
+                self.section_cache.put(contract_address, digests, matrix.ids, section_scores)
+            else:
+                self.section_cache.put(contract_address, digests, matrix.ids[scored],
+                                       {name: scores[scored] for name, scores in section_scores.items()})
+        
+        if min_similarity is not None:
+            self._record_search(len(matrix), pruned)
+            overall = np.where(overall >= min_similarity, overall, 0.0)
+        return [
+            (matrix.tokens[index], float(overall[index]), self.vectorized.section_scores_at(section_scores, index))
+            for index in self.vectorized.top_k_indices(overall, k)
+        ]
+    
+    def _rescore_known_rows(self, target_token: Dict[str, Any], matrix: TokenMatrix, rows: np.ndarray,
+                            contract_address: Optional[str], digests: Optional[Dict[str, bytes]],
+                            overall: np.ndarray, section_scores: Dict[str, np.ndarray]) -> np.ndarray:
+        """Preenche as linhas já avaliadas recentemente para o contrato, recalculando só as seções alteradas.
+        
+        Retorna as linhas preenchidas (nenhuma se o contrato não tem estado no cache de seções).
+        """
+        state = self.section_cache.get(contract_address) if contract_address else None
+        if state is None or not len(state[1]):
+            return rows[:0]
+        
+        last_digests, last_ids, last_sections = state
+        section_names = list(self.section_fields.keys())
+        changed = [name for name in section_names if digests[name] != last_digests[name]]
+        positions = np.minimum(np.searchsorted(last_ids, matrix.ids[rows]), len(last_ids) - 1)
+        known = last_ids[positions] == matrix.ids[rows]
+        known_rows = rows[known]
+        if not len(known_rows):
+            return known_rows
+        positions = positions[known]
+        
+        # Seções inalteradas reaproveitam os scores da última avaliação do contrato
+        for name in section_names:
+            if name not in changed:
+                section_scores[name][known_rows] = last_sections[name][positions]
+        if changed:
+            known_matrix = matrix if len(known_rows) == len(matrix) else matrix.subset(known_rows)
+            rescored = self.vectorized.score_sections(target_token, known_matrix, changed)
+            for name, scores in rescored.items():
+                section_scores[name][known_rows] = scores
+        overall[known_rows] = self.vectorized.overall_scores(
+            {name: section_scores[name][known_rows] for name in section_names}, len(known_rows)
+        )
+        self.section_cache.stats['incremental'] += 1
+        self.section_cache.stats['reused_sections'] += len(section_names) - len(changed)
+        self.section_cache.stats['rescored_sections'] += len(changed)
+        return known_rows
+    
+    def _use_sharded_search(self, matrix: TokenMatrix) -> bool:
+        """Busca particionada só para matrizes do TokenStore grandes o bastante"""
+        return self.search_workers > 1 and matrix.version is not None and len(matrix) >= Config.SHARDED_MIN_TOKENS
+    
+    def _get_sharded_search(self) -> ShardedSearch:
+        if self.sharded_search is None:
+            self.sharded_search = ShardedSearch(self.section_fields, self.section_weights, self.search_workers)
+        return self.sharded_search
+    
+    def calculate_overall_similarity_bounded(self, token1: Dict[str, Any], token2: Dict[str, Any],
+                                             cutoff: float) -> Optional[Tuple[float, Dict[str, float]]]:
+        """Igual a calculate_overall_similarity, mas desiste (retorna None) assim que o limite
+        superior da similaridade geral fica abaixo de cutoff"""
+        section_similarities = {}
+        partial_sum = 0.0
+        partial_count = 0
+        pruning_order = self.vectorized.pruning_order
+        
+        for position, section_name in enumerate(pruning_order):
+            section_sim = self.calculate_section_similarity(token1, token2, section_name)
+            section_similarities[section_name] = section_sim
+            if section_sim > 0:
+                partial_sum += section_sim
+                partial_count += 1
+            
+            if cutoff > 0:
+                remaining_max = [self.vectorized.section_max[name] for name in pruning_order[position + 1:]]
+                if overall_upper_bound(partial_sum, partial_count, remaining_max) < cutoff - PRUNING_EPSILON:
+                    return None
+        
+        # Recalcula a média na ordem original das seções (mesmo arredondamento do cálculo padrão)
+        total_similarity = 0.0
+        valid_sections = 0
+        ordered_similarities = {}
+        for section_name in self.section_fields.keys():
+            section_sim = section_similarities[section_name]
+            ordered_similarities[section_name] = section_sim
+            if section_sim > 0:
+                total_similarity += section_sim
+                valid_sections += 1
+        
+        overall_similarity = total_similarity / valid_sections if valid_sections > 0 else 0.0
+        return overall_similarity, ordered_similarities
+    
+    def _record_search(self, candidates: int, pruned: int) -> None:
+        """Acumula estatísticas das buscas com poda"""
+        self.search_stats['searches'] += 1
+        self.search_stats['candidates'] += candidates
+        self.search_stats['pruned'] += pruned
+        self.search_stats['last_candidates'] = candidates
+        self.search_stats['last_pruned'] = pruned
+    
     def _clean_emojis_from_message(self, message: str) -> str:
         """Remove emojis específicos da mensagem"""
         # Remove os emojis 🟣👀🟢 
@@ -509,7 +834,8 @@ class SimilarityCalculator:
     
     def create_enhanced_message(self, target_token_name: str, most_similar_token: Optional[Dict[str, Any]], 
                                similarity: float, section_similarities: Dict[str, float], 
-                               current_message: Optional[str] = None, contract_address: Optional[str] = None) -> str:
+                               current_message: Optional[str] = None, contract_address: Optional[str] = None,
+                               top_matches: Optional[List[Tuple[Dict[str, Any], float, Dict[str, float]]]] = None) -> str:
         """Cria a mensagem final com formatação mono-espaçada (estilo terminal)"""
         if not most_similar_token:
             ca_info = f"\nCA: `{contract_address}`" if contract_address else ""
@@ -571,6 +897,10 @@ class SimilarityCalculator:
             emoji = " 🟢" if similarity_value > 90.0 else ""
             report_lines.append(f"{tree_char} {padded_name}      {similarity_value:.1f}%{emoji}")
         
+        # Lista os tokens mais similares (inclui os segundos colocados) quando fornecidos
+        if top_matches and len(top_matches) > 1:
+            report_lines.extend(self._format_top_matches(top_matches))
+        
         report_lines.append("")
         report_lines.append("Lado esquerdo ATUAL direito BANCO DE DADOS")
         report_lines.append("──────────────────────────────────────")
@@ -578,6 +908,28 @@ class SimilarityCalculator:
         
         return '\n'.join(report_lines)
     
+    def _format_top_matches(self, top_matches: List[Tuple[Dict[str, Any], float, Dict[str, float]]]) -> List[str]:
+        """Formata os tokens mais similares com as similaridades por seção"""
+        section_abbreviations = {
+            'market_overview': 'MO',
+            'wallet_insights': 'WI',
+            'risk_metrics': 'RM',
+            'top_holders': 'TH',
+            'source_wallets': 'SW'
+        }
+        
+        lines = ["", f"Top {len(top_matches)} Similares:"]
+        for rank, (match_token, match_similarity, match_sections) in enumerate(top_matches, 1):
+            match_name = match_token.get('token_name', 'Token desconhecido')
+            lines.append(f"{rank}. {match_name} - {match_similarity:.1f}%")
+            section_parts = [
+                f"{abbreviation} {match_sections.get(section_key, 0.0):.0f}%"
+                for section_key, abbreviation in section_abbreviations.items()
+            ]
+            lines.append(f"└ {' '.join(section_parts)}")
+        
+        return lines
+    
     def set_ai_links_enabled(self, enabled: bool) -> None:
         """Habilita ou desabilita a análise de IA para links"""
         self.ai_links_enabled = enabled
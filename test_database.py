@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Testes do TokenDatabase com banco temporário (store em memória, escrita e leitura)
+"""
+
+import os
+import random
+import sqlite3
+import tempfile
+import numpy as np
+from config import Config
+from database import TokenDatabase
+from similarity_calculator import SimilarityCalculator
+from lsh_index import LSHIndex
+from range_prefilter import RangePrefilter, PREFILTER_FIELDS
+from vectorized_similarity import TokenMatrix
+from work_executor import WorkExecutor, EventLoopLagMonitor
+from test_similarity import _random_token
+
+
+def _temp_database():
+    """Cria um TokenDatabase apontando para um arquivo temporário"""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    original_file = Config.DATABASE_FILE
+    Config.DATABASE_FILE = path
+    try:
+        database = TokenDatabase()
+    finally:
+        Config.DATABASE_FILE = original_file
+    return database, path
+
+
+def _assert_store_in_sync(database, calculator):
+    """O store residente deve produzir o mesmo resultado que o SELECT * do banco"""
+    rng = random.Random(len(database.token_store))
+    target = _random_token(rng, calculator, -1)
+    expected = calculator.find_most_similar_token(target, database.get_all_tokens())
+    result = calculator.find_most_similar_token_vectorized(target, database.get_token_matrix())
+    assert len(database.token_store) == database.get_tokens_count()
+    assert result[1] == expected[1]
+    assert set(database.token_store.contract_counts) == {contract for _, contract in database.get_all_contracts()}
+    assert result[2] == expected[2]
+    assert (result[0] or {}).get('id') == (expected[0] or {}).get('id')
+
+
+def test_token_store_follows_writes():
+    """save/delete/clear/restore devem manter o store sincronizado"""
+    calculator = SimilarityCalculator()
+    database, path = _temp_database()
+    backup_path = path + '.backup'
+    rng = random.Random(7)
+
+    try:
+        for i in range(40):
+            token = _random_token(rng, calculator, i)
+            token['token_name'] = f'Token{i % 30}'
+            database.save_token_info(token, i, -100)
+        _assert_store_in_sync(database, calculator)
+
+        database.create_backup(backup_path)
+
+        database.delete_token_by_id(3)
+        database.delete_token_by_name('Token5')
+        database.delete_last_token()
+        database.delete_tokens_by_range(10, 14)
+        database.delete_token_by_contract_address('CA20')
+        _assert_store_in_sync(database, calculator)
+
+        # O token materializado do store mantém inteiros como int
+        token = database.token_store.get_token(0)
+        stored = database.get_all_tokens()[0]
+        assert token['token_name'] == stored['token_name']
+        assert token['traders'] == stored['traders'] and type(token['traders']) == type(stored['traders'])
+
+        database.clear_all_tokens()
+        assert len(database.token_store) == 0
+
+        success, _ = database.restore_from_backup(backup_path, create_current_backup=False)
+        assert success
+        assert len(database.token_store) == 40
+        _assert_store_in_sync(database, calculator)
+    finally:
+        for file_path in (path, backup_path):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+
+def test_packed_features_backfill():
+    """Linhas sem vetor persistido devem ser lidas pelas colunas e preenchidas pelo backfill"""
+    calculator = SimilarityCalculator()
+    database, path = _temp_database()
+    rng = random.Random(3)
+
+    try:
+        for i in range(30):
+            database.save_token_info(_random_token(rng, calculator, i), i, -100)
+        assert database.backfill_features() == 0
+
+        # Simula linhas salvas antes da coluna features existir
+        with sqlite3.connect(path) as conn:
+            conn.execute('UPDATE tokens SET features = NULL, features_mask = NULL WHERE id % 3 = 0')
+            conn.commit()
+        database.reload_token_store()
+        _assert_store_in_sync(database, calculator)
+
+        assert database.backfill_features(batch_size=4) == 10
+        assert database.backfill_features() == 0
+        database.reload_token_store()
+        _assert_store_in_sync(database, calculator)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_pair_cache_invalidation():
+    """O cache de pares deve ser reaproveitado e invalidado por delete/clear/restore"""
+    calculator = SimilarityCalculator()
+    reference = SimilarityCalculator()
+    reference.pair_cache.max_pairs = 0
+    database, path = _temp_database()
+    database.attach_score_cache(calculator.pair_cache)
+    database.attach_score_cache(calculator.section_cache)
+    backup_path = path + '.backup'
+    rng = random.Random(29)
+
+    def assert_same_results(targets):
+        matrix = database.get_token_matrix()
+        for target in targets:
+            expected = reference.find_top_k_similar(target, matrix, 3)
+            assert calculator.find_top_k_similar(target, matrix, 3) == expected
+            assert calculator.find_best_match(target, matrix) == reference.find_best_match(target, matrix)
+
+    try:
+        for i in range(40):
+            database.save_token_info(_random_token(rng, calculator, i), i, -100)
+        database.create_backup(backup_path)
+        targets = [_random_token(rng, calculator, 1000 + i) for i in range(5)]
+
+        assert_same_results(targets)
+        misses = calculator.pair_cache.stats['misses']
+        assert_same_results(targets)
+        assert calculator.pair_cache.stats['misses'] == misses
+        assert calculator.pair_cache.stats['hits'] >= 5 * 40
+
+        # Novos tokens: só as linhas novas são calculadas
+        database.save_token_info(_random_token(rng, calculator, 50), 50, -100)
+        assert_same_results(targets)
+        assert calculator.pair_cache.stats['misses'] == misses + 5
+
+        database.delete_tokens_by_range(1, 10)
+        assert len(calculator.pair_cache) == 5 * 31
+        assert_same_results(targets)
+
+        # Restore reaproveita ids com outro conteúdo
+        database.clear_all_tokens()
+        for i in range(10):
+            database.save_token_info(_random_token(rng, calculator, i), i, -100)
+        assert_same_results(targets)
+        database.restore_from_backup(backup_path, create_current_backup=False)
+        assert_same_results(targets)
+    finally:
+        for file_path in (path, backup_path):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+
+def test_range_prefilter():
+    """O modo garantido não pode perder matches acima do threshold; o rápido respeita as faixas"""
+    calculator = SimilarityCalculator()
+    database, path = _temp_database()
+    rng = random.Random(41)
+    bases = [_random_token(rng, calculator, i) for i in range(10)]
+
+    try:
+        # Variações dos mesmos tokens com as colunas do pré-filtro escaladas
+        for i in range(120):
+            token = dict(bases[i % 10])
+            for field in PREFILTER_FIELDS:
+                if token[field]:
+                    token[field] = token[field] * rng.choice([0.3, 0.6, 0.9, 1.0, 1.5, 3.0])
+            database.save_token_info(token, i, -100)
+        matrix = database.get_token_matrix()
+
+        for mode in ('guaranteed', 'fast'):
+            prefilter = RangePrefilter(mode=mode)
+            for threshold in (60, 90, 99):
+                for target in bases:
+                    where_sql, params = prefilter.predicates(target, threshold, calculator.vectorized)
+                    candidates = database.get_candidate_matrix(where_sql, params)
+                    prefilter.record(len(matrix), len(candidates))
+                    result = calculator.find_top_k_similar(target, candidates, 3, threshold)
+                    if mode == 'guaranteed':
+                        assert result == calculator.find_top_k_similar(target, matrix, 3, threshold)
+                        continue
+                    for token in candidates.tokens:
+                        for field in PREFILTER_FIELDS:
+                            if target[field]:
+                                field_similarity = calculator.calculate_field_similarity(target[field], token[field])
+                                assert field_similarity >= threshold - 1e-6
+            assert prefilter.stats['filtered'] > 0
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_compact_store_keeps_exact_rows():
+    """No store compacto a busca usa os códigos, mas as linhas exatas continuam disponíveis no banco"""
+    calculator = SimilarityCalculator()
+    rng = random.Random(37)
+    original_compact = Config.COMPACT_FEATURE_STORE
+    Config.COMPACT_FEATURE_STORE = True
+    try:
+        database, path = _temp_database()
+    finally:
+        Config.COMPACT_FEATURE_STORE = original_compact
+
+    try:
+        tokens = [_random_token(rng, calculator, i) for i in range(30)]
+        tokens[0]['holders_totais'] = 123457
+        token_ids = [database.save_token_info(token, i, -100) for i, token in enumerate(tokens)]
+        assert database.token_store.compact
+
+        matrix = database.get_token_matrix()
+        approximate = matrix.tokens[0]
+        exact = database.get_tokens_by_ids(token_ids[:3])
+        assert approximate['holders_totais'] != 123457
+        assert exact[token_ids[0]]['holders_totais'] == 123457
+        assert exact[token_ids[0]]['token_name'] == tokens[0]['token_name']
+        assert sorted(exact) == sorted(token_ids[:3]) and database.get_tokens_by_ids([]) == {}
+
+        # Decodificação sob demanda: mesmos scores da matriz decodificada por inteiro
+        decoded = TokenMatrix(matrix.fields, np.asarray(matrix.values), np.asarray(matrix.present), matrix.tokens)
+        target = _random_token(rng, calculator, 99)
+        overall, _ = calculator.vectorized.score_matrix(target, matrix)
+        assert np.array_equal(overall, calculator.vectorized.score_matrix(target, decoded)[0])
+    finally:
+        os.remove(path)
+
+
+def test_streaming_matches_full_scan():
+    """A busca em lotes pelo cursor deve devolver o mesmo resultado da lista completa"""
+    calculator = SimilarityCalculator()
+    database, path = _temp_database()
+    rng = random.Random(47)
+
+    try:
+        for i in range(45):
+            database.save_token_info(_random_token(rng, calculator, i), i, -100)
+        # Duplicata exata: o empate entre lotes deve ir para a primeira ocorrência
+        database.save_token_info(dict(database.get_all_tokens()[3]), 99, -100)
+        all_tokens = database.load_token_features()
+        assert [len(batch) for batch in database.iter_token_features(batch_size=10)] == [10, 10, 10, 10, 6]
+
+        targets = [_random_token(rng, calculator, 1000 + i) for i in range(8)] + [dict(all_tokens[3])]
+        for target in targets:
+            expected = calculator.find_most_similar_token(target, all_tokens)
+            result = calculator.find_most_similar_token_streaming(target, database.iter_token_features(batch_size=7))
+            assert result == expected
+            for min_similarity in (None, 50):
+                expected_top = calculator.find_top_k_similar(target, all_tokens, 3, min_similarity)
+                assert calculator.find_top_k_streaming(target, database.iter_token_features(batch_size=4), 3,
+                                                       min_similarity) == expected_top
+
+        # Uma busca por chamada, com todos os lotes; o top-k dos primeiros lotes poda os seguintes
+        searches = calculator.search_stats['searches']
+        pruned = calculator.search_stats['pruned']
+        calculator.find_top_k_streaming(all_tokens[3], database.iter_token_features(batch_size=4), 1, 0.0)
+        assert calculator.search_stats['searches'] == searches + 1
+        assert calculator.search_stats['last_candidates'] == len(all_tokens)
+        assert calculator.search_stats['last_pruned'] > 0
+        assert calculator.search_stats['pruned'] == pruned + calculator.search_stats['last_pruned']
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_lsh_index_follows_writes_and_persists():
+    """O índice LSH deve acompanhar save/delete e ser recarregado do disco na inicialização"""
+    calculator = SimilarityCalculator()
+    database, path = _temp_database()
+    index_path = path + '.lsh.npz'
+    rng = random.Random(61)
+
+    try:
+        for i in range(60):
+            database.save_token_info(_random_token(rng, calculator, i), i, -100)
+        index = LSHIndex(n_tables=6, n_bits=8, path=index_path)
+        database.attach_token_index(index)
+        assert index.stats['rebuilt'] == 1 and len(index) == 60
+
+        token_id = database.save_token_info(_random_token(rng, calculator, 100), 100, -100)
+        database.delete_tokens_by_range(1, 5)
+        assert len(index) == len(database.token_store) == 56
+
+        # Um token idêntico ao salvo sempre colide com ele
+        matrix = database.get_token_matrix()
+        same_token = database.token_store.get_token_by_id(token_id)
+        assert token_id in index.candidate_ids(same_token)
+        rows = index.candidates(same_token, matrix)
+        assert (np.diff(rows) > 0).all() and token_id in matrix.ids[rows]
+
+        # Reinício: mesmos ids -> carrega do disco; banco alterado -> reconstrói
+        index.save()
+        reloaded = LSHIndex(n_tables=6, n_bits=8, path=index_path)
+        reloaded.load_or_build(matrix)
+        assert reloaded.stats['loaded'] == 1
+        assert (reloaded.sorted_ids == index.sorted_ids).all() and (reloaded.sorted_keys == index.sorted_keys).all()
+        database.delete_token_by_id(token_id)
+        stale = LSHIndex(n_tables=6, n_bits=8, path=index_path)
+        stale.load_or_build(database.get_token_matrix())
+        assert stale.stats['rebuilt'] == 1 and len(stale) == 55
+        index.save()
+    finally:
+        for file_path in (path, index_path):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+
+def test_work_executor_keeps_loop_responsive():
+    """Escritas e jobs lentos no executor: fila limitada, resultados corretos e loop livre"""
+    import asyncio
+    import time
+    calculator = SimilarityCalculator()
+    database, path = _temp_database()
+    rng = random.Random(11)
+    tokens = [_random_token(rng, calculator, i) for i in range(20)]
+
+    async def scenario():
+        executor = WorkExecutor(max_pending=4)
+        monitor = EventLoopLagMonitor(interval=0.01)
+        monitor.start()
+        token_ids = await asyncio.gather(*(executor.run(database.save_token_info, token, i, -100)
+                                           for i, token in enumerate(tokens)))
+        # Consultas na fila própria respondem enquanto o worker está ocupado
+        busy = asyncio.ensure_future(executor.run(time.sleep, 0.3))
+        await asyncio.sleep(0.01)
+        query_start = time.perf_counter()
+        count = await executor.query(database.get_tokens_count)
+        query_time = time.perf_counter() - query_start
+        await busy
+        try:
+            await executor.run(int, 'não numérico')
+            failed = False
+        except ValueError:
+            failed = True
+        monitor.stop()
+        executor.shutdown()
+        return executor, monitor, token_ids, failed, count, query_time
+
+    try:
+        executor, monitor, token_ids, failed, count, query_time = asyncio.run(scenario())
+        assert sorted(token_ids) == list(range(1, 21))
+        assert count == 20 and query_time < 0.2 and executor.stats['pending'] == 0
+        assert executor.query_stats['queries'] == 1
+        assert executor.stats['peak_pending'] <= 4 and executor.stats['waited'] > 0
+        assert failed and executor.stats['failed'] == 1 and executor.stats['completed'] == 21
+        assert executor.stats['max_run_time'] >= 0.3
+        # O sleep de 0.3s no worker não pode travar o loop
+        assert monitor.stats['samples'] >= 10 and monitor.stats['max_lag'] < 0.1
+        _assert_store_in_sync(database, calculator)
+    finally:
+        os.remove(path)
+
+
+def test_bulk_ingest():
+    """A ingestão em lote deve ler JSON em blocos e JSONL, descartar contratos repetidos e manter o store"""
+    import json
+    from benchmarks.generator import generate_messages
+    from backfill import iter_json_messages, load_messages
+    from ingest import ingest
+
+    calculator = SimilarityCalculator()
+    database, path = _temp_database()
+    messages = generate_messages(12, seed=21)
+    export = {'name': 'Database', 'type': 'private_supergroup', 'id': 1, 'messages': [
+        {'id': i + 1, 'type': 'message', 'text': message} for i, message in enumerate(messages[:8])]}
+    export['messages'][0]['text'] = [messages[0][:40], {'type': 'bold', 'text': messages[0][40:]}]
+    export['messages'].append({'id': 50, 'type': 'service', 'action': 'pin_message', 'text': ''})
+    export['messages'].append({'id': 51, 'type': 'message', 'text': 'gm'})
+    json_path, jsonl_path = path + '.json', path + '.jsonl'
+
+    try:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(export, f, ensure_ascii=False, indent=1)
+        with open(jsonl_path, 'w', encoding='utf-8') as f:
+            for i, message in enumerate(messages[6:]):  # 6 e 7 repetem contratos do JSON
+                f.write(json.dumps({'message_id': 100 + i, 'text': message}) + '\n')
+
+        assert list(iter_json_messages(json_path, chunk_size=7)) == export['messages']
+        assert load_messages(json_path) == messages[:8] + ['gm']  # Trechos com formatação são unidos
+
+        stats = ingest([json_path], database, batch_size=3, group_id=-100, progress_interval=0)
+        assert stats['messages'] == 9 and stats['skipped'] == 1
+        assert stats['inserted'] == 8 and stats['batches'] == 3
+        stats = ingest([json_path, jsonl_path], database, workers=2, batch_size=3, progress_interval=0)
+        assert stats['duplicates'] == 10 and stats['inserted'] == 4
+
+        assert database.get_tokens_count() == 12
+        _assert_store_in_sync(database, calculator)
+        with sqlite3.connect(path) as conn:
+            rows = conn.execute('SELECT message_id, raw_message FROM tokens ORDER BY id').fetchall()
+        assert [row[0] for row in rows] == list(range(1, 9)) + [102, 103, 104, 105]
+        assert [row[1] for row in rows] == messages
+    finally:
+        for file_path in (path, json_path, jsonl_path):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+
+def test_dedupe_sets_follow_writes():
+    """Os conjuntos em memória do pré-estágio devem refletir tokens e contratos exibidos no banco"""
+    calculator = SimilarityCalculator()
+    database, path = _temp_database()
+    rng = random.Random(81)
+
+    try:
+        first = database.save_token_info(_random_token(rng, calculator, 1), 1, -100)
+        second = database.save_token_info(_random_token(rng, calculator, 1), 2, -100)  # Mesmo contrato (CA1)
+        assert database.has_contract('CA1') and not database.has_contract('CA2') and not database.has_contract(None)
+        database.delete_token_by_id(first)
+        assert database.has_contract('CA1')
+        database.delete_token_by_id(second)
+        assert not database.has_contract('CA1')
+
+        database.mark_contract_as_displayed('CA7', 'Token7', 91.5)
+        assert database.has_displayed_contract('CA7') and not database.has_displayed_contract('CA8')
+        original_file, Config.DATABASE_FILE = Config.DATABASE_FILE, path
+        try:
+            assert TokenDatabase().has_displayed_contract('CA7')  # Recarregado do banco ao iniciar
+        finally:
+            Config.DATABASE_FILE = original_file
+        database.clear_displayed_contracts()
+        assert not database.has_displayed_contract('CA7')
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_calculator_uses_persisted_weights():
+    """from_database deve aplicar os pesos do /weights salvos no banco (bot, backfill e scripts)"""
+    database, path = _temp_database()
+
+    try:
+        default = SimilarityCalculator.from_database(database)
+        assert default.section_weights == SimilarityCalculator().section_weights
+
+        plan = default.scoring_plan.with_weight('top_holders', 'top1_holder_percentage', 60)
+        database.set_section_weights(plan.to_json())
+        calculator = SimilarityCalculator.from_database(database)
+        assert calculator.section_weights == plan.section_weights
+        assert calculator.vectorized.weighted_sections == plan.section_weights
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    test_token_store_follows_writes()
+    test_packed_features_backfill()
+    test_pair_cache_invalidation()
+    test_range_prefilter()
+    test_compact_store_keeps_exact_rows()
+    test_streaming_matches_full_scan()
+    test_lsh_index_follows_writes_and_persists()
+    test_work_executor_keeps_loop_responsive()
+    test_bulk_ingest()
+    test_dedupe_sets_follow_writes()
+    test_calculator_uses_persisted_weights()
+    print("✅ Store em memória sincronizado com o banco!")
@@ -102,5 +102,135 @@ def test_message():
     print("\n✅ Teste concluído com sucesso!")
     print("🔧 Se os dados estão corretos, o parser está funcionando.")
 
+def test_synthetic_messages_parse():
+    """As mensagens do gerador de benchmarks devem ser lidas por completo pelo parser"""
+    import random
+    from benchmarks.generator import generate_token_message
+    from token_store import FEATURE_FIELDS
+
+    parser = MessageParser()
+    rng = random.Random(3)
+    for _ in range(50):
+        message, expected = generate_token_message(rng)
+        token_data = parser.parse_token_message(message)
+        assert parser.is_token_message(message)
+        for field, value in expected.items():
+            assert token_data[field] == value, (field, token_data[field], value)
+        assert all(token_data.get(field) is not None for field in FEATURE_FIELDS)
+
+def test_line_parser_matches_regex():
+    """O modo 'line' (uma passada) deve produzir exatamente o mesmo dicionário do modo 'regex'"""
+    import random
+    from benchmarks.generator import generate_messages
+
+    regex_parser, line_parser = MessageParser('regex'), MessageParser('line')
+    rng = random.Random(7)
+    messages = generate_messages(100, seed=7)
+    for message in list(messages):
+        lines = message.split('\n')
+        del lines[rng.randrange(len(lines))]
+        index = rng.randrange(len(lines))
+        lines[index] = lines[index].replace(':', ': N/A', 1)
+        messages.append('\n'.join(lines))
+    # Valor na linha seguinte ao rótulo (├ Fresh Wallets:\n   57), inclusive após linha em branco
+    for message in messages[:20]:
+        lines = message.split('\n')
+        for index in rng.sample(range(len(lines)), 6):
+            label_end = lines[index].find(':')
+            if label_end > 0 and ('├' in lines[index] or '└' in lines[index]):
+                lines[index] = lines[index][:label_end + 1] + rng.choice(['\n   ', '\n\n ']) + lines[index][label_end + 1:].lstrip()
+        messages.append('\n'.join(lines))
+    carried = 'Token (TKN)\n📊 Wallet Insights\n├ Fresh Wallets:\n   57\n├ % Bundler Supply:\n\n 3,5%\n└ Bundler Wallets: 2'
+    messages.append(carried)
+    # Total da seção na linha seguinte (📊 Top 10 Holders:\n 28.50%), inclusive após linha em branco
+    for message in messages[:20]:
+        for label in ('Top 10 Holders:', 'Source Wallets:'):
+            message = message.replace(label + ' ', label + rng.choice(['\n ', '\n\n ']), 1)
+        messages.append(message)
+    wrapped = 'Token (TKN)\n📊 Top 10 Holders:\n 28.50%\n🔍 Source Wallets:\n 14.73%'
+    messages.append(wrapped)
+    for message in messages:
+        assert line_parser.parse_token_message(message) == regex_parser.parse_token_message(message)
+    token_data = line_parser.parse_token_message(wrapped)
+    assert token_data['top_holders_percentage'] == 28.5 and token_data['source_wallets_percentage'] == 14.73
+    token_data = line_parser.parse_token_message(carried)
+    assert token_data['fresh_wallets'] == 57 and token_data['bundler_supply_percentage'] == 3.5
+    assert token_data['bundler_wallets'] == 2
+
+def test_combined_parser_fallback():
+    """O modo 'combined' deve igualar o 'regex' e recuperar (e contar) campos que o passe combinado perder"""
+    import re
+    import message_parser
+    from benchmarks.generator import generate_messages
+
+    regex_parser, combined_parser = MessageParser('regex'), MessageParser('combined')
+    messages = generate_messages(50, seed=9)
+    for message in messages:
+        assert combined_parser.parse_token_message(message) == regex_parser.parse_token_message(message)
+    assert combined_parser.stats == {'parsed': 50, 'fallback_messages': 0, 'fallback_hits': 0}
+
+    # Simula mudança de formato: o padrão combinado não encontra nenhum campo
+    combined_pattern = message_parser.COMBINED_PATTERN
+    message_parser.COMBINED_PATTERN = re.compile('(?!)')
+    try:
+        token_data = combined_parser.parse_token_message(messages[0])
+    finally:
+        message_parser.COMBINED_PATTERN = combined_pattern
+    assert token_data == regex_parser.parse_token_message(messages[0])
+    assert combined_parser.stats['fallback_messages'] == 1
+    assert combined_parser.stats['fallback_hits'] == len(message_parser.FIELD_PATTERNS)
+    assert combined_parser.fallback_fields['market_cap'] == 1
+
+def test_parse_cache():
+    """Mensagens repetidas vêm do cache (somente leitura) e o cache respeita os limites"""
+    from parse_cache import ParseCache
+    from benchmarks.generator import generate_messages
+
+    messages = generate_messages(4, seed=5)
+    parser = MessageParser(cache=ParseCache(max_entries=2))
+    first = parser.parse_token_message(messages[0])
+    first['message_entities'] = []  # A cópia retornada é mutável e não altera o cache
+    forwarded = '\n' + messages[0] + '  \n'
+    again = parser.parse_token_message(forwarded)
+    assert again == MessageParser().parse_token_message(forwarded)
+    assert parser.cache.stats == {'hits': 1, 'misses': 1, 'evictions': 0}
+
+    frozen = parser.parse_token_message_frozen(messages[0])
+    try:
+        frozen['market_cap'] = 0
+        assert False, 'entrada do cache deveria ser somente leitura'
+    except TypeError:
+        pass
+
+    for message in messages[1:]:
+        parser.parse_token_message(message)
+    assert len(parser.cache) == 2 and parser.cache.stats['evictions'] == 2
+
+    entry_size = parser.cache.size_bytes // 2
+    small = MessageParser(cache=ParseCache(max_entries=100, max_bytes=entry_size * 3))
+    for message in messages:
+        small.parse_token_message(message)
+    assert len(small.cache) == 3 and small.cache.size_bytes <= entry_size * 3
+
+def test_early_extraction_matches_parse():
+    """O pré-estágio (só contrato e nome) deve concordar com o parse completo"""
+    from benchmarks.generator import generate_messages
+
+    parser = MessageParser()
+    messages = generate_messages(30, seed=13)
+    messages.append(messages[0].replace('\n', '\n\n', 1))
+    messages.append('\n'.join(line for line in messages[1].split('\n') if 'pump' not in line and 'bonk' not in line))
+    messages.append('Sem contrato (SC)\n├ Market Cap: $ 1.2K\n└ CA: 123456789012345678901234567890123')
+    for message in messages:
+        token_data = parser.parse_token_message(message)
+        assert parser.extract_contract_address(message) == token_data['contract_address']
+        assert parser.extract_token_name(message) == token_data['token_name']
+
+
 if __name__ == '__main__':
-    test_message() 
\ No newline at end of file
+    test_message()
+    test_synthetic_messages_parse()
+    test_line_parser_matches_regex()
+    test_combined_parser_fallback()
+    test_parse_cache()
+    test_early_extraction_matches_parse()
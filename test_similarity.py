@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Testes de equivalência entre o cálculo escalar e o motor vetorizado de similaridade
+"""
+
+import atexit
+import random
+import numpy as np
+from config import Config
+from similarity_calculator import SimilarityCalculator
+from token_store import TokenStore, HALF_FIELDS, COMPACT_SIMILARITY_ERROR
+from ann_index import LogSpaceKDTree, recall_report
+from sharded_search import ShardedSearch
+from duplicate_clusters import find_duplicate_clusters
+from scoring_plan import ScoringPlan
+from comparison_report import ComparisonDecision, ReportRenderer
+from benchmarks import equivalence
+
+
+def _random_token(rng, calculator, token_id):
+    """Gera um token sintético com valores None, zero, negativos e inteiros"""
+    token = {'id': token_id, 'token_name': f'Token{token_id}', 'contract_address': f'CA{token_id}'}
+    for fields in calculator.section_fields.values():
+        for field in fields:
+            roll = rng.random()
+            if roll < 0.15:
+                token[field] = None
+            elif roll < 0.25:
+                token[field] = 0
+            elif roll < 0.5:
+                token[field] = rng.randint(1, 5000)
+            else:
+                token[field] = rng.uniform(-100, 100000)
+    return token
+
+
+def test_vectorized_matches_scalar():
+    """O motor vetorizado deve devolver exatamente o mesmo resultado do escalar"""
+    rng = random.Random(42)
+    calculator = SimilarityCalculator()
+    database_tokens = [_random_token(rng, calculator, i) for i in range(300)]
+    # Duplicatas exatas para testar desempate pela primeira ocorrência
+    database_tokens.append(dict(database_tokens[10], id=999))
+
+    for i in range(50):
+        target = _random_token(rng, calculator, 1000 + i)
+        if i % 10 == 0:
+            target = dict(database_tokens[10])
+
+        expected = calculator.find_most_similar_token(target, database_tokens)
+        result = calculator.find_most_similar_token_vectorized(target, database_tokens)
+
+        assert result[0] is expected[0]
+        assert result[1] == expected[1]
+        assert result[2] == expected[2]
+
+
+def test_vectorized_empty_and_no_match():
+    """Banco vazio e tokens sem nenhuma seção em comum"""
+    calculator = SimilarityCalculator()
+    assert calculator.find_most_similar_token_vectorized({'market_cap': 10}, []) == (None, 0.0, {})
+    assert calculator.find_most_similar_token_vectorized({'market_cap': 10}, [{'traders': 5}]) == \
+        calculator.find_most_similar_token({'market_cap': 10}, [{'traders': 5}])
+
+
+def test_top_k_matches_scalar_ranking():
+    """O top-k vetorizado deve ter a mesma ordem do top-k escalar (heap) e começar pelo melhor"""
+    rng = random.Random(3)
+    calculator = SimilarityCalculator()
+    database_tokens = [_random_token(rng, calculator, i) for i in range(200)]
+    database_tokens.extend(dict(token, id=500 + i) for i, token in enumerate(database_tokens[:20]))
+
+    for i in range(20):
+        target = _random_token(rng, calculator, 1000 + i)
+        best = calculator.find_most_similar_token(target, database_tokens)
+        vectorized = calculator.find_top_k_similar(target, database_tokens, 5)
+
+        calculator.engine = 'scalar'
+        scalar = calculator.find_top_k_similar(target, database_tokens, 5)
+        calculator.engine = 'vectorized'
+
+        assert [(t['id'], s, sec) for t, s, sec in vectorized] == [(t['id'], s, sec) for t, s, sec in scalar]
+        assert vectorized[0][0] is best[0] and vectorized[0][1] == best[1]
+
+    message = calculator.create_enhanced_message('Alvo', vectorized[0][0], vectorized[0][1], vectorized[0][2],
+                                                 'mensagem', 'CA', vectorized[:3])
+    assert 'Top 3 Similares:' in message
+
+
+def test_pruned_search_matches_filtered_ranking():
+    """A busca com poda deve devolver o mesmo top-k (filtrado pelo threshold) da busca completa"""
+    rng = random.Random(11)
+    calculator = SimilarityCalculator()
+    database_tokens = [_random_token(rng, calculator, i) for i in range(400)]
+
+    for i in range(12):
+        target = _random_token(rng, calculator, 1000 + i)
+        if i % 4 == 0:
+            target = dict(database_tokens[i * 7])
+        full = calculator.find_top_k_similar(target, database_tokens, 3)
+
+        for threshold in (0.0, 30.0, 36.0, 90.0):
+            expected = [(t['id'], s, sec) for t, s, sec in full if s >= threshold]
+            for engine in ('vectorized', 'scalar'):
+                calculator.engine = engine
+                pruned = calculator.find_top_k_similar(target, database_tokens, 3, threshold)
+                calculator.engine = 'vectorized'
+                assert [(t['id'], s, sec) for t, s, sec in pruned] == expected
+
+    assert calculator.search_stats['pruned'] > 0
+    best = calculator.find_best_match(database_tokens[5], database_tokens, 95.0)
+    assert best[0] is database_tokens[5] and best[1] == 100.0
+
+
+def test_pruning_with_pair_cache():
+    """Com a configuração padrão (cache de pares ligado) a busca no store também deve podar"""
+    rng = random.Random(13)
+    calculator = SimilarityCalculator()
+    reference = SimilarityCalculator()
+    reference.pair_cache.max_pairs = 0
+    assert calculator.pair_cache.enabled and Config.SIMILARITY_PRUNING
+    store = TokenStore()
+    for i in range(2000):
+        store.add(i + 1, _random_token(rng, calculator, i + 1))
+
+    targets = [_random_token(rng, calculator, -i) for i in range(1, 6)] + [dict(store.matrix().tokens[9])]
+    for repeat in range(2):
+        for target in targets:
+            for threshold in (40.0, 70.0):
+                matrix = store.matrix()
+                assert calculator.find_top_k_similar(target, matrix, 3, threshold) == \
+                    reference.find_top_k_similar(target, matrix, 3, threshold)
+                assert calculator.search_stats['last_candidates'] == len(matrix)
+        store.add(2001 + repeat, _random_token(rng, calculator, 2001 + repeat))
+
+    assert calculator.search_stats['searches'] == 2 * len(targets) * 2
+    assert calculator.search_stats['pruned'] > calculator.search_stats['candidates'] // 2
+    assert calculator.pair_cache.stats['hits'] > 0
+
+
+
+def test_ann_index_candidates():
+    """A KD-tree deve achar os vizinhos L1 exatos e o caminho ANN deve pontuar os candidatos de forma exata"""
+    rng = random.Random(5)
+    points = np.array([[rng.uniform(0, 10) for _ in range(4)] for _ in range(500)])
+    tree = LogSpaceKDTree(points, leaf_size=8)
+    for _ in range(20):
+        point = np.array([rng.uniform(0, 10) for _ in range(4)])
+        expected = np.sort(np.argsort(np.abs(points - point).sum(axis=1), kind='stable')[:25])
+        assert list(tree.query(point, 25)) == list(expected)
+    assert list(tree.query(points[0], 1000)) == list(range(500))
+
+    calculator = SimilarityCalculator()
+    store = TokenStore()
+    for i in range(600):
+        store.add(i + 1, _random_token(rng, calculator, i + 1))
+    matrix = store.matrix()
+    targets = [store.get_token(row) for row in range(0, 600, 60)]
+
+    original = (Config.ANN_MIN_TOKENS, Config.ANN_CANDIDATES)
+    Config.ANN_MIN_TOKENS, Config.ANN_CANDIDATES = 100, 64
+    calculator.ann_enabled = True
+    try:
+        for target in targets:
+            rows = calculator.ann_index.candidates(target, matrix, 64)
+            expected = calculator.vectorized.find_top_k(target, matrix.subset(rows), 3)
+            assert calculator.find_top_k_similar(target, matrix, 3) == expected
+            # Token idêntico ao alvo está sempre entre os candidatos
+            assert target['id'] in [token['id'] for token, _, _ in expected]
+    finally:
+        Config.ANN_MIN_TOKENS, Config.ANN_CANDIDATES = original
+
+    # O índice só é reconstruído quando o store muda
+    assert not calculator.ann_index.ensure_built(store.matrix())
+    store.remove_ids([1])
+    assert calculator.ann_index.ensure_built(store.matrix())
+
+    report = recall_report(calculator, matrix, targets, k=3, n_candidates=600)
+    assert report['recall_at_k'] == 1.0 and report['best_match_recall'] == 1.0
+
+
+
+def test_sharded_search_matches_single_process():
+    """A busca particionada entre processos deve devolver o mesmo top-k da busca local"""
+    rng = random.Random(9)
+    calculator = SimilarityCalculator()
+    store = TokenStore()
+    for i in range(900):
+        store.add(i + 1, _random_token(rng, calculator, i + 1))
+    # Duplicata em outro shard para testar o desempate pela primeira ocorrência
+    store.add(901, store.get_token(10))
+    sharded = ShardedSearch(calculator.section_fields, calculator.section_weights, workers=3)
+
+    try:
+        for i in range(8):
+            target = store.get_token(10) if i == 0 else _random_token(rng, calculator, 1000 + i)
+            matrix = store.matrix()
+            expected = calculator.vectorized.find_top_k(target, matrix, 3)
+            result, _ = sharded.find_top_k(target, matrix, 3)
+            assert result == expected
+
+            expected, _ = calculator.vectorized.find_top_k_pruned(target, matrix, 3, 40.0)
+            result, _ = sharded.find_top_k(target, matrix, 3, 40.0)
+            assert result == expected
+
+        # Token novo é copiado no fim dos blocos, sem recriar o pool nem a memória compartilhada
+        executor, blocks = sharded.executor, sharded.blocks
+        store.add(902, _random_token(rng, calculator, 902))
+        assert sharded.ensure_loaded(store.matrix())
+        assert sharded.executor is executor and sharded.blocks == blocks
+        assert sharded.stats['appends'] == 1 and sharded.stats['reloads'] == 1
+        target = store.get_token(900)
+        result, _ = sharded.find_top_k(target, store.matrix(), 3)
+        assert result == calculator.vectorized.find_top_k(target, store.matrix(), 3)
+
+        # Remoção recopia as linhas no mesmo pool
+        store.remove_ids([11])
+        assert sharded.ensure_loaded(store.matrix())
+        assert not sharded.ensure_loaded(store.matrix())
+        assert sharded.executor is executor and sharded.stats['reloads'] == 2
+        result, _ = sharded.find_top_k(target, store.matrix(), 3)
+        assert result == calculator.vectorized.find_top_k(target, store.matrix(), 3)
+    finally:
+        sharded.close()
+
+    # O close remove o handler do atexit (set_scoring_plan cria uma instância nova a cada troca)
+    registered = []
+    register, unregister = atexit.register, atexit.unregister
+    atexit.register, atexit.unregister = registered.append, registered.remove
+    try:
+        for _ in range(3):
+            other = ShardedSearch(calculator.section_fields, calculator.section_weights, workers=1)
+            other.find_top_k(target, store.matrix(), 1)
+            assert len(registered) == 1
+            other.close()
+            other.close()
+        assert registered == []
+    finally:
+        atexit.register, atexit.unregister = register, unregister
+
+
+
+def test_batch_matches_single_target():
+    """A comparação em lote (N alvos x M tokens) deve repetir find_top_k_similar para cada alvo"""
+    rng = random.Random(13)
+    calculator = SimilarityCalculator()
+    database_tokens = [_random_token(rng, calculator, i) for i in range(250)]
+    targets = [_random_token(rng, calculator, 1000 + i) for i in range(30)] + [dict(database_tokens[3])]
+    matrix = calculator.vectorized.build_matrix(database_tokens)
+
+    # max_cells pequeno força vários blocos de alvos
+    batch = calculator.vectorized.find_top_k_batch(targets, matrix, 3, max_cells=1000)
+    assert batch == [calculator.find_top_k_similar(target, database_tokens, 3) for target in targets]
+
+    batch = calculator.find_top_k_batch(targets, database_tokens, 2, 35.0)
+    assert batch == [calculator.find_top_k_similar(target, database_tokens, 2, 35.0) for target in targets]
+    assert calculator.find_top_k_batch([], database_tokens) == []
+
+
+
+def test_duplicate_clusters_match_scalar_pairs():
+    """Os blocos token x token devem achar os mesmos pares que o cálculo escalar"""
+    rng = random.Random(17)
+    calculator = SimilarityCalculator()
+    database_tokens = [_random_token(rng, calculator, i) for i in range(60)]
+    # Templates republicados com outros nomes
+    for i, source in enumerate((3, 3, 20, 41)):
+        database_tokens.append(dict(database_tokens[source], id=100 + i, token_name=f'Repost{i}'))
+    matrix = calculator.vectorized.build_matrix(database_tokens)
+
+    for threshold in (60.0, 95.0):
+        progress = []
+        clusters = find_duplicate_clusters(calculator, matrix, threshold, tile_size=16,
+                                           progress=lambda done, total: progress.append((done, total)))
+        assert progress[-1] == (10, 10)
+
+        pairs = set()
+        for i, token1 in enumerate(database_tokens):
+            for j in range(i + 1, len(database_tokens)):
+                if calculator.calculate_overall_similarity(token1, database_tokens[j])[0] >= threshold:
+                    pairs.add((token1['id'], database_tokens[j]['id']))
+        clustered = {token['id'] for cluster in clusters for token in cluster['tokens']}
+        assert clustered == {token_id for pair in pairs for token_id in pair}
+        for cluster in clusters:
+            ids = {token['id'] for token in cluster['tokens']}
+            assert all((a in ids) == (b in ids) for a, b in pairs)
+
+        if threshold == 60.0:
+            assert clustered >= {3, 100, 101, 20, 102, 41, 103}
+
+
+
+def test_scoring_plan_weights():
+    """Pesos alterados no plano devem valer igualmente nos caminhos escalar e vetorizado"""
+    rng = random.Random(23)
+    calculator = SimilarityCalculator()
+    database_tokens = [_random_token(rng, calculator, i) for i in range(150)]
+    targets = [_random_token(rng, calculator, 1000 + i) for i in range(10)]
+    default_results = [calculator.find_top_k_similar(target, database_tokens, 3) for target in targets]
+
+    plan = calculator.scoring_plan.with_weight('top_holders', 'top1_holder_percentage', 60)
+    plan = plan.with_weight('source_wallets', 'source_wallets_count', 0)
+    restored = ScoringPlan.from_json(calculator.section_fields, plan.to_json())
+    assert restored.section_weights == plan.section_weights
+    assert ScoringPlan.from_json(calculator.section_fields, '{invalid').section_weights == calculator.section_weights
+
+    calculator.set_scoring_plan(restored)
+    assert calculator.vectorized.section_max['top_holders'] == 140
+    for target in targets:
+        expected = calculator.find_most_similar_token(target, database_tokens)
+        assert calculator.find_most_similar_token_vectorized(target, database_tokens) == expected
+    assert [calculator.find_top_k_similar(target, database_tokens, 3) for target in targets] != default_results
+
+    try:
+        plan.with_weight('market_overview', 'market_cap', 10)
+        assert False, "seções padrão não têm pesos"
+    except ValueError:
+        pass
+
+
+
+def test_incremental_section_rescoring():
+    """Atualizações do mesmo contrato recalculam só as seções alteradas, com o mesmo resultado"""
+    rng = random.Random(31)
+    calculator = SimilarityCalculator()
+    reference = SimilarityCalculator()
+    reference.pair_cache.max_pairs = 0
+    store = TokenStore()
+    for i in range(300):
+        store.add(i + 1, _random_token(rng, calculator, i + 1))
+
+    target = _random_token(rng, calculator, -1)
+    target['contract_address'] = 'CA_REPOSTED'
+    assert calculator.find_top_k_similar(target, store.matrix(), 3) == reference.find_top_k_similar(target, store.matrix(), 3)
+
+    # Nova mensagem do mesmo contrato: apenas o Market Overview mudou
+    target = dict(target, market_cap=target['market_cap'] and target['market_cap'] * 1.5, traders=1234)
+    assert calculator.find_top_k_similar(target, store.matrix(), 3) == reference.find_top_k_similar(target, store.matrix(), 3)
+    assert calculator.section_cache.stats['incremental'] == 1
+    assert calculator.section_cache.stats['rescored_sections'] == 1
+    assert calculator.section_cache.stats['reused_sections'] == 4
+
+    # Tokens novos são pontuados por completo, removidos deixam o estado do contrato
+    store.add(301, _random_token(rng, calculator, 301))
+    store.remove_ids([5, 6])
+    calculator.section_cache.invalidate_ids([5, 6])
+    target = dict(target, smart_wallets=77, degen_calls=3)
+    assert calculator.find_top_k_similar(target, store.matrix(), 5, 30.0) == \
+        reference.find_top_k_similar(target, store.matrix(), 5, 30.0)
+    assert calculator.section_cache.stats['rescored_sections'] == 3
+
+
+def test_report_renderer_memoizes():
+    """O relatório renderizado deve ser o mesmo da montagem direta e reaproveitado por (alvo, similar)"""
+    rng = random.Random(53)
+    calculator = SimilarityCalculator()
+    calculator.set_ai_links_enabled(False)
+    renderer = ReportRenderer(calculator)
+    database_tokens = [_random_token(rng, calculator, i) for i in range(20)]
+    target = _random_token(rng, calculator, 100)
+    target['raw_message'] = '🔥 Token100\n\n📊 Market Overview\n├ MC: $10K'
+
+    decision = ComparisonDecision(target, calculator.find_top_k_similar(target, database_tokens, 3))
+    message = renderer.render(decision)
+    enhanced = calculator.create_enhanced_message(
+        decision.token_name, decision.most_similar_token, decision.similarity, decision.section_similarities,
+        target['raw_message'], decision.contract_address, decision.top_matches
+    )
+    side_by_side = calculator.create_side_by_side_comparison(target, decision.most_similar_token, decision.section_similarities)
+    assert message == enhanced[:-3] + side_by_side + "```"
+
+    assert renderer.render(ComparisonDecision(target, decision.top_matches)) == message
+    assert renderer.stats == dict(renderer.stats, renders=1, hits=1)
+
+    # Scores diferentes para o mesmo par renderizam de novo; remover o similar invalida
+    changed = [(decision.most_similar_token, decision.similarity - 1, decision.section_similarities)]
+    assert renderer.render(ComparisonDecision(target, changed)) != message
+    renderer.invalidate_ids([decision.most_similar_token['id']])
+    assert len(renderer) == 0
+
+
+def test_compact_store_error_bound():
+    """O store compacto deve ocupar bem menos memória e errar no máximo COMPACT_SIMILARITY_ERROR pontos"""
+    rng = random.Random(59)
+    calculator = SimilarityCalculator()
+    full_store = TokenStore()
+    compact_store = TokenStore(compact=True)
+    for i in range(400):
+        token = _random_token(rng, calculator, i)
+        for field in HALF_FIELDS:
+            if token[field]:
+                token[field] = rng.uniform(-100, 100)  # Campos float16 ficam na escala 0-100
+        full_store.add(i, token)
+        compact_store.add(i, token)
+    compact_store.remove_ids([5, 6])
+    full_store.remove_ids([5, 6])
+
+    full_matrix = full_store.matrix()
+    compact_matrix = compact_store.matrix()
+    assert (compact_matrix.present == full_matrix.present).all()
+    assert ((compact_matrix.values == 0) == (full_matrix.values == 0)).all()
+    assert compact_store.nbytes() * 3 < full_store.nbytes()
+
+    max_error = 0.0
+    for i in range(30):
+        target = _random_token(rng, calculator, 1000 + i)
+        full_overall, full_sections = calculator.vectorized.score_matrix(target, full_matrix)
+        compact_overall, compact_sections = calculator.vectorized.score_matrix(target, compact_matrix)
+        max_error = max(max_error, float(np.abs(compact_overall - full_overall).max()))
+        for section_name, scores in full_sections.items():
+            assert np.abs(compact_sections[section_name] - scores).max() <= COMPACT_SIMILARITY_ERROR
+    assert max_error <= COMPACT_SIMILARITY_ERROR
+
+
+def test_equivalence_harness():
+    """Todos os motores exatos equivalem à referência e uma divergência aparece no relatório"""
+    calculator = SimilarityCalculator()
+    tokens = equivalence.synthetic_tokens(80)
+    dataset = equivalence.Dataset('synthetic', tokens)
+    targets = equivalence.perturbed_targets(tokens, 12)
+    engines = [name for name, (_, tolerance, _) in equivalence.ENGINES.items() if tolerance is not None]
+
+    report = equivalence.run_equivalence(calculator, dataset, targets, engines, k=3)
+    assert not report['mismatches'], equivalence.format_report(report)
+    assert all(count == len(targets) for count in report['checked'].values())
+
+    def broken(calculator, target, dataset, k, threshold):
+        # Arredonda as seções: a geral continua igual, mas as seções não são idênticas
+        return [(token, similarity, {name: round(score, 2) for name, score in sections.items()})
+                for token, similarity, sections in calculator.vectorized.find_top_k(target, dataset.matrix('store'), k)]
+
+    equivalence.ENGINES['broken'] = (broken, 0.0, False)
+    try:
+        report = equivalence.run_equivalence(calculator, dataset, targets, ['broken'], k=3)
+    finally:
+        del equivalence.ENGINES['broken']
+    assert report['mismatches'] and all(diff['kind'] == 'section' for diff in report['mismatches'])
+    assert any('broken' in line and 'seção' in line for line in equivalence.format_report(report))
+
+
+if __name__ == '__main__':
+    test_vectorized_matches_scalar()
+    test_vectorized_empty_and_no_match()
+    test_top_k_matches_scalar_ranking()
+    test_pruned_search_matches_filtered_ranking()
+    test_pruning_with_pair_cache()
+    test_ann_index_candidates()
+    test_sharded_search_matches_single_process()
+    test_batch_matches_single_target()
+    test_duplicate_clusters_match_scalar_pairs()
+    test_scoring_plan_weights()
+    test_incremental_section_rescoring()
+    test_report_renderer_memoizes()
+    test_compact_store_error_bound()
+    test_equivalence_harness()
+    print("✅ Motor vetorizado equivalente ao cálculo escalar!")
@@ -0,0 +1,401 @@
+import numpy as np
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+from vectorized_similarity import TokenMatrix
+
+# Colunas numéricas da tabela tokens usadas no cálculo de similaridade
+FEATURE_FIELDS = [
+    # Market Overview
+    'market_cap', 'price_change', 'traders', 'buy_volume', 'sell_volume',
+    'buy_count', 'sell_count', 'buyers', 'sellers',
+    # Wallet Insights
+    'holders_totais', 'smart_wallets', 'fresh_wallets', 'renowned_wallets',
+    'creator_wallets', 'sniper_wallets', 'rat_traders', 'whale_wallets',
+    'top_wallets', 'following_wallets', 'bluechip_holders', 'bundler_wallets',
+    # Risk Metrics
+    'bluechip_holders_percentage', 'rat_trader_supply_percentage',
+    'bundler_supply_percentage', 'entrapment_supply_percentage',
+    'degen_calls', 'sinais_tecnicos',
+    # Top 10 Holders
+    'top_holders_percentage', 'top1_holder_percentage', 'top5_holders_percentage',
+    'top10_holders_percentage', 'holders_concentration_ratio', 'holders_distribution_score',
+    'top_holders_sol_total', 'top5_holders_sol_total', 'top1_holder_sol_amount',
+    'holders_sol_distribution_score', 'holders_sol_concentration_ratio',
+    # Source Wallets
+    'source_wallets_percentage', 'source_wallets_count', 'source_wallets_avg_hops'
+]
+
+# Colunas INTEGER (convertidas de volta para int ao materializar o token)
+INTEGER_FIELDS = {
+    'traders', 'buy_count', 'sell_count', 'buyers', 'sellers',
+    'holders_totais', 'smart_wallets', 'fresh_wallets', 'renowned_wallets',
+    'creator_wallets', 'sniper_wallets', 'rat_traders', 'whale_wallets',
+    'top_wallets', 'following_wallets', 'bluechip_holders', 'bundler_wallets',
+    'degen_calls', 'sinais_tecnicos', 'source_wallets_count'
+}
+
+# Colunas em escala 0-100 (porcentagens, razões e scores) guardadas como float16 no modo compacto;
+# as demais (contagens, volumes, SOL, price change) usam uint16 quantizado em escala log
+HALF_FIELDS = {
+    'bluechip_holders_percentage', 'rat_trader_supply_percentage', 'bundler_supply_percentage',
+    'entrapment_supply_percentage', 'top_holders_percentage', 'top1_holder_percentage',
+    'top5_holders_percentage', 'top10_holders_percentage', 'holders_concentration_ratio',
+    'holders_distribution_score', 'holders_sol_distribution_score', 'holders_sol_concentration_ratio',
+    'source_wallets_percentage', 'source_wallets_avg_hops'
+}
+
+# Código log (uint16): bit 15 = sinal; 0 = zero; 1..LOG_EXACT_MAX = inteiros exatos;
+# acima disso, níveis uniformes de log|v| em [LOG_MIN, LOG_MAX] (fora da faixa é saturado)
+LOG_EXACT_MAX = 1024
+LOG_MIN, LOG_MAX = np.log(1e-4), np.log(1e15)
+LOG_STEP = (LOG_MAX - LOG_MIN) / (0x7FFF - LOG_EXACT_MAX - 1)
+
+# Erro relativo máximo de um valor no modo compacto (float16: 2^-11; log: meio nível)
+COMPACT_RELATIVE_ERROR = max(2.0 ** -11, float(np.expm1(LOG_STEP / 2)))
+
+# Erro máximo (pontos percentuais) da similaridade de um campo, e portanto de cada seção
+# com pesos somando até 100 e da similaridade geral: só o lado do banco é quantizado e
+# 100 * min/max muda no máximo 100 * e / (1 - e). Zeros e ausentes são preservados.
+COMPACT_SIMILARITY_ERROR = 100 * COMPACT_RELATIVE_ERROR / (1 - COMPACT_RELATIVE_ERROR)
+
+# Colunas de identificação mantidas junto das features
+META_FIELDS = ['id', 'token_name', 'contract_address', 'timestamp']
+
+# Formato do vetor persistido na coluna tokens.features (um valor por campo de FEATURE_FIELDS).
+# float64 little-endian: mantém o resultado idêntico ao cálculo escalar sobre as colunas.
+FEATURE_DTYPE = np.dtype('<f8')
+
+
+def encode_features(token_data: Dict[str, Any], fields: Optional[List[str]] = None):
+    """Converte os campos do token em (valores, presença); ausentes e não numéricos ficam como 0/False"""
+    fields = fields or FEATURE_FIELDS
+    values = np.zeros(len(fields), dtype=np.float64)
+    present = np.zeros(len(fields), dtype=bool)
+    for col, field in enumerate(fields):
+        try:
+            value = TokenMatrix.to_float(token_data.get(field))
+        except ValueError:
+            # Valores não numéricos (dados legados) ficam como ausentes
+            value = None
+        if value is not None:
+            values[col] = value
+            present[col] = True
+    return values, present
+
+
+def pack_features(values: np.ndarray, present: np.ndarray) -> Tuple[bytes, bytes]:
+    """Empacota o vetor de features (BLOB) e a máscara de presença (bitmask)"""
+    return (np.asarray(values, dtype=FEATURE_DTYPE).tobytes(),
+            np.packbits(present, bitorder='little').tobytes())
+
+
+def unpack_features(features: Optional[bytes], mask: Optional[bytes],
+                    n_fields: int = len(FEATURE_FIELDS)) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Desempacota um vetor persistido; retorna None se ausente ou de outro layout"""
+    if features is None or mask is None:
+        return None
+    if len(features) != n_fields * FEATURE_DTYPE.itemsize or len(mask) != (n_fields + 7) // 8:
+        return None
+    values = np.frombuffer(features, dtype=FEATURE_DTYPE).astype(np.float64)
+    present = np.unpackbits(np.frombuffer(mask, dtype=np.uint8), count=n_fields, bitorder='little').astype(bool)
+    return values, present
+
+
+def encode_compact(values: np.ndarray, present: np.ndarray, half_columns: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Codifica (valores, presença) de 2 dimensões em códigos uint16 e máscara de presença empacotada"""
+    values = np.where(present, values, 0.0)
+    codes = np.zeros(values.shape, dtype=np.uint16)
+
+    half = values[:, half_columns]
+    half_codes = np.clip(half, -65504, 65504).astype(np.float16)
+    # Valores muito pequenos não podem virar zero (zero tem regra própria na similaridade)
+    half_codes = np.where((half != 0) & (half_codes == 0), np.copysign(np.float16(2.0 ** -24), half), half_codes)
+    codes[:, half_columns] = half_codes.astype(np.float16).view(np.uint16)
+
+    log_columns = ~half_columns
+    magnitude = np.abs(values[:, log_columns])
+    exact = (magnitude <= LOG_EXACT_MAX) & (magnitude == np.rint(magnitude))
+    with np.errstate(divide='ignore'):
+        level = np.rint((np.clip(np.log(magnitude), LOG_MIN, LOG_MAX) - LOG_MIN) / LOG_STEP)
+    log_codes = np.where(exact, magnitude, LOG_EXACT_MAX + 1 + level).astype(np.uint16)
+    log_codes |= (values[:, log_columns] < 0).astype(np.uint16) << 15
+    codes[:, log_columns] = log_codes
+
+    return codes, np.packbits(present, axis=1, bitorder='little')
+
+
+def decode_compact(codes: np.ndarray, mask: np.ndarray, half_columns: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Inverso de encode_compact: (valores float64, presença)"""
+    values = decode_codes(codes, half_columns)
+    present = np.unpackbits(mask, axis=1, count=codes.shape[1], bitorder='little').astype(bool)
+    return values, present
+
+
+def decode_codes(codes: np.ndarray, half_columns) -> np.ndarray:
+    """Decodifica códigos uint16 de qualquer forma; half_columns (bool ou array) vale para a última dimensão"""
+    if np.ndim(half_columns) == 0 and half_columns:
+        return codes.view(np.float16).astype(np.float64)
+    level = (codes & 0x7FFF).astype(np.float64)
+    magnitude = np.where(level <= LOG_EXACT_MAX, level, np.exp(LOG_MIN + (level - LOG_EXACT_MAX - 1) * LOG_STEP))
+    values = np.where(codes >> 15, -magnitude, magnitude)
+    if np.ndim(half_columns) == 0:
+        return values
+    return np.where(half_columns, codes.view(np.float16).astype(np.float64), values)
+
+
+class CompactColumns:
+    """Visão 2D somente leitura dos arrays do modo compacto, decodificada sob demanda.
+
+    Os motores leem por coluna (values[:, col]) ou por blocos de linhas (values[start:end],
+    values[rows]): um recorte de linhas continua compacto e cada coluna é decodificada só
+    quando lida, sem materializar a matriz float64 inteira. np.asarray decodifica tudo
+    (usado só pelos caminhos em lote).
+    """
+
+    def __init__(self, codes: np.ndarray, mask: np.ndarray, half_columns: np.ndarray, presence: bool = False):
+        self.codes = codes            # uint16 (n_tokens x n_fields)
+        self.mask = mask              # presença empacotada em bits (n_tokens x bytes)
+        self.half_columns = half_columns
+        self.presence = presence      # True = visão da presença, False = dos valores
+        self.shape = codes.shape
+        self.ndim = 2
+        self.dtype = np.dtype(bool) if presence else np.dtype(np.float64)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Tamanho da versão decodificada"""
+        return self.shape[0] * self.shape[1] * self.dtype.itemsize
+
+    def __getitem__(self, key):
+        rows, cols = key if isinstance(key, tuple) else (key, None)
+        if cols is None:
+            if isinstance(rows, (int, np.integer)):
+                return np.asarray(CompactColumns(self.codes[[rows]], self.mask[[rows]], self.half_columns, self.presence))[0]
+            return CompactColumns(self.codes[rows], self.mask[rows], self.half_columns, self.presence)
+
+        if self.presence:
+            if isinstance(cols, (int, np.integer)):
+                return ((self.mask[rows, cols >> 3] >> (cols & 7)) & 1).astype(bool)
+            bits = np.unpackbits(self.mask[rows], axis=-1, count=self.shape[1], bitorder='little')
+            return bits[..., cols].astype(bool)
+        return decode_codes(self.codes[rows, cols], self.half_columns[cols])
+
+    def __eq__(self, other):
+        return np.asarray(self) == other
+
+    def __ne__(self, other):
+        return np.asarray(self) != other
+
+    __hash__ = None
+
+    def __array__(self, dtype=None, copy=None):
+        if self.presence:
+            array = np.unpackbits(self.mask, axis=1, count=self.shape[1], bitorder='little').astype(bool)
+        else:
+            array = decode_codes(self.codes, self.half_columns)
+        return array if dtype is None else array.astype(dtype)
+
+
+class StoreRows:
+    """Sequência somente leitura que materializa os tokens do store sob demanda"""
+
+    def __init__(self, store: 'TokenStore', size: int):
+        self.store = store
+        self.size = size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        if index < 0:
+            index += self.size
+        if index < 0 or index >= self.size:
+            raise IndexError(index)
+        return self.store.get_token(index)
+
+    def __iter__(self):
+        for index in range(self.size):
+            yield self.store.get_token(index)
+
+
+class TokenStore:
+    """Store colunar residente em memória com as features numéricas dos tokens do banco.
+
+    Mantido em sincronia pelo TokenDatabase (save/delete/clear/restore), permite que a
+    comparação use a matriz de features sem consultar o SQLite a cada mensagem.
+
+    No modo compacto (hosts com pouca memória) values guarda códigos uint16 (float16 ou
+    log quantizado, ver encode_compact) e present a máscara empacotada em bits; matrix()
+    devolve visões CompactColumns, decodificadas coluna a coluna pelos motores, com erro
+    máximo de COMPACT_SIMILARITY_ERROR pontos na similaridade. Os números exibidos nas
+    notificações vêm das linhas exatas do banco (get_token devolve valores aproximados).
+    """
+
+    def __init__(self, fields: Optional[List[str]] = None, initial_capacity: int = 1024, compact: bool = False):
+        self.fields = list(fields or FEATURE_FIELDS)
+        self.field_index = {field: i for i, field in enumerate(self.fields)}
+        self.compact = compact
+        self.half_columns = np.array([field in HALF_FIELDS for field in self.fields], dtype=bool)
+        self.version = 0  # Incrementado a cada alteração (invalida índices derivados)
+        self.layout = 0  # Incrementado quando linhas existentes mudam (remoção, clear, recarga); append não altera
+        self._allocate(initial_capacity)
+
+    def _new_arrays(self, capacity: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Arrays de valores e presença no formato do modo (float64/bool ou uint16/bits)"""
+        if self.compact:
+            return (np.zeros((capacity, len(self.fields)), dtype=np.uint16),
+                    np.zeros((capacity, (len(self.fields) + 7) // 8), dtype=np.uint8))
+        return (np.zeros((capacity, len(self.fields)), dtype=np.float64),
+                np.zeros((capacity, len(self.fields)), dtype=bool))
+
+    def _allocate(self, capacity: int):
+        """Cria arrays vazios com a capacidade informada"""
+        capacity = max(capacity, 1)
+        self.size = 0
+        self.values, self.present = self._new_arrays(capacity)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.token_names = []
+        self.contract_addresses = []
+        self.timestamps = []
+        self.id_to_row = {}
+        self.contract_counts = {}  # contrato -> linhas com ele (dedupe sem consultar o SQLite)
+        self.version += 1
+        self.layout += 1
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _ensure_capacity(self, needed: int):
+        """Dobra a capacidade dos arrays quando necessário"""
+        capacity = self.values.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        values, present = self._new_arrays(new_capacity)
+        ids = np.zeros(new_capacity, dtype=np.int64)
+        values[:self.size] = self.values[:self.size]
+        present[:self.size] = self.present[:self.size]
+        ids[:self.size] = self.ids[:self.size]
+        self.values, self.present, self.ids = values, present, ids
+
+    def add(self, token_id: int, token_data: Dict[str, Any]):
+        """Adiciona (ou substitui) um token no store"""
+        values, present = encode_features(token_data, self.fields)
+        self.add_vector(token_id, token_data, values, present)
+
+    def add_vector(self, token_id: int, token_meta: Dict[str, Any], values: np.ndarray, present: np.ndarray):
+        """Adiciona (ou substitui) um token a partir do vetor de features já codificado"""
+        if token_id in self.id_to_row:
+            self.remove_ids([token_id])
+
+        self._ensure_capacity(self.size + 1)
+        row = self.size
+        if self.compact:
+            values, present = encode_compact(values.reshape(1, -1), present.reshape(1, -1), self.half_columns)
+        self.values[row] = values
+        self.present[row] = present
+
+        self.ids[row] = token_id
+        self.token_names.append(token_meta.get('token_name'))
+        contract_address = token_meta.get('contract_address')
+        self.contract_addresses.append(contract_address)
+        if contract_address:
+            self.contract_counts[contract_address] = self.contract_counts.get(contract_address, 0) + 1
+        self.timestamps.append(token_meta.get('timestamp'))
+        self.id_to_row[token_id] = row
+        self.size += 1
+        self.version += 1
+
+    def load(self, tokens: Iterable[Dict[str, Any]]):
+        """Recarrega o store inteiro a partir de tokens já ordenados por id"""
+        tokens = list(tokens)
+        self._allocate(len(tokens))
+        for token in tokens:
+            self.add(token['id'], token)
+
+    def load_vectors(self, records: Iterable[Tuple[Dict[str, Any], np.ndarray, np.ndarray]]):
+        """Recarrega o store a partir de (metadados, valores, presença) já ordenados por id"""
+        records = list(records)
+        self._allocate(len(records))
+        for token_meta, values, present in records:
+            self.add_vector(token_meta['id'], token_meta, values, present)
+
+    def remove_ids(self, token_ids: Iterable[int]) -> int:
+        """Remove tokens pelo id preservando a ordem das linhas restantes"""
+        rows = [self.id_to_row[token_id] for token_id in token_ids if token_id in self.id_to_row]
+        if not rows:
+            return 0
+
+        for row in rows:
+            contract_address = self.contract_addresses[row]
+            if contract_address:
+                remaining = self.contract_counts.pop(contract_address) - 1
+                if remaining:
+                    self.contract_counts[contract_address] = remaining
+
+        keep = np.ones(self.size, dtype=bool)
+        keep[rows] = False
+        kept_rows = np.flatnonzero(keep)
+        new_size = len(kept_rows)
+
+        self.values[:new_size] = self.values[kept_rows]
+        self.present[:new_size] = self.present[kept_rows]
+        self.ids[:new_size] = self.ids[kept_rows]
+        self.token_names = [self.token_names[row] for row in kept_rows]
+        self.contract_addresses = [self.contract_addresses[row] for row in kept_rows]
+        self.timestamps = [self.timestamps[row] for row in kept_rows]
+        self.size = new_size
+        self.id_to_row = {int(token_id): row for row, token_id in enumerate(self.ids[:new_size])}
+        self.version += 1
+        self.layout += 1
+        return len(rows)
+
+    def has_contract(self, contract_address: str) -> bool:
+        return contract_address in self.contract_counts
+
+    def clear(self):
+        """Remove todos os tokens do store"""
+        self._allocate(self.values.shape[0])
+
+    def get_token(self, row: int) -> Dict[str, Any]:
+        """Materializa o token de uma linha como dict (mesmas chaves usadas na renderização)"""
+        token = {
+            'id': int(self.ids[row]),
+            'token_name': self.token_names[row],
+            'contract_address': self.contract_addresses[row],
+            'timestamp': self.timestamps[row]
+        }
+        values, present = self.values[row], self.present[row]
+        if self.compact:
+            values, present = decode_compact(values.reshape(1, -1), present.reshape(1, -1), self.half_columns)
+            values, present = values[0], present[0]
+        for col, field in enumerate(self.fields):
+            if present[col]:
+                value = float(values[col])
+                if self.compact and field in INTEGER_FIELDS:
+                    value = float(round(value))  # Contagens grandes voltam aproximadas
+                token[field] = int(value) if field in INTEGER_FIELDS and value.is_integer() else value
+            else:
+                token[field] = None
+        return token
+
+    def get_token_by_id(self, token_id: int) -> Optional[Dict[str, Any]]:
+        """Materializa um token pelo id"""
+        row = self.id_to_row.get(token_id)
+        return self.get_token(row) if row is not None else None
+
+    def matrix(self) -> TokenMatrix:
+        """Retorna a matriz de features atual (views dos arrays, sem cópia; visões lazy no modo compacto)"""
+        values, present = self.values[:self.size], self.present[:self.size]
+        if self.compact:
+            values, present = (CompactColumns(values, present, self.half_columns),
+                               CompactColumns(values, present, self.half_columns, presence=True))
+        return TokenMatrix(self.fields, values, present,
+                           StoreRows(self, self.size), version=self.version, ids=self.ids[:self.size],
+                           layout=self.layout)
+
+    def nbytes(self) -> int:
+        """Memória ocupada pelos arrays numéricos do store (capacidade alocada)"""
+        return self.values.nbytes + self.present.nbytes + self.ids.nbytes
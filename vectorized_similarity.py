@@ -0,0 +1,549 @@
+import heapq
+import numpy as np
+from typing import Dict, List, Any, Tuple, Optional
+
+
+class RowSubset:
+    """Visão somente leitura de um subconjunto das linhas de uma sequência de tokens"""
+
+    def __init__(self, tokens, rows: np.ndarray):
+        self.tokens = tokens
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        return self.tokens[int(self.rows[index])]
+
+    def __iter__(self):
+        for row in self.rows:
+            yield self.tokens[int(row)]
+
+
+class TokenMatrix:
+    """Matriz colunar com as features numéricas de vários tokens (uma linha por token)"""
+
+    def __init__(self, fields: List[str], values: np.ndarray, present: np.ndarray, tokens: List[Dict[str, Any]],
+                 version: Optional[int] = None, ids: Optional[np.ndarray] = None, layout: Optional[int] = None):
+        self.fields = fields
+        self.field_index = {field: i for i, field in enumerate(fields)}
+        self.values = values      # float64 (n_tokens x n_fields), 0.0 onde o valor é None
+        self.present = present    # bool (n_tokens x n_fields), False onde o valor é None
+        self.tokens = tokens      # tokens originais, na mesma ordem das linhas
+        self.version = version    # Versão do TokenStore de origem (None para matrizes avulsas)
+        self.ids = ids            # ids do banco por linha (None para matrizes avulsas)
+        self.layout = layout      # Layout das linhas no TokenStore (muda em remoções/recargas, não em appends)
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    def subset(self, rows: np.ndarray) -> 'TokenMatrix':
+        """Retorna uma nova matriz apenas com as linhas informadas (na ordem dada)"""
+        return TokenMatrix(self.fields, self.values[rows], self.present[rows], RowSubset(self.tokens, rows),
+                           ids=self.ids[rows] if self.ids is not None else None)
+
+    @staticmethod
+    def to_float(value) -> Optional[float]:
+        """Converte um valor do token para float (None continua None)"""
+        if value is None:
+            return None
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        # Strings são comparadas por igualdade no algoritmo escalar, não há equivalente vetorial
+        raise ValueError(f"Valor não numérico não suportado pelo motor vetorizado: {value!r}")
+
+    @classmethod
+    def from_tokens(cls, tokens: List[Dict[str, Any]], fields: List[str]) -> 'TokenMatrix':
+        """Monta a matriz a partir de uma lista de tokens (dicts do banco ou do parser)"""
+        values = np.zeros((len(tokens), len(fields)), dtype=np.float64)
+        present = np.zeros((len(tokens), len(fields)), dtype=bool)
+
+        for row, token in enumerate(tokens):
+            for col, field in enumerate(fields):
+                value = cls.to_float(token.get(field))
+                if value is not None:
+                    values[row, col] = value
+                    present[row, col] = True
+
+        return cls(fields, values, present, tokens)
+
+
+# Margem para erros de arredondamento entre o limite superior e a soma final das seções
+PRUNING_EPSILON = 1e-9
+
+
+def overall_upper_bound(partial_sum, partial_count, remaining_max: List[float]):
+    """Limite superior da similaridade geral dado o que já foi calculado.
+
+    A geral é a média das seções > 0. As seções restantes valem no máximo remaining_max;
+    incluir as de maior teto enquanto elas aumentam a média dá o maior valor possível.
+    Funciona com escalares ou arrays NumPy.
+    """
+    if np.isscalar(partial_sum):
+        best = partial_sum / partial_count if partial_count > 0 else 0.0
+        running_sum, running_count = partial_sum, partial_count
+        for section_max in sorted(remaining_max, reverse=True):
+            running_sum += section_max
+            running_count += 1
+            best = max(best, running_sum / running_count)
+        return best
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        best = np.where(partial_count > 0, partial_sum / np.maximum(partial_count, 1), 0.0)
+        running_sum = partial_sum
+        running_count = partial_count
+        for section_max in sorted(remaining_max, reverse=True):
+            running_sum = running_sum + section_max
+            running_count = running_count + 1
+            best = np.maximum(best, running_sum / running_count)
+    return best
+
+
+class TopKHeap:
+    """Seleção dos k maiores scores com heap mínimo limitado a k elementos.
+
+    Em caso de empate vence o candidato que apareceu primeiro (menor ordem), a mesma
+    regra do loop escalar de find_most_similar_token.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self.heap = []
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def is_full(self) -> bool:
+        return len(self.heap) >= self.k
+
+    def min_score(self) -> float:
+        """Menor score ainda aceito no heap (0.0 enquanto não estiver cheio)"""
+        return self.heap[0][0] if self.is_full() else 0.0
+
+    def push(self, score: float, order: int, payload: Any = None) -> bool:
+        """Oferece um candidato ao heap; retorna True se ele entrou"""
+        if self.k <= 0:
+            return False
+        item = (score, -order, payload)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, item)
+            return True
+        if item[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, item)
+            return True
+        return False
+
+    def sorted_items(self) -> List[Tuple[float, int, Any]]:
+        """Retorna [(score, ordem, payload)] do maior para o menor score"""
+        items = sorted(self.heap, key=lambda item: item[:2], reverse=True)
+        return [(score, -neg_order, payload) for score, neg_order, payload in items]
+
+
+class VectorizedSimilarity:
+    """Motor vetorizado (NumPy) equivalente ao cálculo escalar do SimilarityCalculator.
+
+    Reproduz exatamente as regras de calculate_field_similarity, calculate_section_similarity
+    e calculate_overall_similarity, somando os campos na mesma ordem do caminho escalar para
+    que os resultados sejam idênticos bit a bit.
+    """
+
+    def __init__(self, section_fields: Dict[str, List[str]], weighted_sections: Dict[str, Dict[str, float]]):
+        self.section_fields = section_fields
+        self.weighted_sections = weighted_sections
+
+        # Todas as colunas usadas no cálculo, na ordem das seções
+        self.fields = []
+        for fields in section_fields.values():
+            for field in fields:
+                if field not in self.fields:
+                    self.fields.append(field)
+
+        # Valor máximo de cada seção (100 para médias, soma dos pesos para seções ponderadas)
+        self.section_max = {
+            section_name: float(sum(weighted_sections[section_name].values())) if section_name in weighted_sections else 100.0
+            for section_name in section_fields.keys()
+        }
+
+        # Ordem de avaliação na poda: seções mais baratas (menos campos) primeiro
+        self.pruning_order = sorted(
+            section_fields.keys(),
+            key=lambda name: len(weighted_sections[name]) if name in weighted_sections else len(section_fields[name])
+        )
+
+    def build_matrix(self, tokens: List[Dict[str, Any]]) -> TokenMatrix:
+        """Monta a matriz de features para os tokens informados"""
+        return TokenMatrix.from_tokens(tokens, self.fields)
+
+    def _target_vector(self, target_token: Dict[str, Any], fields: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Converte o token alvo para vetores (valores, presença) na ordem das colunas"""
+        values = np.zeros(len(fields), dtype=np.float64)
+        present = np.zeros(len(fields), dtype=bool)
+        for col, field in enumerate(fields):
+            value = TokenMatrix.to_float(target_token.get(field))
+            if value is not None:
+                values[col] = value
+                present[col] = True
+        return values, present
+
+    @staticmethod
+    def field_similarity(target_value: float, target_present: bool,
+                         column: np.ndarray, column_present: np.ndarray) -> np.ndarray:
+        """Versão vetorial de calculate_field_similarity para uma coluna inteira"""
+        abs_target = abs(target_value)
+        abs_column = np.abs(column)
+        max_val = np.maximum(abs_column, abs_target)
+        min_val = np.minimum(abs_column, abs_target)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similarity = (min_val / max_val) * 100
+
+        target_zero = target_present and target_value == 0
+        column_zero = column_present & (column == 0)
+
+        if target_zero:
+            # Ambos zero -> 100, apenas o alvo zero -> 0
+            similarity = np.where(column_zero, 100.0, 0.0)
+        else:
+            similarity = np.where(column_zero, 0.0, similarity)
+
+        if target_present:
+            similarity = np.where(column_present, similarity, 0.0)
+        else:
+            # Ambos None -> 100, apenas um None -> 0
+            similarity = np.where(column_present, 0.0, 100.0)
+
+        return similarity
+
+    def _section_scores(self, section_name: str, target_values: np.ndarray, target_present: np.ndarray,
+                        values: np.ndarray, present: np.ndarray, field_index: Dict[str, int]) -> np.ndarray:
+        """Calcula a similaridade de uma seção para todas as linhas de (values, present)"""
+        n_tokens = values.shape[0]
+        total = np.zeros(n_tokens, dtype=np.float64)
+
+        if section_name in self.weighted_sections:
+            # Seções com pesos: só conta campos presentes nos dois tokens, soma ponderada
+            for field, weight in self.weighted_sections[section_name].items():
+                col = field_index[field]
+                if not target_present[col]:
+                    continue
+                column_present = present[:, col]
+                field_sim = self.field_similarity(target_values[col], True, values[:, col], column_present)
+                total += np.where(column_present, field_sim * weight / 100, 0.0)
+            return total
+
+        # Seções padrão: média dos campos presentes em pelo menos um dos tokens
+        count = np.zeros(n_tokens, dtype=np.int64)
+        for field in self.section_fields[section_name]:
+            col = field_index[field]
+            column_present = present[:, col]
+            included = column_present | target_present[col]
+            field_sim = self.field_similarity(target_values[col], bool(target_present[col]),
+                                              values[:, col], column_present)
+            total += np.where(included, field_sim, 0.0)
+            count += included
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(count > 0, total / count, 0.0)
+
+    @staticmethod
+    def pair_similarity(abs_target: np.ndarray, target_zero: np.ndarray, target_present: np.ndarray,
+                        abs_column: np.ndarray, column_zero: np.ndarray, column_present: np.ndarray) -> np.ndarray:
+        """calculate_field_similarity para todos os pares (N alvos x M tokens) de um campo.
+
+        Calcula min/max na matriz inteira e corrige só as linhas/colunas com zero ou valor
+        ausente, na mesma precedência do cálculo escalar (ausente, depois zero).
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similarity = np.minimum(abs_target[:, None], abs_column[None, :])
+            similarity /= np.maximum(abs_target[:, None], abs_column[None, :])
+            similarity *= 100
+
+        zero_cols = np.flatnonzero(column_zero)
+        if len(zero_cols):
+            similarity[:, zero_cols] = np.where(target_zero, 100.0, 0.0)[:, None]
+        zero_rows = np.flatnonzero(target_zero)
+        if len(zero_rows):
+            similarity[zero_rows] = np.where(column_zero, 100.0, 0.0)[None, :]
+        absent_cols = np.flatnonzero(~column_present)
+        if len(absent_cols):
+            similarity[:, absent_cols] = np.where(target_present, 0.0, 100.0)[:, None]
+        absent_rows = np.flatnonzero(~target_present)
+        if len(absent_rows):
+            similarity[absent_rows] = np.where(column_present, 0.0, 100.0)[None, :]
+        return similarity
+
+    def _batch_section_scores(self, section_name: str, targets: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                              columns: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                              field_index: Dict[str, int]) -> np.ndarray:
+        """Similaridade de uma seção para todos os pares (alvo, linha): matriz (N, M).
+
+        targets são (abs, zero, presença) dos alvos em (N, F); columns são os mesmos arrays
+        do banco transpostos para (F, M).
+        """
+        abs_target, target_zero, target_present = targets
+        abs_columns, columns_zero, columns_present = columns
+        total = np.zeros((abs_target.shape[0], abs_columns.shape[1]), dtype=np.float64)
+
+        def field_pairs(col):
+            return self.pair_similarity(abs_target[:, col], target_zero[:, col], target_present[:, col],
+                                        abs_columns[col], columns_zero[col], columns_present[col])
+
+        if section_name in self.weighted_sections:
+            # Seções com pesos: só conta pares com o campo presente nos dois tokens
+            for field, weight in self.weighted_sections[section_name].items():
+                col = field_index[field]
+                field_sim = field_pairs(col)
+                field_sim[~target_present[:, col]] = 0.0
+                field_sim[:, ~columns_present[col]] = 0.0
+                field_sim *= weight
+                field_sim /= 100
+                total += field_sim
+            return total
+
+        # Seções padrão: campos ausentes nos dois tokens não entram na média
+        cols = [field_index[field] for field in self.section_fields[section_name]]
+        for col in cols:
+            field_sim = field_pairs(col)
+            absent_rows = ~target_present[:, col]
+            absent_cols = ~columns_present[col]
+            if absent_rows.any() and absent_cols.any():
+                field_sim[np.ix_(absent_rows, absent_cols)] = 0.0
+            total += field_sim
+
+        both_absent = (~target_present[:, cols]).astype(np.int64) @ (~columns_present[cols]).astype(np.int64)
+        count = len(cols) - both_absent
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(count > 0, total / count, 0.0)
+
+    def _overall_scores(self, section_scores: Dict[str, np.ndarray], n_tokens: int) -> np.ndarray:
+        """Similaridade geral: média apenas das seções > 0 (somadas na ordem de section_fields)"""
+        overall_total = np.zeros(n_tokens, dtype=np.float64)
+        valid_sections = np.zeros(n_tokens, dtype=np.int64)
+        for section_name in self.section_fields.keys():
+            section_sim = section_scores[section_name]
+            positive = section_sim > 0
+            overall_total += np.where(positive, section_sim, 0.0)
+            valid_sections += positive
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(valid_sections > 0, overall_total / valid_sections, 0.0)
+
+    def score_matrix(self, target_token: Dict[str, Any], matrix: TokenMatrix) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Calcula a similaridade geral e por seção do alvo contra todas as linhas da matriz"""
+        section_scores = self.score_sections(target_token, matrix, list(self.section_fields.keys()))
+        return self._overall_scores(section_scores, len(matrix)), section_scores
+
+    def score_sections(self, target_token: Dict[str, Any], matrix: TokenMatrix,
+                       section_names: List[str]) -> Dict[str, np.ndarray]:
+        """Calcula apenas as seções informadas (usado na reavaliação incremental)"""
+        target_values, target_present = self._target_vector(target_token, matrix.fields)
+        return {
+            section_name: self._section_scores(section_name, target_values, target_present,
+                                               matrix.values, matrix.present, matrix.field_index)
+            for section_name in section_names
+        }
+
+    def overall_scores(self, section_scores: Dict[str, np.ndarray], n_tokens: int) -> np.ndarray:
+        """Similaridade geral a partir de scores por seção já calculados"""
+        return self._overall_scores(section_scores, n_tokens)
+
+    def section_scores_at(self, section_scores: Dict[str, np.ndarray], index: int) -> Dict[str, float]:
+        """Extrai o dicionário de similaridades por seção de uma linha"""
+        return {section_name: float(scores[index]) for section_name, scores in section_scores.items()}
+
+    def find_most_similar(self, target_token: Dict[str, Any], matrix: TokenMatrix) -> Tuple[Optional[Dict[str, Any]], float, Dict[str, float]]:
+        """Encontra o token mais similar (mesma regra de desempate do caminho escalar)"""
+        if len(matrix) == 0:
+            return None, 0.0, {}
+
+        overall, section_scores = self.score_matrix(target_token, matrix)
+
+        # argmax devolve a primeira ocorrência do máximo, igual ao '>' estrito do loop escalar
+        best_index = int(np.argmax(overall))
+        best_similarity = float(overall[best_index])
+
+        if best_similarity <= 0:
+            return None, 0.0, {}
+
+        return matrix.tokens[best_index], best_similarity, self.section_scores_at(section_scores, best_index)
+
+    def top_k_indices(self, overall: np.ndarray, k: int) -> List[int]:
+        """Índices dos k maiores scores (> 0) em ordem decrescente, via heap limitado"""
+        candidates = np.flatnonzero(overall > 0)
+        if len(candidates) > k:
+            # Reduz os candidatos ao k-ésimo maior valor, mantendo empates na fronteira
+            kth_value = np.partition(overall[candidates], len(candidates) - k)[len(candidates) - k]
+            candidates = candidates[overall[candidates] >= kth_value]
+
+        heap = TopKHeap(k)
+        for index in candidates:
+            heap.push(float(overall[index]), int(index))
+        return [order for _, order, _ in heap.sorted_items()]
+
+    def find_top_k(self, target_token: Dict[str, Any], matrix: TokenMatrix, k: int) -> List[Tuple[Dict[str, Any], float, Dict[str, float]]]:
+        """Retorna os k tokens mais similares [(token, similaridade, seções)] em uma única passada"""
+        if len(matrix) == 0 or k <= 0:
+            return []
+
+        overall, section_scores = self.score_matrix(target_token, matrix)
+        return [
+            (matrix.tokens[index], float(overall[index]), self.section_scores_at(section_scores, index))
+            for index in self.top_k_indices(overall, k)
+        ]
+
+    @staticmethod
+    def _batch_operands(values: np.ndarray, present: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(abs, zero, presença) usados pela comparação em lote"""
+        values, present = np.asarray(values), np.asarray(present)
+        return np.abs(values), present & (values == 0), present
+
+    def _batch_scores(self, targets: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                      columns: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                      field_index: Dict[str, int]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Similaridade geral e por seção de todos os pares (alvos x colunas)"""
+        section_scores = {
+            section_name: self._batch_section_scores(section_name, targets, columns, field_index)
+            for section_name in self.section_fields.keys()
+        }
+        shape = (targets[0].shape[0], columns[0].shape[1])
+        return self._overall_scores(section_scores, shape), section_scores
+
+    def pairwise_tiles(self, matrix: TokenMatrix, tile_size: int = 1024):
+        """Percorre a similaridade token x token do triângulo superior em blocos.
+
+        Gera (linha_inicial, coluna_inicial, similaridade_geral) para cada bloco com
+        coluna_inicial >= linha_inicial; a similaridade é simétrica, então os demais blocos
+        são redundantes. A memória fica limitada a alguns arrays tile_size x tile_size.
+        """
+        operands = self._batch_operands(matrix.values, matrix.present)
+        columns = tuple(np.ascontiguousarray(operand.T) for operand in operands)
+        n_tokens = len(matrix)
+
+        for row_start in range(0, n_tokens, tile_size):
+            row_end = min(row_start + tile_size, n_tokens)
+            targets = tuple(operand[row_start:row_end] for operand in operands)
+            for col_start in range(row_start, n_tokens, tile_size):
+                col_end = min(col_start + tile_size, n_tokens)
+                tile_columns = tuple(column[:, col_start:col_end] for column in columns)
+                overall, _ = self._batch_scores(targets, tile_columns, matrix.field_index)
+                yield row_start, col_start, overall
+
+    def find_top_k_batch(self, target_tokens: List[Dict[str, Any]], matrix: TokenMatrix, k: int,
+                         min_similarity: Optional[float] = None,
+                         max_cells: int = 2_000_000) -> List[List[Tuple[Dict[str, Any], float, Dict[str, float]]]]:
+        """Top-k de N alvos contra a matriz inteira como operações (N, M), em blocos de alvos.
+
+        max_cells limita o tamanho de cada bloco (alvos x tokens) para manter a memória
+        controlada. O resultado de cada alvo é idêntico ao de find_top_k (filtrado por
+        min_similarity, quando informado).
+        """
+        results = [[] for _ in target_tokens]
+        n_tokens = len(matrix)
+        if n_tokens == 0 or k <= 0 or not target_tokens:
+            return results
+
+        n_fields = len(matrix.fields)
+        target_values = np.zeros((len(target_tokens), n_fields), dtype=np.float64)
+        target_present = np.zeros((len(target_tokens), n_fields), dtype=bool)
+        for row, target_token in enumerate(target_tokens):
+            target_values[row], target_present[row] = self._target_vector(target_token, matrix.fields)
+        target_abs, target_zero, _ = self._batch_operands(target_values, target_present)
+
+        # Lado do banco calculado uma única vez, em colunas contíguas (F, M)
+        columns = tuple(np.ascontiguousarray(operand.T)
+                        for operand in self._batch_operands(matrix.values, matrix.present))
+
+        block_size = max(1, max_cells // n_tokens)
+        for start in range(0, len(target_tokens), block_size):
+            end = min(start + block_size, len(target_tokens))
+            targets = (target_abs[start:end], target_zero[start:end], target_present[start:end])
+            overall, section_scores = self._batch_scores(targets, columns, matrix.field_index)
+
+            for local_row in range(end - start):
+                scores = overall[local_row]
+                if min_similarity is not None:
+                    scores = np.where(scores >= min_similarity, scores, 0.0)
+                results[start + local_row] = [
+                    (matrix.tokens[index], float(overall[local_row, index]),
+                     {name: float(section[local_row, index]) for name, section in section_scores.items()})
+                    for index in self.top_k_indices(scores, k)
+                ]
+
+        return results
+
+    def find_top_k_pruned(self, target_token: Dict[str, Any], matrix: TokenMatrix, k: int,
+                          min_similarity: float = 0.0, chunk_size: int = 8192, rows: Optional[np.ndarray] = None,
+                          heap: Optional[TopKHeap] = None,
+                          survivors: Optional[list] = None) -> Tuple[List[Tuple[Dict[str, Any], float, Dict[str, float]]], int]:
+        """Top-k com branch-and-bound: descarta candidatos que não alcançam o threshold nem o top-k atual.
+
+        Retorna exatamente os k melhores entre os tokens com similaridade >= min_similarity
+        (os mesmos de find_top_k após o filtro) e a quantidade de candidatos podados.
+
+        rows limita a busca a algumas linhas da matriz; heap pode vir com candidatos já
+        conhecidos (ordem = linha da matriz), cujo k-ésimo score vale como limite inicial;
+        survivors recebe (linhas, geral, seções) dos candidatos pontuados por completo.
+        """
+        n_rows = len(matrix) if rows is None else len(rows)
+        if n_rows == 0 or k <= 0:
+            return [], 0
+
+        target_values, target_present = self._target_vector(target_token, matrix.fields)
+        heap = TopKHeap(k) if heap is None else heap
+        pruned = 0
+
+        for start in range(0, n_rows, chunk_size):
+            if rows is None:
+                chunk_rows = np.arange(start, min(start + chunk_size, n_rows))
+                values = matrix.values[start:start + chunk_size]
+                present = matrix.present[start:start + chunk_size]
+            else:
+                chunk_rows = rows[start:start + chunk_size]
+                values = matrix.values[chunk_rows]
+                present = matrix.present[chunk_rows]
+            active = np.arange(values.shape[0])
+            partial_sum = np.zeros(len(active), dtype=np.float64)
+            partial_count = np.zeros(len(active), dtype=np.int64)
+            section_scores = {}
+
+            for position, section_name in enumerate(self.pruning_order):
+                scores = self._section_scores(section_name, target_values, target_present,
+                                              values[active], present[active], matrix.field_index)
+                section_scores[section_name] = scores
+                positive = scores > 0
+                partial_sum += np.where(positive, scores, 0.0)
+                partial_count += positive
+
+                # O candidato precisa alcançar o threshold e superar o pior do top-k atual
+                cutoff = max(min_similarity, heap.min_score())
+                if cutoff <= 0:
+                    continue
+                remaining_max = [self.section_max[name] for name in self.pruning_order[position + 1:]]
+                keep = overall_upper_bound(partial_sum, partial_count, remaining_max) >= cutoff - PRUNING_EPSILON
+                if keep.all():
+                    continue
+
+                pruned += int(len(keep) - np.count_nonzero(keep))
+                active = active[keep]
+                partial_sum = partial_sum[keep]
+                partial_count = partial_count[keep]
+                section_scores = {name: section[keep] for name, section in section_scores.items()}
+                if len(active) == 0:
+                    break
+
+            if len(active) == 0:
+                continue
+
+            overall = self._overall_scores(section_scores, len(active))
+            if survivors is not None:
+                survivors.append((chunk_rows[active], overall, section_scores))
+            eligible = overall >= min_similarity
+            for local_index in self.top_k_indices(np.where(eligible, overall, 0.0), k):
+                section_dict = {name: float(section_scores[name][local_index]) for name in self.section_fields.keys()}
+                heap.push(float(overall[local_index]), int(chunk_rows[active[local_index]]), section_dict)
+
+        return [
+            (matrix.tokens[index], score, section_dict)
+            for score, index, section_dict in heap.sorted_items()
+        ], pruned
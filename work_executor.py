@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import statistics
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WorkExecutor:
+    """Executor dedicado ao trabalho de CPU (parse, similaridade, relatórios) e SQLite.
+
+    Tira esse trabalho do event loop: os handlers aguardam o resultado com await e o loop
+    continua atendendo comandos e outros updates. Um único worker (padrão) serializa os
+    acessos ao TokenDatabase e ao store residente, que não são thread-safe.
+
+    A fila é limitada: com max_pending jobs em execução ou na fila, novos jobs aguardam
+    uma vaga (backpressure) em vez de acumular sem limite no executor.
+
+    Consultas curtas dos comandos (/stats, /threshold, /cas...) usam uma segunda fila
+    (query), para não esperar atrás das comparações enfileiradas no worker principal.
+    """
+
+    def __init__(self, workers: int = 1, max_pending: int = 32):
+        self.pool = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='similarity-worker')
+        self.max_pending = max(max_pending, 1)
+        self._slots = None  # asyncio.Semaphore criado no loop em execução
+        self._background = set()  # Tarefas de run_in_background ainda em andamento
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'pending': 0, 'peak_pending': 0,
+                      'waited': 0, 'wait_time': 0.0, 'run_time': 0.0, 'last_run_time': 0.0, 'max_run_time': 0.0}
+        # Fila das consultas curtas (conexão SQLite própria, sem tocar no store residente)
+        self.query_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='similarity-query')
+        self.query_stats = {'queries': 0, 'failed': 0, 'run_time': 0.0, 'max_run_time': 0.0}
+
+    async def run(self, function: Callable, *args, **kwargs) -> Any:
+        """Executa function(*args, **kwargs) no worker e retorna o resultado (exceções são propagadas)"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        if self._slots.locked():
+            self.stats['waited'] += 1
+
+        wait_start = time.perf_counter()
+        async with self._slots:
+            self.stats['wait_time'] += time.perf_counter() - wait_start
+            self.stats['submitted'] += 1
+            self.stats['pending'] += 1
+            self.stats['peak_pending'] = max(self.stats['peak_pending'], self.stats['pending'])
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self.pool, self._timed, function, args, kwargs)
+            finally:
+                self.stats['pending'] -= 1
+
+    def run_in_background(self, function: Callable, *args, **kwargs) -> asyncio.Task:
+        """Enfileira function no worker sem aguardar o resultado (erros vão para o log)"""
+        task = asyncio.get_running_loop().create_task(self.run(function, *args, **kwargs))
+        self._background.add(task)
+        task.add_done_callback(self._background_done)
+        return task
+
+    def _background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Erro em job do executor: {task.exception()}")
+
+    async def query(self, function: Callable, *args, **kwargs) -> Any:
+        """Executa uma consulta curta na fila de consultas, sem esperar os jobs do worker.
+
+        Só para funções que abrem a própria conexão com o SQLite e não alteram o store
+        residente nem os caches (essas continuam serializadas em run).
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.query_pool, self._timed_query, function, args, kwargs)
+
+    def _timed(self, function: Callable, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        except Exception:
+            self.stats['failed'] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stats['run_time'] += elapsed
+            self.stats['last_run_time'] = elapsed
+            self.stats['max_run_time'] = max(self.stats['max_run_time'], elapsed)
+        self.stats['completed'] += 1
+        return result
+
+    def _timed_query(self, function: Callable, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        except Exception:
+            self.query_stats['failed'] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.query_stats['queries'] += 1
+            self.query_stats['run_time'] += elapsed
+            self.query_stats['max_run_time'] = max(self.query_stats['max_run_time'], elapsed)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+        self.query_pool.shutdown(wait=True)
+
+
+class EventLoopLagMonitor:
+    """Mede o atraso do event loop: uma tarefa dorme interval segundos e registra quanto
+    acordou depois do previsto (tempo em que o loop ficou ocupado com código síncrono)."""
+
+    def __init__(self, interval: float = 0.5, warning_lag: Optional[float] = None, window: int = 1200):
+        self.interval = interval
+        self.warning_lag = warning_lag
+        self.samples = deque(maxlen=window)  # Atrasos mais recentes (segundos)
+        self.task = None
+        self.stats = {'samples': 0, 'last_lag': 0.0, 'max_lag': 0.0, 'warnings': 0}
+
+    def start(self):
+        """Inicia a medição no loop em execução (ex.: post_init da Application)"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._run())
+        return self.task
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(loop.time() - expected, 0.0))
+
+    def record(self, lag: float):
+        self.samples.append(lag)
+        self.stats['samples'] += 1
+        self.stats['last_lag'] = lag
+        self.stats['max_lag'] = max(self.stats['max_lag'], lag)
+        if self.warning_lag is not None and lag >= self.warning_lag:
+            self.stats['warnings'] += 1
+            logger.warning(f"🐢 Event loop atrasado {lag * 1000:.0f}ms")
+
+    def percentile(self, fraction: float) -> float:
+        """Percentil dos atrasos recentes (0.99 = p99)"""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'samples': self.stats['samples'],
+            'last': self.stats['last_lag'],
+            'mean': statistics.fmean(self.samples) if self.samples else 0.0,
+            'p99': self.percentile(0.99),
+            'max': self.stats['max_lag'],
+        }